@@ -0,0 +1,437 @@
+"""JSON API for tasks.
+
+Responses are built from ``values()`` projections rather than model
+instances. Write endpoints only accept ``application/json`` bodies; a
+browser cannot send those cross-site without a CORS preflight, so they are
+exempt from the CSRF token check that the HTML forms use.
+"""
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlencode
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .bulk import delete_subtrees
+from .categories import refresh_category_counts, resolve_category_ids
+from .models import Task, path_ids, refresh_parent_counts, refresh_paths
+from .pagination import cursor_time, paginate
+from .recurrence import continue_series, follow_schedule, occurrence_clock, schedule, store_next_occurrence
+from .stats import invalidate_task_stats
+from .views import filter_tasks, normalize_filters, recurring_tails, upcoming_occurrences
+
+TASK_FIELDS = (
+    'id', 'title', 'description', 'notes', 'priority', 'completed', 'due_date',
+    'category_id', 'parent_task_id', 'subtask_total', 'subtask_completed',
+    'created_at', 'last_modified', 'recurrence', 'recurrence_interval',
+    'recurrence_until', 'recurrence_count', 'series_id', 'occurrence',
+)
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+PARENT_CHOICES_LIMIT = 20
+MAX_BATCH_SIZE = 10000
+BATCH_CHUNK_SIZE = 500
+
+
+def project(queryset, *extra):
+    """The API representation of each task, plus any ``extra`` value names"""
+    return queryset.values(*TASK_FIELDS, *extra, category_name=F('category__name'))
+
+
+def project_occurrence(occurrence, *extra):
+    """project() for a virtual occurrence; it has no id until it is stored"""
+    row = {name: getattr(occurrence, name) for name in (*TASK_FIELDS, *extra)}
+    row['category_name'] = occurrence.category.name if occurrence.category_id else None
+    return row
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, safe=False)
+
+
+def error_response(errors, status=400):
+    return json_response({'errors': errors}, status=status)
+
+
+def read_json(request):
+    if request.content_type != 'application/json':
+        raise ValidationError({'body': ["Content-Type must be application/json"]})
+    try:
+        return json.loads(request.body or b'null')
+    except ValueError:
+        raise ValidationError({'body': ["Malformed JSON"]})
+
+
+def clean_task_data(data, partial=False):
+    """Validate one task payload and return model field values.
+
+    A ``category`` name is returned as ``category_name`` for the caller to
+    resolve, so batches can resolve all names at once.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError({'task': ["Expected an object"]})
+    cleaned = {}
+    errors = {}
+
+    if 'title' in data or not partial:
+        title = data.get('title')
+        if not isinstance(title, str) or not title.strip():
+            errors['title'] = ["This field is required"]
+        elif len(title) > Task._meta.get_field('title').max_length:
+            errors['title'] = ["Ensure this value has at most 255 characters"]
+        else:
+            cleaned['title'] = title
+    for field in ('description', 'notes'):
+        if field in data:
+            if not isinstance(data[field], str):
+                errors[field] = ["Expected a string"]
+            else:
+                cleaned[field] = data[field]
+    if 'priority' in data:
+        if data['priority'] not in dict(Task.PRIORITY_CHOICES):
+            errors['priority'] = ["Expected one of L, M, H"]
+        else:
+            cleaned['priority'] = data['priority']
+    if 'completed' in data:
+        if not isinstance(data['completed'], bool):
+            errors['completed'] = ["Expected true or false"]
+        else:
+            cleaned['completed'] = data['completed']
+    for field in ('due_date', 'recurrence_until'):
+        if field in data:
+            if data[field] is None:
+                cleaned[field] = None
+            else:
+                value = parse_datetime(data[field]) if isinstance(data[field], str) else None
+                if value is None:
+                    errors[field] = ["Expected an ISO 8601 datetime or null"]
+                else:
+                    if timezone.is_naive(value):
+                        value = timezone.make_aware(value)
+                    cleaned[field] = value
+    if 'recurrence' in data:
+        if data['recurrence'] not in dict(Task.RECURRENCE_CHOICES):
+            errors['recurrence'] = ["Expected one of '', daily, weekly, monthly"]
+        else:
+            cleaned['recurrence'] = data['recurrence']
+    for field, nullable in (('recurrence_interval', False), ('recurrence_count', True)):
+        if field in data:
+            value = data[field]
+            if value is None and nullable:
+                cleaned[field] = None
+            elif not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                errors[field] = ["Expected a positive integer or null" if nullable else "Expected a positive integer"]
+            else:
+                cleaned[field] = value
+    if 'category' in data:
+        name = data['category']
+        if name is not None and not isinstance(name, str):
+            errors['category'] = ["Expected a category name or null"]
+        else:
+            cleaned['category_name'] = (name or '').strip()
+    if 'parent_task_id' in data:
+        parent_id = data['parent_task_id']
+        if parent_id is not None and (not isinstance(parent_id, int) or isinstance(parent_id, bool)):
+            errors['parent_task_id'] = ["Expected a task id or null"]
+        else:
+            cleaned['parent_task_id'] = parent_id
+
+    if errors:
+        raise ValidationError(errors)
+    return cleaned
+
+
+def existing_task_ids(ids):
+    ids = sorted({task_id for task_id in ids if task_id is not None})
+    found = set()
+    for start in range(0, len(ids), BATCH_CHUNK_SIZE):
+        found.update(Task.objects.filter(id__in=ids[start:start + BATCH_CHUNK_SIZE]).values_list('id', flat=True))
+    return found
+
+
+def apply_category(cleaned, category_ids):
+    if 'category_name' in cleaned:
+        name = cleaned.pop('category_name')
+        cleaned['category_id'] = category_ids.get(name)
+    return cleaned
+
+
+def page_url(request, params, cursor_name, cursor):
+    query = {key: value for key, value in params.items() if key not in ('after', 'before')}
+    query[cursor_name] = cursor
+    return request.build_absolute_uri(f"{request.path}?{urlencode(query)}")
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def task_list(request):
+    """GET: filtered, cursor-paginated list. POST: create one task.
+
+    With ``occurrences=true`` the list also has the upcoming occurrences of
+    recurring tasks that are not stored yet, with a null id.
+    """
+    if request.method == 'POST':
+        return create_task(request)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return error_response({'limit': ["Expected an integer"]})
+    ordering_now = cursor_time(request.GET) or occurrence_clock(timezone.now())
+    tasks_qs, _ = filter_tasks(request.GET, ordering_now)
+    ordering_keys = [field.lstrip('-') for field in tasks_qs.query.order_by if field.lstrip('-') not in TASK_FIELDS]
+    also = ()
+    if request.GET.get('occurrences') == 'true' and normalize_filters(request.GET)['completed'] != 'true':
+        occurrences = upcoming_occurrences(
+            recurring_tails(request.GET, ordering_now), request.GET, ordering_now, tasks_qs.query.order_by,
+        )
+        also = ((project_occurrence(occurrence, *ordering_keys) for occurrence in occurrences),)
+    page = paginate(project(tasks_qs, *ordering_keys), request.GET, limit, ordering_now, also)
+    # Ordering keys are only needed for the cursors; virtual ids only for the cursors too
+    results = [
+        {
+            key: None if key == 'id' and value < 0 else value
+            for key, value in row.items() if key in TASK_FIELDS or key == 'category_name'
+        }
+        for row in page
+    ]
+    params = request.GET.dict()
+    return json_response({
+        'results': results,
+        'next': page_url(request, params, 'after', page.next_cursor) if page.has_next() else None,
+        'previous': page_url(request, params, 'before', page.previous_cursor) if page.has_previous() else None,
+    })
+
+
+@require_http_methods(['GET'])
+def parent_choices(request):
+    """Open tasks whose title starts with ``q``, for the parent-task picker.
+
+    ``exclude`` names the task being edited; it and its subtasks are left
+    out. Pages are cursor-based like the task list.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', PARENT_CHOICES_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return error_response({'limit': ["Expected an integer"]})
+    exclude = None
+    if request.GET.get('exclude'):
+        if not request.GET['exclude'].isdigit():
+            return error_response({'exclude': ["Expected a task id"]})
+        exclude = Task.objects.filter(id=request.GET['exclude']).only('id', 'path').first()
+    candidates = Task.objects.parent_candidates(request.GET.get('q', '').strip(), exclude)
+    page = paginate(candidates.values('id', 'title', 'title_key'), request.GET, limit, timezone.now())
+    params = request.GET.dict()
+    return json_response({
+        'results': [{'id': row['id'], 'title': row['title']} for row in page],
+        'next': page_url(request, params, 'after', page.next_cursor) if page.has_next() else None,
+    })
+
+
+def create_task(request):
+    try:
+        cleaned = clean_task_data(read_json(request))
+        parent_id = cleaned.get('parent_task_id')
+        if parent_id is not None and not existing_task_ids([parent_id]):
+            raise ValidationError({'parent_task_id': ["Unknown task"]})
+    except ValidationError as e:
+        return error_response(e.message_dict)
+
+    with transaction.atomic():
+        apply_category(cleaned, resolve_category_ids([cleaned.get('category_name')]))
+        task = Task.objects.create(**cleaned)
+        refresh_parent_counts(task.parent_task_id)
+        refresh_category_counts(task.category_id)
+    return json_response(project(Task.objects.filter(id=task.id)).get(), status=201)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'PATCH', 'DELETE'])
+def task_detail(request, task_id):
+    task = Task.objects.filter(id=task_id).first()
+    if task is None:
+        return error_response({'id': ["Not found"]}, status=404)
+
+    if request.method == 'DELETE':
+        delete_subtrees([task.id])
+        return json_response(None, status=204)
+
+    if request.method == 'PATCH':
+        try:
+            cleaned = clean_task_data(read_json(request), partial=True)
+            validate_parent(task, cleaned)
+        except ValidationError as e:
+            return error_response(e.message_dict)
+        old_parent_id, old_category_id = task.parent_task_id, task.category_id
+        was_completed, old_schedule = task.completed, schedule(task)
+        with transaction.atomic():
+            apply_category(cleaned, resolve_category_ids([cleaned.get('category_name')]))
+            for field, value in cleaned.items():
+                setattr(task, field, value)
+            follow_schedule(task, old_schedule)
+            task.save()
+            refresh_parent_counts(old_parent_id, task.parent_task_id)
+            refresh_category_counts(old_category_id, task.category_id)
+            if task.completed and not was_completed and task.recurrence:
+                store_next_occurrence(task, timezone.now())
+
+    return json_response(project(Task.objects.filter(id=task.id)).get())
+
+
+def creates_cycle(task_id, parent_id, pending=None):
+    """Would making ``parent_id`` the parent of ``task_id`` create a loop?
+
+    ``pending`` maps task ids to parent ids that are about to be written,
+    so re-parenting inside one batch is checked against the final tree.
+    """
+    pending = pending or {}
+    seen = set()
+    while parent_id is not None and parent_id not in seen:
+        if parent_id == task_id:
+            return True
+        seen.add(parent_id)
+        if parent_id in pending:
+            parent_id = pending[parent_id]
+            continue
+        # The stored path gives the whole chain above; follow it up to the
+        # first ancestor whose parent is about to change
+        path = Task.objects.filter(id=parent_id).values_list('path', flat=True).first() or ''
+        parent_id = None
+        for ancestor_id in path_ids(path)[::-1]:
+            if ancestor_id == task_id:
+                return True
+            if ancestor_id in pending:
+                parent_id = ancestor_id
+                break
+    return parent_id is not None
+
+
+def validate_parent(task, cleaned):
+    """A task cannot become a subtask of itself or of one of its descendants"""
+    parent_id = cleaned.get('parent_task_id')
+    if parent_id is None:
+        return
+    if not existing_task_ids([parent_id]):
+        raise ValidationError({'parent_task_id': ["Unknown task"]})
+    if creates_cycle(task.id, parent_id):
+        raise ValidationError({'parent_task_id': ["A task cannot be moved under itself or one of its subtasks"]})
+
+
+@csrf_exempt
+@require_http_methods(['POST', 'PATCH'])
+def task_batch(request):
+    """Create (POST) or update (PATCH) up to MAX_BATCH_SIZE tasks at once.
+
+    The body is ``{"tasks": [...]}``; updates need an ``id`` in each item.
+    Nothing is written unless every item is valid.
+    """
+    try:
+        body = read_json(request)
+        items = body.get('tasks') if isinstance(body, dict) else None
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'tasks': ["Expected a non-empty list"]})
+        if len(items) > MAX_BATCH_SIZE:
+            raise ValidationError({'tasks': [f"At most {MAX_BATCH_SIZE} tasks per request"]})
+    except ValidationError as e:
+        return error_response(e.message_dict)
+
+    if request.method == 'POST':
+        return batch_create(items)
+    return batch_update(items)
+
+
+def clean_batch(items, partial):
+    cleaned_items, errors = [], {}
+    for index, item in enumerate(items):
+        try:
+            cleaned_items.append(clean_task_data(item, partial=partial))
+        except ValidationError as e:
+            errors[str(index)] = e.message_dict
+    return cleaned_items, errors
+
+
+def batch_create(items):
+    cleaned_items, errors = clean_batch(items, partial=False)
+    if not errors:
+        known = existing_task_ids(item.get('parent_task_id') for item in cleaned_items)
+        for index, item in enumerate(cleaned_items):
+            if item.get('parent_task_id') is not None and item['parent_task_id'] not in known:
+                errors[str(index)] = {'parent_task_id': ["Unknown task"]}
+    if errors:
+        return error_response(errors)
+
+    with transaction.atomic():
+        category_ids = resolve_category_ids(item.get('category_name') for item in cleaned_items)
+        tasks = [Task(**apply_category(item, category_ids)) for item in cleaned_items]
+        created = Task.objects.bulk_create(tasks, batch_size=BATCH_CHUNK_SIZE)
+        refresh_paths(*(task.id for task in created if task.parent_task_id))
+        refresh_parent_counts(*(task.parent_task_id for task in created))
+        refresh_category_counts(*(task.category_id for task in created))
+    invalidate_task_stats()
+    return json_response({'created': len(created), 'ids': [task.id for task in created]}, status=201)
+
+
+def batch_update(items):
+    cleaned_items, errors = clean_batch(items, partial=True)
+    ids = []
+    for index, item in enumerate(items):
+        task_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(task_id, int) or isinstance(task_id, bool):
+            errors.setdefault(str(index), {})['id'] = ["Expected a task id"]
+        ids.append(task_id)
+    if errors:
+        return error_response(errors)
+
+    tasks = {}
+    for start in range(0, len(ids), BATCH_CHUNK_SIZE):
+        tasks.update(Task.objects.in_bulk(ids[start:start + BATCH_CHUNK_SIZE]))
+    known_parents = existing_task_ids(item.get('parent_task_id') for item in cleaned_items)
+    pending = {task_id: item['parent_task_id'] for task_id, item in zip(ids, cleaned_items) if 'parent_task_id' in item}
+    for index, (task_id, item) in enumerate(zip(ids, cleaned_items)):
+        parent_id = item.get('parent_task_id')
+        if task_id not in tasks:
+            errors[str(index)] = {'id': ["Not found"]}
+        elif parent_id is not None and parent_id not in known_parents:
+            errors[str(index)] = {'parent_task_id': ["Unknown task"]}
+        elif parent_id is not None and creates_cycle(task_id, parent_id, pending):
+            errors[str(index)] = {'parent_task_id': ["A task cannot be moved under itself or one of its subtasks"]}
+    if errors:
+        return error_response(errors)
+
+    now = timezone.now()
+    fields = {'last_modified'}
+    parent_ids = set()
+    category_ids = set()
+    # Recurring tasks among these continue their series (continue_series skips the others)
+    completing = [
+        task_id for task_id, item in zip(ids, cleaned_items) if item.get('completed') and not tasks[task_id].completed
+    ]
+    with transaction.atomic():
+        resolved = resolve_category_ids(item.get('category_name') for item in cleaned_items)
+        for task_id, item in zip(ids, cleaned_items):
+            task = tasks[task_id]
+            parent_ids.add(task.parent_task_id)
+            category_ids.add(task.category_id)
+            old_schedule = schedule(task)
+            for field, value in apply_category(item, resolved).items():
+                setattr(task, field, value)
+                fields.add(field)
+            fields.update(follow_schedule(task, old_schedule))
+            task.last_modified = now
+            parent_ids.add(task.parent_task_id)
+            category_ids.add(task.category_id)
+        updated = Task.objects.bulk_update(tasks.values(), sorted(fields), batch_size=BATCH_CHUNK_SIZE)
+        refresh_paths(*pending)
+        refresh_parent_counts(*parent_ids)
+        if 'category_id' in fields:
+            refresh_category_counts(*category_ids)
+        for start in range(0, len(completing), BATCH_CHUNK_SIZE):
+            continue_series(completing[start:start + BATCH_CHUNK_SIZE], now)
+    invalidate_task_stats()
+    return json_response({'updated': updated})
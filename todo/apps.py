@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class TodoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'todo'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from . import signals  # noqa: F401
+        from .changes import install_change_log
+        from .metrics import install_query_timer
+        from .search import install_search_backend
+
+        post_migrate.connect(install_search_backend, sender=self)
+        post_migrate.connect(install_change_log, sender=self)
+        if getattr(settings, 'TODO_REQUEST_METRICS', True):
+            connection_created.connect(install_query_timer)
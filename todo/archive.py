@@ -0,0 +1,135 @@
+"""Moving finished task trees out of the active table, and back.
+
+A top-level task whose whole tree is completed and untouched for a while
+is moved, tree and all, into ArchivedTask by one INSERT ... SELECT and one
+DELETE per batch. The ids stay the same, so links and cursors keep working.
+The active table then only grows with open and recent work. Archiving
+whole trees means no parent's subtask counters ever cover archived rows.
+
+Un-completing an archived task brings its whole tree back first. Every
+query here goes to the write database, even while serving a GET request:
+reads inside the moves must see the moves' own writes.
+"""
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .categories import refresh_category_counts
+from .conditional import note_task_deleted
+from .models import ArchivedTask, Task, _path_step_expression, path_ids, path_step, subtree_q
+from .stats import ARCHIVED_COUNT_KEY, invalidate_task_stats
+
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_BATCH_SIZE = 200
+
+# Columns copied between the two tables; ArchivedTask adds archived_at, Task deleted_at
+COPIED_COLUMNS = [field.column for field in ArchivedTask._meta.concrete_fields if field.name != 'archived_at']
+
+
+def archive_changed():
+    cache.delete(ARCHIVED_COUNT_KEY)
+    invalidate_task_stats()
+
+
+def archivable_roots(cutoff):
+    """Top-level tasks completed and untouched since ``cutoff``, down to their last subtask"""
+    subtree = Task.all_objects.filter(
+        path__gte=_path_step_expression(OuterRef('id')),
+        path__lt=_path_step_expression(OuterRef('id') + 1),
+    )
+    unfinished = subtree.filter(Q(completed=False) | Q(last_modified__gte=cutoff) | Q(deleted_at__isnull=False))
+    return Task.objects.filter(
+        parent_task__isnull=True, completed=True, last_modified__lt=cutoff,
+    ).exclude(Exists(unfinished)).order_by('id')
+
+
+def _copy_rows(source, target, queryset, extra_column, extra_value):
+    """INSERT INTO target SELECT ... the rows of ``queryset``; returns the row count"""
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    attnames = {field.column: field.attname for field in source._meta.concrete_fields}
+    select_sql, params = queryset.order_by().values_list(
+        *(attnames[column] for column in COPIED_COLUMNS)
+    ).query.sql_with_params()
+    columns = ', '.join(quote(column) for column in (*COPIED_COLUMNS, extra_column))
+    sql = f"INSERT INTO {quote(target._meta.db_table)} ({columns}) SELECT *, %s FROM ({select_sql})"
+    with connection.cursor() as cursor:
+        # The extra value's placeholder comes before the subquery's
+        cursor.execute(sql, (extra_value, *params))
+        return cursor.rowcount
+
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """Archive up to ``batch_size`` trees; returns how many tasks moved"""
+    using = router.db_for_write(Task)
+    with transaction.atomic(using=using):
+        roots = list(archivable_roots(cutoff).using(using).values_list('id', flat=True)[:batch_size])
+        if not roots:
+            return 0
+        condition = Q(id__in=roots)
+        for root_id in roots:
+            condition |= subtree_q(path_step(root_id))
+        tasks = Task.all_objects.using(using).filter(condition)
+        category_ids = set(tasks.order_by().values_list('category_id', flat=True).distinct())
+        moved = _copy_rows(Task, ArchivedTask, tasks, 'archived_at', timezone.now())
+        # No signals or cascades needed: the whole trees go
+        tasks._raw_delete(using)
+        refresh_category_counts(*category_ids)
+    archive_changed()
+    return moved
+
+
+def archive_tasks(days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, max_batches=None, pause=0):
+    """Archive batches until no tree qualifies (or ``max_batches`` ran); returns the task count"""
+    cutoff = timezone.now() - timedelta(days=days)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def archived_tree(task):
+    """The archived tree ``task`` belongs to"""
+    root_id = path_ids(task.path)[0] if task.path else task.id
+    return ArchivedTask.objects.filter(Q(id=root_id) | subtree_q(path_step(root_id)))
+
+
+def restore_tree(task):
+    """Move the archived tree holding ``task`` back into Task; returns the Task for it"""
+    using = router.db_for_write(Task)
+    with transaction.atomic(using=using):
+        tree = archived_tree(task).using(using)
+        category_ids = set(tree.order_by().values_list('category_id', flat=True).distinct())
+        _copy_rows(ArchivedTask, Task, tree, 'deleted_at', None)
+        tree._raw_delete(using)
+        refresh_category_counts(*category_ids)
+        task = Task.objects.using(using).get(id=task.id)
+    archive_changed()
+    return task
+
+
+def delete_archived_tree(task):
+    """Delete ``task`` and its archived subtasks for good; returns the row count"""
+    using = router.db_for_write(ArchivedTask)
+    with transaction.atomic(using=using):
+        tree = ArchivedTask.objects.using(using).filter(Q(id=task.id) | subtree_q(task.subtree_path))
+        deleted = tree._raw_delete(using)
+        if task.parent_task_id:
+            # Archived trees are all completed, so both counters drop together
+            remaining = ArchivedTask.objects.using(using).filter(parent_task_id=task.parent_task_id).count()
+            ArchivedTask.objects.using(using).filter(id=task.parent_task_id).update(
+                subtask_total=remaining, subtask_completed=remaining,
+            )
+    archive_changed()
+    note_task_deleted()
+    return deleted
@@ -0,0 +1,59 @@
+"""ASGI middleware serving the task change feed (see todo.changes).
+
+Django's ASGI handler gives every request a thread of its own for the
+synchronous middleware, and keeps it for as long as a streaming response
+is open, so thousands of dashboards following the feed would mean
+thousands of idle threads. The feed needs neither sessions nor CSRF, so
+its requests are answered here before they reach Django, and an idle
+stream only costs a waiting coroutine.
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from django.urls import reverse
+
+from .changes import parse_change_id, stream_events
+
+
+class ChangeStreamMiddleware:
+    def __init__(self, application):
+        self.application = application
+        self.path = None
+
+    async def __call__(self, scope, receive, send):
+        if self.path is None:
+            self.path = reverse('task_events')
+        if scope['type'] != 'http' or scope['method'] != 'GET' or scope['path'] != self.path:
+            return await self.application(scope, receive, send)
+
+        headers = dict(scope['headers'])
+        query = parse_qs(scope['query_string'].decode('latin-1'))
+        after = parse_change_id(headers.get(b'last-event-id', b'').decode('latin-1') or query.get('after', [''])[0])
+        stream = asyncio.ensure_future(self.stream(after, send))
+        disconnect = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await asyncio.wait([stream, disconnect], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (stream, disconnect):
+                task.cancel()
+        if stream.done() and not stream.cancelled() and stream.exception():
+            raise stream.exception()
+
+    async def stream(self, after, send):
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Keep proxies from buffering the stream
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        async for text in stream_events(after):
+            await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
@@ -0,0 +1,173 @@
+"""Set-based bulk operations behind the dashboard's bulk action bar.
+
+Each action runs as one UPDATE or DELETE per chunk of ids, all inside one
+transaction, and returns the number of rows the statements reported. Ids are
+chunked so large selections stay under SQLite's bound-variable limit.
+"""
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .categories import refresh_category_counts
+from .conditional import note_task_deleted
+from .models import OPEN_RECURRING, Category, Task, path_step, refresh_parent_counts, refresh_paths, subtree_q
+from .recurrence import continue_series
+from .stats import invalidate_task_stats
+
+BULK_CHUNK_SIZE = 500
+# Each deleted task adds an id and a two-sided path range to the UPDATE
+SUBTREE_CHUNK_SIZE = 200
+
+BULK_ACTIONS = {
+    'complete': 'Mark Complete',
+    'uncomplete': 'Mark Incomplete',
+    'priority': 'Set Priority',
+    'category': 'Set Category',
+    'reparent': 'Move Under Task',
+    'delete': 'Delete',
+}
+
+
+class BulkActionError(ValueError):
+    """The requested bulk action or its value is invalid"""
+
+
+def chunked(ids, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def parse_ids(raw_ids):
+    """Distinct integer ids from form values, ignoring anything malformed"""
+    ids = set()
+    for raw in raw_ids:
+        try:
+            ids.add(int(raw))
+        except (TypeError, ValueError):
+            continue
+    return sorted(ids)
+
+
+def _parent_ids(ids):
+    parent_ids = set()
+    for chunk in chunked(ids):
+        parent_ids.update(
+            Task.objects.filter(id__in=chunk, parent_task__isnull=False).values_list('parent_task_id', flat=True)
+        )
+    return parent_ids
+
+
+def _category_ids(ids):
+    category_ids = set()
+    for chunk in chunked(ids):
+        category_ids.update(
+            Task.objects.filter(id__in=chunk).order_by().values_list('category_id', flat=True).distinct()
+        )
+    return category_ids
+
+
+def _open_recurring_ids(ids):
+    recurring = []
+    for chunk in chunked(ids):
+        recurring += Task.objects.filter(OPEN_RECURRING, id__in=chunk).values_list('id', flat=True)
+    return recurring
+
+
+def _update(ids, **values):
+    values['last_modified'] = timezone.now()
+    return sum(Task.objects.filter(id__in=chunk).update(**values) for chunk in chunked(ids))
+
+
+def _resolve_value(action, value, ids):
+    """Validate the action's value and return the fields to update"""
+    if action == 'complete':
+        return {'completed': True}
+    if action == 'uncomplete':
+        return {'completed': False}
+    if action == 'priority':
+        if value not in dict(Task.PRIORITY_CHOICES):
+            raise BulkActionError("Choose a priority")
+        return {'priority': value}
+    if action == 'category':
+        if not value:
+            return {'category': None}
+        category = Category.objects.filter(id=value).first() if str(value).isdigit() else None
+        if category is None:
+            raise BulkActionError("Choose an existing category")
+        return {'category': category}
+    if action == 'reparent':
+        if not value:
+            return {'parent_task': None}
+        parent = Task.objects.filter(id=value).first() if str(value).isdigit() else None
+        if parent is None:
+            raise BulkActionError("Choose an existing parent task")
+        # The new parent must not be one of the moved tasks or below one of them
+        if set(parent.get_ancestor_ids(include_self=True)) & set(ids):
+            raise BulkActionError("A task cannot be moved under itself or one of its subtasks")
+        return {'parent_task': parent}
+    raise BulkActionError(f"Unknown bulk action: {action}")
+
+
+def delete_subtrees(task_ids):
+    """Soft-delete tasks together with everything below them; returns the row count.
+
+    Each chunk is one UPDATE over the tasks' ids and path ranges that sets
+    deleted_at, which hides the rows from Task.objects at once. Removing
+    them (index and search maintenance) is left to the purge worker in
+    todo.purge. Category counts, which leave flagged tasks out, stats and
+    the dashboard's deletion stamp are updated here directly.
+    """
+    ids = parse_ids(task_ids)
+    deleted = 0
+    parent_ids = set()
+    category_ids = set()
+    now = timezone.now()
+    using = router.db_for_write(Task)
+    with transaction.atomic(using=using):
+        for chunk in chunked(ids, SUBTREE_CHUNK_SIZE):
+            rows = Task.objects.using(using).filter(id__in=chunk).values_list('id', 'parent_task_id', 'path')
+            condition = Q(id__in=chunk)
+            for task_id, parent_id, path in rows:
+                condition |= subtree_q(path + path_step(task_id))
+                parent_ids.add(parent_id)
+            flagged = Task.objects.using(using).filter(condition)
+            category_ids.update(flagged.order_by().values_list('category_id', flat=True).distinct())
+            deleted += flagged.update(deleted_at=now)
+        refresh_parent_counts(*parent_ids)
+        refresh_category_counts(*category_ids)
+    if deleted:
+        invalidate_task_stats()
+        note_task_deleted()
+    return deleted
+
+
+def apply_bulk_action(action, task_ids, value=None):
+    """Run ``action`` on the given task ids and return the affected row count"""
+    ids = parse_ids(task_ids)
+    if action not in BULK_ACTIONS:
+        raise BulkActionError(f"Unknown bulk action: {action}")
+    if not ids:
+        return 0
+
+    if action == 'delete':
+        # Includes subtasks removed along with their parents
+        return delete_subtrees(ids)
+
+    with transaction.atomic():
+        parent_ids = _parent_ids(ids)
+        values = _resolve_value(action, value, ids)
+        category_ids = _category_ids(ids) if 'category' in values else set()
+        recurring_ids = _open_recurring_ids(ids) if values.get('completed') else []
+        affected = _update(ids, **values)
+        # Each completed recurring task hands over to its next occurrence
+        for chunk in chunked(recurring_ids):
+            continue_series(chunk, timezone.now())
+        if 'parent_task' in values:
+            refresh_paths(*ids)
+            if values['parent_task'] is not None:
+                parent_ids.add(values['parent_task'].id)
+        refresh_parent_counts(*parent_ids)
+        if 'category' in values:
+            refresh_category_counts(*category_ids, values['category'] and values['category'].id)
+    invalidate_task_stats()
+    return affected
@@ -0,0 +1,168 @@
+"""Category lookups served from an in-process snapshot.
+
+The category table is small and rarely written, so each process keeps every
+category's id and name in memory, plus which of them have tasks. A token in
+the shared cache is replaced whenever a category is written or gains its
+first task or loses its last, and a process reloads its snapshot (one query)
+when it sees a new token.
+Names are matched case-insensitively the way the database's unique index
+on LOWER(name) matches them: SQLite's LOWER() folds ASCII letters only, so
+category_key does too.
+"""
+import threading
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models.functions import Lower
+
+from .models import Category, title_key
+
+CATEGORIES_VERSION_KEY = 'todo:categories_version'
+
+
+def category_key(name):
+    """``name`` as the unique index on LOWER(name) sees it"""
+    return title_key(name.strip())
+
+
+def categories_version():
+    """Token that changes whenever the snapshot has to be reloaded"""
+    version = cache.get(CATEGORIES_VERSION_KEY)
+    if version is None:
+        # After a cache flush or restart nothing is known to be current
+        cache.add(CATEGORIES_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(CATEGORIES_VERSION_KEY)
+    return version
+
+
+def invalidate_categories(**kwargs):
+    """Make every process reload its snapshot once the current transaction commits.
+
+    Usable as a signal receiver. Replacing the token before the commit would
+    let another process load the old rows under the new token.
+    """
+    transaction.on_commit(lambda: cache.set(CATEGORIES_VERSION_KEY, uuid.uuid4().hex, None))
+
+
+class CategorySnapshot:
+    def __init__(self, version, rows):
+        self.version = version
+        # (id, name, has tasks), alphabetical
+        self.rows = sorted(rows, key=lambda row: (category_key(row[1]), row[0]))
+        self.ids = {}
+        for category_id, name, _ in self.rows:
+            self.ids.setdefault(category_key(name), category_id)
+        self.with_tasks = {category_id for category_id, _, has_tasks in self.rows if has_tasks}
+
+    def id_for(self, name):
+        return self.ids.get(category_key(name)) if name else None
+
+    def categories(self, with_tasks=False):
+        return [Category(id=category_id, name=name) for category_id, name, _ in self.rows
+                if not with_tasks or category_id in self.with_tasks]
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def category_snapshot():
+    global _snapshot
+    version = categories_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            categories = Category.objects.all()
+            rows = categories.values_list('id', 'name', 'task_count')
+            snapshot = CategorySnapshot(version, [(pk, name, count > 0) for pk, name, count in rows])
+            # Rows read inside a transaction may yet be rolled back
+            if not connections[categories.db].in_atomic_block:
+                _snapshot = snapshot
+    return snapshot
+
+
+async def acategory_snapshot():
+    """Async version of category_snapshot(); async views pass the result on explicitly"""
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != categories_version():
+        snapshot = await sync_to_async(category_snapshot)()
+    return snapshot
+
+
+def category_id_for(name):
+    """Id of the category called ``name`` in any letter case, or None"""
+    return category_snapshot().id_for(name)
+
+
+def get_or_create_category_id(name):
+    """Id of the category called ``name``, creating it if there is none"""
+    category_id = category_id_for(name)
+    if category_id is not None:
+        return category_id
+    try:
+        with transaction.atomic():
+            return Category.objects.create(name=name.strip()).id
+    except IntegrityError:
+        # Created meanwhile by another process
+        return Category.objects.alias(key=Lower('name')).get(key=category_key(name)).id
+
+
+def resolve_category_ids(names):
+    """Map each given name to its category id, creating the missing categories in one insert"""
+    # One snapshot for every name: inside a transaction it is not kept, and would be reloaded per call
+    snapshot = category_snapshot()
+    # In order of first appearance, so the first spelling names a new category
+    resolved = {}
+    for name in names:
+        if name and name not in resolved:
+            resolved[name] = snapshot.id_for(name)
+    missing = {}
+    for name, category_id in resolved.items():
+        if category_id is None:
+            missing.setdefault(category_key(name), name.strip())
+    if missing:
+        try:
+            with transaction.atomic():
+                # bulk_create sends no post_save signals
+                created = Category.objects.bulk_create([Category(name=name) for name in missing.values()])
+        except IntegrityError:
+            # Some were created meanwhile by another process; take them one by one
+            created = [Category(id=get_or_create_category_id(name), name=name) for name in missing.values()]
+        invalidate_categories()
+        ids = {category_key(category.name): category.id for category in created}
+        resolved.update({name: ids[category_key(name)] for name, category_id in resolved.items() if category_id is None})
+    return resolved
+
+
+def all_categories():
+    """Every category (id and name only), alphabetical"""
+    return category_snapshot().categories()
+
+
+def categories_with_tasks():
+    """The categories that have at least one task, alphabetical"""
+    return category_snapshot().categories(with_tasks=True)
+
+
+def refresh_category_counts(*category_ids, chunk_size=500):
+    """Bring task_count of the given categories back in step with their tasks.
+
+    The snapshot is only invalidated when a category gains its first task or
+    loses its last, which is all the filter list depends on.
+    """
+    category_ids = sorted({category_id for category_id in category_ids if category_id is not None})
+    if not category_ids:
+        return
+    with_tasks = set()
+    # Read back through the connection that wrote the counts
+    using = router.db_for_write(Category)
+    for start in range(0, len(category_ids), chunk_size):
+        chunk = Category.objects.using(using).filter(id__in=category_ids[start:start + chunk_size])
+        chunk.refresh_task_counts()
+        with_tasks.update(chunk.filter(task_count__gt=0).values_list('id', flat=True))
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != categories_version() or \
+            with_tasks != snapshot.with_tasks.intersection(category_ids):
+        invalidate_categories()
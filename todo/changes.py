@@ -0,0 +1,234 @@
+"""Change feed of task writes, for live dashboard updates.
+
+SQLite triggers on ``todo_task`` append a TaskChange row for every task that
+is created, soft-deleted (or deleted outright) or edited in a way its card
+shows. Like the search index triggers, they also see ``QuerySet.update()``,
+``bulk_create()`` and the importer's raw inserts, which model signals would
+miss. SQLite serializes writers, so entries become visible in id order and
+a client that has seen id N has seen everything before it.
+
+Each ASGI worker runs a single ChangeFeed poller per event loop. It reads
+new entries once a second and wakes the connected streams, which serve them
+from memory. An idle stream costs one waiting coroutine and no queries when
+served by todo.asgi.ChangeStreamMiddleware. Through Django's handler it would
+also hold a thread for as long as it stays open.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import weakref
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import TaskChange
+from .stats import aget_task_stats
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0
+FEED_BATCH_SIZE = 500
+# Entries kept in memory per worker; streams further behind read the table
+FEED_BUFFER_SIZE = 5000
+# Seconds between keep-alive comments on an idle stream, and the reconnection
+# delay clients are given (when each response is one poll, the poll interval)
+EVENTS_KEEPALIVE = 15
+EVENTS_RETRY_MS = 3000
+EVENTS_POLL_RETRY_MS = 5000
+
+
+def change_log_retention():
+    return getattr(settings, 'TODO_CHANGE_LOG_RETENTION', timedelta(days=1))
+
+
+# Columns a task card shows; changes to only path or last_modified are not logged
+CARD_COLUMNS = (
+    'title', 'completed', 'due_date', 'description', 'notes', 'priority', 'category_id',
+    'parent_task_id', 'subtask_total', 'subtask_completed', 'recurrence', 'recurrence_interval',
+)
+
+
+def trigger_sql():
+    t = TaskChange._meta.db_table
+    now = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    changed = ' OR '.join(f'old.{column} IS NOT new.{column}' for column in (*CARD_COLUMNS, 'deleted_at'))
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {t}_ai AFTER INSERT ON todo_task BEGIN "
+        f"INSERT INTO {t}(task_id, kind, path, changed_at) VALUES (new.id, 'created', new.path, {now}); END",
+        # Soft deletes are updates of deleted_at; flagged rows are already reported gone
+        f"CREATE TRIGGER IF NOT EXISTS {t}_au AFTER UPDATE ON todo_task "
+        f"WHEN old.deleted_at IS NULL AND ({changed}) BEGIN "
+        f"INSERT INTO {t}(task_id, kind, path, changed_at) VALUES "
+        f"(new.id, CASE WHEN new.deleted_at IS NULL THEN 'updated' ELSE 'deleted' END, new.path, {now}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {t}_ad AFTER DELETE ON todo_task WHEN old.deleted_at IS NULL BEGIN "
+        f"INSERT INTO {t}(task_id, kind, path, changed_at) VALUES (old.id, 'deleted', old.path, {now}); END",
+    ]
+
+
+def install_change_log(using='default', **kwargs):
+    """post_migrate hook: (re)create the triggers, which table rebuilds drop"""
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        for statement in trigger_sql():
+            cursor.execute(statement)
+
+
+def latest_change_id():
+    return TaskChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+async def alatest_change_id():
+    return await TaskChange.objects.order_by('-id').values_list('id', flat=True).afirst() or 0
+
+
+async def achanges_after(after, limit=FEED_BATCH_SIZE):
+    """``(entries after the id, whether some in between were pruned)``"""
+    changes = [change async for change in TaskChange.objects.filter(id__gt=after).order_by('id')[:limit]]
+    # Ids are never reused (AUTOINCREMENT) and only the oldest entries are pruned
+    return changes, bool(after and changes and changes[0].id > after + 1)
+
+
+def prune_change_log(now=None):
+    """Drop entries older than TODO_CHANGE_LOG_RETENTION, keeping the newest; returns how many went"""
+    cutoff = (now or timezone.now()) - change_log_retention()
+    newest = latest_change_id()
+    deleted, _ = TaskChange.objects.filter(changed_at__lt=cutoff, id__lt=newest).delete()
+    return deleted
+
+
+class ChangeFeed:
+    """Polls the change log for the streams of one event loop"""
+
+    def __init__(self):
+        self.changes = deque(maxlen=FEED_BUFFER_SIZE)
+        self.last_id = None
+        self.stats = None
+        self.listeners = 0
+        self.poller = None
+        self.changed = asyncio.Condition()
+
+    async def start(self):
+        if self.last_id is None:
+            self.last_id = await alatest_change_id()
+        if self.poller is None or self.poller.done():
+            # A fresh context: the poller outlives the request that started it
+            self.poller = asyncio.get_running_loop().create_task(self.poll(), context=contextvars.Context())
+
+    async def poll(self):
+        while self.listeners:
+            changes = []
+            try:
+                changes, _ = await achanges_after(self.last_id)
+                if changes:
+                    # Computed once here rather than by every stream
+                    self.stats = await aget_task_stats()
+            except Exception:
+                logger.exception("Polling the change log failed")
+            if changes:
+                self.changes.extend(changes)
+                self.last_id = changes[-1].id
+                async with self.changed:
+                    self.changed.notify_all()
+            if len(changes) < FEED_BATCH_SIZE:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def next_batch(self, after, timeout):
+        """``(entries after the id, reset)``, waiting up to ``timeout`` seconds for some"""
+        if after > self.last_id:
+            # From another database, or one that was recreated
+            return [], True
+        if after == self.last_id:
+            async with self.changed:
+                try:
+                    await asyncio.wait_for(self.changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return [], False
+        if self.changes and self.changes[0].id <= after + 1:
+            return [change for change in self.changes if change.id > after][:FEED_BATCH_SIZE], False
+        # Further behind than the buffer reaches
+        return await achanges_after(after)
+
+
+_feeds = weakref.WeakKeyDictionary()
+
+
+def change_feed():
+    """The ChangeFeed of the running event loop"""
+    loop = asyncio.get_running_loop()
+    feed = _feeds.get(loop)
+    if feed is None:
+        feed = _feeds[loop] = ChangeFeed()
+    return feed
+
+
+async def follow_changes(after, timeout):
+    """Async iterator of ``(entries, stats, reset)`` after ``after``, with an empty batch every ``timeout`` seconds.
+
+    ``stats`` are the task stats as of the batch, when the feed has them.
+    """
+    feed = change_feed()
+    feed.listeners += 1
+    try:
+        while True:
+            # Also restarts the poller if it stopped while the last listener was leaving
+            await feed.start()
+            changes, reset = await feed.next_batch(after, timeout)
+            yield changes, feed.stats, reset
+            if reset:
+                return
+            if changes:
+                after = changes[-1].id
+    finally:
+        feed.listeners -= 1
+
+
+def parse_change_id(value):
+    """The change id a client resumes from, or None"""
+    return int(value) if value and value.isdigit() else None
+
+
+async def stream_events(after):
+    """Server-sent events text for the changes after ``after``, for as long as the client stays"""
+    if after is None:
+        after = await alatest_change_id()
+    yield f"retry: {EVENTS_RETRY_MS}\n\n"
+    async for changes, stats, reset in follow_changes(after, EVENTS_KEEPALIVE):
+        yield await event_text(changes, stats, reset)
+        if reset:
+            return
+
+
+async def poll_events(after):
+    """Server-sent events text for the changes after ``after`` that are there now"""
+    latest = await alatest_change_id()
+    if after is None:
+        after = latest
+    changes, reset = await achanges_after(after)
+    return f"retry: {EVENTS_POLL_RETRY_MS}\n\n" + await event_text(changes, None, reset or after > latest)
+
+
+async def event_text(changes, stats, reset):
+    if reset:
+        # The changes the client missed are gone; it has to reload
+        return "event: reset\ndata: {}\n\n"
+    if not changes:
+        return ": keep-alive\n\n"
+    return change_event(changes, stats if stats is not None else await aget_task_stats())
+
+
+def change_event(changes, stats):
+    """One server-sent event for a batch of entries; clients resume from its id"""
+    data = json.dumps({
+        'changes': [
+            {'task': change.task_id, 'kind': change.kind, 'ancestors': change.ancestor_ids()}
+            for change in changes
+        ],
+        'stats': stats,
+    })
+    return f"id: {changes[-1].id}\nevent: changes\ndata: {data}\n\n"
@@ -0,0 +1,104 @@
+"""Validators for conditional GETs of the dashboard.
+
+The dashboard only changes when tasks or categories are written or
+deleted, or when time crosses a due date or midnight (due badges, ordering
+buckets and the due-today count all move then). ``dashboard_state`` sums
+all of that up in one aggregate query, so an unchanged page can be
+answered with a 304 before anything is sorted or rendered.
+
+The upcoming occurrences of recurring tasks (todo.recurrence) are not
+stored, and come and go with the clock alone. They are computed as of
+occurrence_clock(), so while any series is open its tick goes into the seed
+and the Last-Modified date; nothing about them needs computing here.
+"""
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .categories import categories_version
+from .models import SERIES_TAIL, Task
+from .recurrence import occurrence_clock
+
+TASKS_DELETED_KEY = 'todo:tasks_deleted_at'
+
+
+def note_task_deleted(**kwargs):
+    """Remember when a task was last deleted; usable as a signal receiver"""
+    cache.set(TASKS_DELETED_KEY, timezone.now(), None)
+
+
+def last_deleted_at(now):
+    """When a task was last deleted, or ``now`` if that is no longer known"""
+    # After a cache flush or restart a deletion may have gone unrecorded
+    cache.add(TASKS_DELETED_KEY, now, None)
+    return cache.get(TASKS_DELETED_KEY, now)
+
+
+def _state_aggregates(now):
+    return {
+        'count': Count('id'),
+        'modified': Max('last_modified'),
+        # Grows each time a due date passes, so badges and buckets are re-rendered
+        'passed': Count('id', filter=Q(due_date__lt=now)),
+        'last_passed': Max('due_date', filter=Q(due_date__lt=now)),
+        'tails': Count('id', filter=SERIES_TAIL),
+    }
+
+
+def _store_state(request, tasks, now):
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    # Replaced on every category write
+    categories = categories_version()
+    deleted_at = last_deleted_at(now)
+    # Virtual occurrences only move when this ticks
+    clock = occurrence_clock(now) if tasks['tails'] else None
+    seed = [tasks['count'], tasks['modified'], tasks['passed'], today_start, deleted_at, categories, clock]
+    last_modified = max(
+        moment for moment in (tasks['modified'], tasks['last_passed'], today_start, deleted_at, clock) if moment
+    )
+    state = request._dashboard_state = (seed, last_modified)
+    return state
+
+
+def dashboard_state(request):
+    """``(etag seed, last modified)`` of the task data, computed once per request"""
+    state = getattr(request, '_dashboard_state', None)
+    if state is None:
+        now = timezone.now()
+        state = _store_state(request, Task.objects.order_by().aggregate(**_state_aggregates(now)), now)
+    return state
+
+
+async def adashboard_state(request):
+    """Async version of dashboard_state(); afterwards dashboard_state() is free"""
+    state = getattr(request, '_dashboard_state', None)
+    if state is None:
+        now = timezone.now()
+        state = _store_state(request, await Task.objects.order_by().aaggregate(**_state_aggregates(now)), now)
+    return state
+
+
+def async_condition(prepare, etag_func=None, last_modified_func=None):
+    """``condition`` for async views whose validators need the database.
+
+    Django calls the validator functions synchronously, so ``prepare`` is
+    awaited first to load and cache on the request whatever they read.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            await prepare(request)
+            return await conditional_view(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+def make_etag(seed, params):
+    """Hash of the data state and the normalized request parameters"""
+    return hashlib.md5(repr((seed, sorted(params.items()))).encode()).hexdigest()
@@ -1,26 +1,7 @@
-from .models import Task
-from django.utils import timezone
+from .stats import get_task_stats
 
 def task_stats(request):
     """Make task statistics available on every page"""
-    total_tasks = Task.objects.count()
-    completed_tasks = Task.objects.filter(completed=True).count()
-    
-    # Calculate overdue and today's tasks
-    now = timezone.now()
-    overdue_tasks = Task.objects.filter(
-        completed=False,
-        due_date__lt=now
-    ).count()
-    
-    today_tasks = Task.objects.filter(
-        completed=False,
-        due_date__date=now.date()
-    ).count()
-    
-    return {
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
-        'overdue_tasks': overdue_tasks,
-        'today_tasks': today_tasks,
-    }
+    # Async views fetch them beforehand; templates render without touching the database
+    stats = getattr(request, 'task_stats', None)
+    return stats if stats is not None else get_task_stats()
@@ -0,0 +1,103 @@
+"""Task card rendering backed by a fragment cache.
+
+A card only changes when its task, its category or one of its subtasks
+does, so the rendered HTML is cached under a key built from those and
+never needs explicit invalidation. The two per-request parts, the due-date
+badge colour (which moves as time passes) and the CSRF token, are left as
+placeholders in the cached HTML and filled in on every render.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .metrics import CARD_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+CARD_TEMPLATE = 'todo/_task_card.html'
+CSRF_PLACEHOLDER = '__todo_csrf_token__'
+DUE_CLASS_PLACEHOLDER = '__todo_due_class__'
+
+
+def card_cache():
+    return caches[getattr(settings, 'TODO_FRAGMENT_CACHE', 'default')]
+
+
+def subtask_stamp(task):
+    """Changes whenever a subtask is added, removed or edited"""
+    subtasks = task.subtasks.all()  # prefetched by for_dashboard()
+    latest = max((subtask.last_modified for subtask in subtasks), default=None)
+    return f"{len(subtasks)}:{latest.isoformat() if latest else ''}"
+
+
+def card_cache_key(task):
+    return make_template_fragment_key('task_card', [
+        task.id,
+        task.last_modified.isoformat(),
+        task.subtask_total,
+        task.subtask_completed,
+        # Rolled-up progress of deeper levels (attach_subtree_counts)
+        getattr(task, 'descendant_total', None),
+        getattr(task, 'descendant_completed', None),
+        subtask_stamp(task),
+        task.category.name if task.category_id else '',
+        # Archived cards leave out the edit link
+        task.archived,
+    ])
+
+
+def due_badge_class(task, now):
+    if not task.due_date:
+        return ''
+    if task.due_date < now:
+        return 'bg-red-100 text-red-800'
+    # Task.is_due_today(), but at ``now`` rather than the current time
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if not task.completed and task.due_date < today_start + timedelta(days=1):
+        return 'bg-yellow-100 text-yellow-800'
+    return 'bg-blue-100 text-blue-800'
+
+
+def render_task_cards(tasks, now, request=None):
+    """HTML of each task's card, rendering only the ones missing from the cache.
+
+    ``tasks`` should come from ``for_dashboard()``. Cards showing a search
+    snippet depend on the query, and virtual occurrences of recurring tasks
+    come and go with the clock; both are always rendered.
+    """
+    cache = card_cache()
+    keys = {
+        task.id: card_cache_key(task) for task in tasks
+        if not task.virtual and not getattr(task, 'search_snippet', None)
+    }
+    cached = cache.get_many(list(keys.values()))
+    token = get_token(request) if request is not None else ''
+    fresh = {}
+    cards = []
+    for task in tasks:
+        key = keys.get(task.id)
+        html = cached.get(key) if key else None
+        if html is None:
+            html = render_to_string(CARD_TEMPLATE, {
+                'task': task,
+                'csrf_token': CSRF_PLACEHOLDER,
+                'due_badge_class': DUE_CLASS_PLACEHOLDER,
+            })
+            if key:
+                fresh[key] = html
+        html = html.replace(CSRF_PLACEHOLDER, token).replace(DUE_CLASS_PLACEHOLDER, due_badge_class(task, now))
+        cards.append(mark_safe(html))
+    if fresh:
+        cache.set_many(fresh)
+
+    hits, misses = len(cached), len(keys) - len(cached)
+    CARD_CACHE_LOOKUPS.inc('hit', hits)
+    CARD_CACHE_LOOKUPS.inc('miss', misses)
+    logger.debug("Task cards: %d cache hits, %d misses", hits, misses)
+    return cards
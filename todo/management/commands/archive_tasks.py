@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from todo.archive import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completed task trees untouched for a number of days into the archive, in batches; "
+        "meant to run from cron (or with --watch) and safe to stop and rerun at any point"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=ARCHIVE_AFTER_DAYS,
+            help=f"Archive trees whose tasks were all completed and last changed this many days ago "
+                 f"(default: {ARCHIVE_AFTER_DAYS})",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+            help=f"Top-level tasks moved per transaction, with their subtasks (default: {ARCHIVE_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help="Seconds to wait between batches so request writes get the lock (default: 0.05)",
+        )
+        parser.add_argument(
+            '--watch', action='store_true',
+            help="Keep running and archive trees as they come of age",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=3600.0,
+            help="With --watch, seconds between runs (default: 3600)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                start = time.perf_counter()
+                moved = archive_tasks(options['days'], options['batch_size'], pause=options['pause'])
+                if moved:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Archived {moved} task(s) in {time.perf_counter() - start:.1f} s"
+                    ))
+                if not options['watch']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            # Every finished batch is committed; the rest stays active until the next run
+            self.stdout.write("Stopped; rerun to archive the remaining tasks")
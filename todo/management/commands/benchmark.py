@@ -0,0 +1,165 @@
+import json
+import platform
+import sqlite3
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+import django
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from todo.models import Task, attach_subtree_counts
+from todo.seeding import seed_tasks
+from todo.stats import compute_task_stats
+
+DEFAULT_SIZES = '1000,10000'
+
+
+class QueryCounter:
+    """execute_wrapper that counts queries on every connection"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed throwaway test databases of increasing size and report latency percentiles, "
+        "query counts and peak memory for each view and model helper"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default=DEFAULT_SIZES,
+            help=f"Comma-separated task counts to benchmark, e.g. 1000,10000,100000,1000000 (default: {DEFAULT_SIZES})",
+        )
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per benchmark (default: 20)")
+        parser.add_argument('--output', '-o', help="Write the results as JSON to this file")
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help="Keep the stats and task card caches between runs instead of clearing them before each one",
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the generated data")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        # Benchmarks run against test databases so real data is never touched
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False, aliases=set(connections))
+        try:
+            results = {}
+            for size in sizes:
+                seed_tasks(size - Task.objects.count(), seed=options['seed'])
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{Task.objects.count()} tasks"))
+                results[size] = self.run_size(options['repeat'], options['warm_cache'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'meta': self.metadata(options, sizes), 'results': results}, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def benchmarks(self):
+        """(name, callable) pairs; each callable performs one request or helper call"""
+        client = Client()
+        parent = Task.objects.filter(subtask_total__gt=0).order_by('id').first() or Task.objects.order_by('id').first()
+        bulk_ids = list(Task.objects.order_by('id').values_list('id', flat=True)[:100])
+        toggle_url = reverse('toggle_complete', args=[parent.id])
+        bulk_state = {'action': 'complete'}
+
+        def bulk_action():
+            client.post(reverse('bulk_action'), {'action': bulk_state['action'], 'task_ids': bulk_ids})
+            bulk_state['action'] = 'uncomplete' if bulk_state['action'] == 'complete' else 'complete'
+
+        def subtask_progress():
+            tasks = list(Task.objects.filter(subtask_total__gt=0).order_by('id')[:50])
+            attach_subtree_counts(tasks)
+            return [task.get_subtask_progress() for task in tasks]
+
+        return [
+            ('index', lambda: client.get(reverse('index'))),
+            ('index: high priority, open', lambda: client.get(reverse('index'), {'priority': 'H', 'completed': 'false'})),
+            ('index: due today', lambda: client.get(reverse('index'), {'today': 'true'})),
+            ('index: search', lambda: client.get(reverse('index'), {'q': 'task'})),
+            ('edit form', lambda: client.get(reverse('edit_task', args=[parent.id]))),
+            ('toggle_complete', lambda: client.post(toggle_url)),
+            ('bulk_action: 100 tasks', bulk_action),
+            ('api: task list', lambda: client.get(reverse('api_task_list'))),
+            ('task_stats', lambda: compute_task_stats(timezone.now())),
+            ('get_subtask_progress: 50 parents', subtask_progress),
+        ]
+
+    def run_size(self, repeat, warm_cache):
+        results = {}
+        for name, benchmark in self.benchmarks():
+            benchmark()  # warm-up: imports, template loading, connections
+            timings = []
+            for _ in range(repeat):
+                if not warm_cache:
+                    self.clear_caches()
+                start = time.perf_counter()
+                benchmark()
+                timings.append((time.perf_counter() - start) * 1000)
+
+            # One more run to count queries and trace memory, which slows it down
+            if not warm_cache:
+                self.clear_caches()
+            counter = QueryCounter()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                tracemalloc.start()
+                benchmark()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+            results[name] = self.summarize(timings, counter.count, peak)
+            result = results[name]
+            self.stdout.write(
+                f"  {name:<36} p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+                f"p99 {result['p99_ms']:8.1f} ms  {result['queries']:3d} queries  {result['peak_kib']:8.0f} KiB"
+            )
+        return results
+
+    def summarize(self, timings, queries, peak):
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+        return {
+            'runs': len(timings),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'max_ms': round(max(timings), 3),
+            'queries': queries,
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def clear_caches(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def metadata(self, options, sizes):
+        return {
+            'created_at': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'sizes': sizes,
+            'repeat': options['repeat'],
+            'warm_cache': options['warm_cache'],
+            'seed': options['seed'],
+        }
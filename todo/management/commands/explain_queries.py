@@ -0,0 +1,122 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.utils import timezone
+
+from todo.models import Task
+from todo.pagination import page_query, paginate
+from todo.seeding import seed_tasks
+from todo.stats import compute_task_stats
+from todo.views import TASKS_PER_PAGE, filter_tasks
+
+# What each check is expected to do: read a bounded part of an index, or
+# make a full pass over the table (or a whole index)
+INDEX = 'index'
+FULL_PASS = 'full pass'
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the query plan and timing of the dashboard, task_stats and parent-selection "
+        "queries, flagging any that scan the task table instead of using an index"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help="Explain against a throwaway test database seeded with this many synthetic tasks "
+                 "(e.g. 1000000) instead of the configured database",
+        )
+        parser.add_argument(
+            '--strict', action='store_true',
+            help="Exit with an error if a query expected to use an index scans the table",
+        )
+
+    def handle(self, *args, **options):
+        if not options['seed']:
+            self.explain_all(options['strict'])
+            return
+        # Seeded rows go to test databases so real data is never touched
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False, aliases=set(connections))
+        try:
+            self.stdout.write(f"Seeding {options['seed']} tasks into a test database...")
+            seed_tasks(options['seed'])
+            self.explain_all(options['strict'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def explain_all(self, strict):
+        now = timezone.now()
+        some_parent = Task.objects.filter(subtask_total__gt=0).first()
+        dashboard, _ = filter_tasks({}, now)
+        active_high, _ = filter_tasks({'completed': 'false', 'priority': 'H'}, now)
+        due_today, _ = filter_tasks({'today': 'true'}, now)
+        completed, _ = filter_tasks({'completed': 'true'}, now)
+        first_page = paginate(dashboard, {}, TASKS_PER_PAGE, now)
+
+        # (label, queryset, expectation); dashboard checks are the queries paginate() runs
+        checks = [
+            ('dashboard: default page', page_query(dashboard.for_dashboard(), {}, TASKS_PER_PAGE), INDEX),
+            ('dashboard: active + high priority', page_query(active_high, {}, TASKS_PER_PAGE), INDEX),
+            ('dashboard: due today', page_query(due_today, {}, TASKS_PER_PAGE), INDEX),
+            ('dashboard: completed', page_query(completed, {}, TASKS_PER_PAGE), INDEX),
+            ('parent selection: first page', Task.objects.parent_candidates()[:20], INDEX),
+            ('parent selection: prefix', Task.objects.parent_candidates('ta')[:20], INDEX),
+            ('subtask counters', Task.objects.filter(parent_task_id=some_parent.id if some_parent else 0, completed=True), INDEX),
+        ]
+        if first_page.has_next():
+            next_page = page_query(dashboard, {'after': first_page.next_cursor}, TASKS_PER_PAGE)
+            checks.insert(1, ('dashboard: next page', next_page, INDEX))
+        if some_parent:
+            checks.append(('subtree: descendants', some_parent.descendants(), INDEX))
+
+        self.stdout.write(f"{Task.objects.count()} tasks\n")
+        failures = []
+        for label, queryset, expected in checks:
+            plan = queryset.explain()
+            start = time.perf_counter()
+            list(queryset.values_list('id', flat=True))
+            if self.report(label, plan, time.perf_counter() - start, expected):
+                failures.append(label)
+
+        # The sidebar counts are one conditional aggregate over every row
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            compute_task_stats(now)
+            elapsed = time.perf_counter() - start
+        sql = next(query['sql'] for query in queries if f'FROM "{Task._meta.db_table}"' in query['sql'])
+        self.report('task_stats: aggregate', self.explain_sql(sql), elapsed, FULL_PASS)
+
+        if failures and strict:
+            raise CommandError(f"Table scans in: {', '.join(failures)}")
+
+    def report(self, label, plan, elapsed, expected):
+        """Print one check; returns whether it scanned where an index was expected"""
+        verdict = self.classify(plan)
+        failed = verdict == 'TABLE SCAN' and expected == INDEX
+        note = ", expected: full pass" if expected == FULL_PASS else ""
+        style = self.style.ERROR if failed else self.style.SUCCESS
+        self.stdout.write(style(f"{label}: {verdict} ({elapsed * 1000:.1f} ms{note})"))
+        for line in plan.splitlines():
+            self.stdout.write(f"    {line}")
+        return failed
+
+    def explain_sql(self, sql):
+        """The plan of a statement that ran elsewhere, formatted like QuerySet.explain()"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def classify(self, plan):
+        """Summarize how a SQLite plan reads todo_task"""
+        if 'SEARCH todo_task ' in plan:
+            return 'INDEX SEARCH'
+        if 'SCAN todo_task USING' in plan:
+            return 'INDEX SCAN'
+        return 'TABLE SCAN'
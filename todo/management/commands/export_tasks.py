@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from todo.transfer import EXPORT_CHUNK_SIZE, FORMATS, export_lines, export_rows
+
+
+class Command(BaseCommand):
+    help = "Stream every task to CSV or JSON Lines with constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv', help="Output format (default: csv)")
+        parser.add_argument('--output', '-o', help="File to write (default: stdout)")
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help=f"Rows fetched per database round trip (default: {EXPORT_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        self.count = 0
+        lines = export_lines(options['format'], self.counted(export_rows(chunk_size=options['chunk_size'])))
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as out:
+                out.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(f"Exported {self.count} task(s)"))
+
+    def counted(self, rows):
+        for row in rows:
+            self.count += 1
+            yield row
@@ -0,0 +1,54 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from todo.models import Task
+from todo.transfer import FORMATS, IMPORT_BATCH_SIZE, TaskImporter, TaskImportError, read_rows
+
+
+class Command(BaseCommand):
+    help = "Import tasks from CSV or JSON Lines in batched inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or - for stdin")
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help="Input format (default: guessed from the file extension, csv for stdin)",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help=f"Rows per bulk insert (default: {IMPORT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            '--new-ids', action='store_true',
+            help="Assign fresh ids instead of reusing exported ones; parents are remapped, and "
+                 "tasks whose parent is not in the file are imported without one",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if os.path.splitext(path)[1] in ('.jsonl', '.ndjson') else 'csv')
+        importer = TaskImporter(batch_size=options['batch_size'], keep_ids=not options['new_ids'])
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            count = importer.run(read_rows(fmt, stream))
+        except TaskImportError as e:
+            raise CommandError(str(e))
+        except IntegrityError as e:
+            hint = ''
+            if f'{Task._meta.db_table}.id' in str(e):
+                hint = " Use --new-ids when the target already has tasks with these ids."
+            raise CommandError(f"Import rolled back: {e}.{hint}")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(f"Imported {count} task(s)"))
+        if importer.unlinked:
+            self.stdout.write(self.style.WARNING(
+                f"{len(importer.unlinked)} task(s) were imported without a parent; "
+                f"their parent was not in the file: "
+                + ', '.join(f"new id {child} (parent {parent})" for child, parent in importer.unlinked[:10])
+                + (", ..." if len(importer.unlinked) > 10 else "")
+            ))
@@ -0,0 +1,202 @@
+import asyncio
+import importlib.util
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = '/,/?priority=H&completed=false,/?q=task'
+INTERFACES = ('asgi', 'wsgi')
+
+
+def server_command(interface, port, workers, threads):
+    """The ASGI entry point under uvicorn, or the WSGI one under gunicorn's threaded workers.
+
+    uvicorn's own WSGI adapter is not used: it garbles Django's Set-Cookie headers.
+    """
+    if interface == 'asgi':
+        return [
+            sys.executable, '-m', 'uvicorn', 'todo_project.asgi:application', '--host', '127.0.0.1',
+            '--port', str(port), '--workers', str(workers), '--log-level', 'warning', '--no-access-log',
+        ]
+    return [
+        sys.executable, '-m', 'gunicorn', 'todo_project.wsgi:application', '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers), '--worker-class', 'gthread', '--threads', str(threads), '--log-level', 'warning',
+    ]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns the status code"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by the server")
+    status = int(status_line.split()[1])
+    length = None
+    chunked = False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, paths, offset, deadline, measure_from, stats):
+    """One keep-alive connection issuing requests back to back until the deadline"""
+    reader, writer = await asyncio.open_connection(host, port)
+    index = offset
+    try:
+        while time.perf_counter() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            start = time.perf_counter()
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nAccept: text/html\r\n\r\n'.encode())
+            try:
+                status = await read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                stats.errors += 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            if start < measure_from:
+                continue
+            if status >= 400:
+                stats.errors += 1
+            stats.latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, paths, concurrency, duration, warmup):
+    stats = Stats()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    await asyncio.gather(*(
+        client(host, port, paths, offset, deadline, measure_from, stats) for offset in range(concurrency)
+    ))
+    return stats
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"The server exited with status {process.returncode}; start it by hand to see why")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"The server did not start listening on port {port}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure requests per second and latency percentiles under concurrent keep-alive load, "
+        "either against a running server or comparing the ASGI (uvicorn) and WSGI (gunicorn) entry points"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Load this running server instead of starting one, e.g. http://127.0.0.1:8000")
+        parser.add_argument(
+            '--interface', choices=INTERFACES, action='append',
+            help="Entry point to start and load; repeat to compare (default: both)",
+        )
+        parser.add_argument(
+            '--paths', default=DEFAULT_PATHS,
+            help=f"Comma-separated GET paths requested in turn (default: {DEFAULT_PATHS})",
+        )
+        parser.add_argument('--concurrency', type=int, default=20, help="Simultaneous connections (default: 20)")
+        parser.add_argument('--duration', type=float, default=10, help="Measured seconds per run (default: 10)")
+        parser.add_argument('--warmup', type=float, default=2, help="Unmeasured seconds before each run (default: 2)")
+        parser.add_argument('--workers', type=int, default=1, help="Server worker processes (default: 1)")
+        parser.add_argument('--threads', type=int, default=10, help="Threads per gunicorn worker (default: 10)")
+        parser.add_argument('--output', '-o', help="Write the results as JSON to this file")
+
+    def handle(self, *args, **options):
+        paths = [path for path in options['paths'].split(',') if path]
+        results = {}
+        if options['url']:
+            url = urlsplit(options['url'])
+            results[options['url']] = self.load(url.hostname, url.port or 80, paths, options)
+        else:
+            for interface in options['interface'] or INTERFACES:
+                results[interface] = self.serve_and_load(interface, paths, options)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def serve_and_load(self, interface, paths, options):
+        server = 'uvicorn' if interface == 'asgi' else 'gunicorn'
+        if importlib.util.find_spec(server) is None:
+            raise CommandError(f"Serving the {interface.upper()} entry point needs {server}: pip install {server}")
+        port = free_port()
+        process = subprocess.Popen(
+            server_command(interface, port, options['workers'], options['threads']),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(port, process)
+            return self.load('127.0.0.1', port, paths, options, label=interface)
+        finally:
+            process.terminate()
+            process.wait()
+
+    def load(self, host, port, paths, options, label=None):
+        stats = asyncio.run(run_load(
+            host, port, paths, options['concurrency'], options['duration'], options['warmup'],
+        ))
+        if not stats.latencies:
+            raise CommandError(f"No request to {host}:{port} completed")
+        timings = [latency * 1000 for latency in stats.latencies]
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+        result = {
+            'requests': len(timings),
+            'errors': stats.errors,
+            'requests_per_second': round(len(timings) / options['duration'], 1),
+            'p50_ms': round(percentiles[49], 2),
+            'p95_ms': round(percentiles[94], 2),
+            'p99_ms': round(percentiles[98], 2),
+            'concurrency': options['concurrency'],
+            'workers': options['workers'],
+        }
+        if label == 'wsgi':
+            result['threads'] = options['threads']
+        self.stdout.write(
+            f"{label or f'{host}:{port}':<16} {result['requests_per_second']:8.1f} req/s  "
+            f"p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+            f"{result['errors']} error(s)"
+        )
+        return result
@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todo.recurrence import MATERIALIZE_HORIZON, materialize_occurrences
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the occurrences of recurring tasks that come due within the materialization horizon, "
+        "so reminders and stats see them; meant to run from cron (or with --watch) and safe to rerun"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=MATERIALIZE_HORIZON.total_seconds() / 3600,
+            help=f"Store occurrences due within this many hours "
+                 f"(default: {MATERIALIZE_HORIZON.total_seconds() / 3600:g})",
+        )
+        parser.add_argument(
+            '--watch', action='store_true',
+            help="Keep running and store occurrences as they come within the horizon",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=600.0,
+            help="With --watch, seconds between runs (default: 600)",
+        )
+
+    def handle(self, *args, **options):
+        horizon = timedelta(hours=options['hours'])
+        try:
+            while True:
+                start = time.perf_counter()
+                stored = materialize_occurrences(timezone.now(), horizon)
+                if stored:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Stored {stored} occurrence(s) in {time.perf_counter() - start:.1f} s"
+                    ))
+                if not options['watch']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            # Each occurrence is stored on its own; the next run picks up the rest
+            self.stdout.write("Stopped; rerun to store the remaining occurrences")
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from todo.purge import PURGE_BATCH_SIZE, pending_purge, purge_deleted
+
+
+class Command(BaseCommand):
+    help = "Remove soft-deleted tasks in bounded batches; safe to stop and rerun at any point"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=PURGE_BATCH_SIZE,
+            help=f"Rows deleted per transaction (default: {PURGE_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help="Seconds to wait between batches so request writes get the lock (default: 0.05)",
+        )
+        parser.add_argument(
+            '--watch', action='store_true',
+            help="Keep running and purge new deletions as they appear",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help="With --watch, seconds between checks when nothing is pending (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        pending = pending_purge().count()
+        if pending:
+            self.stdout.write(f"{pending} task(s) waiting to be purged")
+        try:
+            while True:
+                start = time.perf_counter()
+                purged = purge_deleted(options['batch_size'], pause=options['pause'])
+                if purged:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Purged {purged} task(s) in {time.perf_counter() - start:.1f} s"
+                    ))
+                if not options['watch']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            # Every finished batch is committed; the rest is still flagged
+            self.stdout.write("Stopped; rerun to purge the remaining tasks")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from todo.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Create the task search index if needed and re-index every task"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias to rebuild (default: default)")
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.install(options['database'])
+        backend.rebuild(options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index with {type(backend).__name__}"))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+
+from todo.models import Task
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized subtask_total / subtask_completed counters on every task"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help="Number of task ids recomputed per UPDATE statement (default: 10000)",
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only report how many tasks have drifted counters, without fixing them",
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drifted = self.count_drifted()
+            self.stdout.write(f"{drifted} task(s) have out-of-date subtask counters")
+            return
+
+        batch_size = options['batch_size']
+        max_id = Task.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        updated = 0
+        for start in range(0, max_id + 1, batch_size):
+            with transaction.atomic():
+                updated += Task.objects.filter(
+                    id__gte=start, id__lt=start + batch_size
+                ).refresh_subtask_counts()
+        self.stdout.write(self.style.SUCCESS(f"Recomputed subtask counters for {updated} task(s)"))
+
+    def count_drifted(self):
+        counted = Task.objects.order_by().annotate(
+            # Joins bypass Task.objects, so soft-deleted subtasks are left out here
+            actual_total=Count('subtasks', filter=Q(subtasks__deleted_at__isnull=True)),
+            actual_completed=Count('subtasks', filter=Q(subtasks__completed=True, subtasks__deleted_at__isnull=True)),
+        )
+        return counted.exclude(
+            subtask_total=F('actual_total'), subtask_completed=F('actual_completed')
+        ).count()
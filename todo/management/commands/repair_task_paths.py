@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from todo.models import Task, resolve_paths, write_paths
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized ancestor path of every task from its parent_task links"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only report how many tasks have out-of-date paths, without fixing them",
+        )
+
+    def handle(self, *args, **options):
+        nodes, paths = {}, {}
+        for task_id, parent_id, path in Task.objects.values_list('id', 'parent_task_id', 'path').iterator(chunk_size=10000):
+            nodes[task_id] = parent_id
+            paths[task_id] = path
+        try:
+            expected = resolve_paths(nodes)
+        except ValueError as e:
+            raise CommandError(str(e))
+        drifted = {task_id: path for task_id, path in expected.items() if path != paths[task_id]}
+
+        if options['check']:
+            self.stdout.write(f"{len(drifted)} task(s) have out-of-date paths")
+            return
+
+        with transaction.atomic():
+            write_paths(drifted)
+        self.stdout.write(self.style.SUCCESS(f"Rewrote the path of {len(drifted)} task(s)"))
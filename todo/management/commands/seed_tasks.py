@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from todo.seeding import clear_seeded, seed_tasks
+
+
+class Command(BaseCommand):
+    help = "Insert a reproducible synthetic dataset of tasks, categories and subtask trees"
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, nargs='?', default=0, help="Number of tasks to add")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same data")
+        parser.add_argument('--categories', type=int, default=5, help="Number of categories (default: 5)")
+        parser.add_argument(
+            '--category-skew', type=float, default=1.0,
+            help="Zipf exponent of the category distribution; 0 spreads tasks evenly (default: 1.0)",
+        )
+        parser.add_argument(
+            '--uncategorized', type=float, default=0.2, help="Share of tasks without a category (default: 0.2)",
+        )
+        parser.add_argument(
+            '--tree-ratio', type=float, default=0.1,
+            help="Share of top-level tasks that get a subtask tree (default: 0.1)",
+        )
+        parser.add_argument('--fanout', type=int, default=3, help="Subtasks per task in a tree (default: 3)")
+        parser.add_argument('--depth', type=int, default=2, help="Levels of subtasks below a root (default: 2)")
+        parser.add_argument('--completed', type=float, default=0.6, help="Share of completed tasks (default: 0.6)")
+        parser.add_argument('--no-due', type=float, default=0.3, help="Share of tasks without a due date (default: 0.3)")
+        parser.add_argument('--due-past-days', type=int, default=60, help="Earliest due date, in days ago (default: 60)")
+        parser.add_argument(
+            '--due-future-days', type=int, default=90, help="Latest due date, in days ahead (default: 90)",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT batch (default: 5000)")
+        parser.add_argument('--clear', action='store_true', help="Delete previously seeded tasks first")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(f"Deleted {clear_seeded()} seeded task(s)")
+        if not options['count']:
+            return
+        added = seed_tasks(
+            options['count'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            categories=options['categories'],
+            category_skew=options['category_skew'],
+            uncategorized=options['uncategorized'],
+            tree_ratio=options['tree_ratio'],
+            fanout=options['fanout'],
+            depth=options['depth'],
+            completed=options['completed'],
+            no_due=options['no_due'],
+            due_past_days=options['due_past_days'],
+            due_future_days=options['due_future_days'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Seeded {added} task(s)"))
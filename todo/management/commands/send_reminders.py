@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todo.notifiers import get_notifiers
+from todo.reminders import CATCH_UP, ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Send due-today and overdue reminders through the TODO_REMINDER_NOTIFIERS, once per task and due date; "
+        f"reminders up to {CATCH_UP} late are still sent"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch', action='store_true',
+            help="Keep running and send each reminder as it comes due (otherwise send what is due and exit)",
+        )
+
+    def handle(self, *args, **options):
+        notifiers = get_notifiers()
+        self.stdout.write(f"Notifying through: {', '.join(notifier.name for notifier in notifiers)}")
+        scheduler = ReminderScheduler(notifiers)
+        try:
+            while True:
+                now = timezone.now()
+                sent = scheduler.tick(now)
+                if sent:
+                    self.stdout.write(self.style.SUCCESS(f"Sent {sent} reminder(s)"))
+                if not options['watch']:
+                    break
+                time.sleep(scheduler.next_wakeup(timezone.now()))
+        except KeyboardInterrupt:
+            # Sent reminders are recorded; the rest go out on the next run
+            self.stdout.write("Stopped")
@@ -0,0 +1,107 @@
+import multiprocessing
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from todo.bulk import delete_subtrees
+from todo.models import Task, refresh_parent_counts
+from todo.purge import purge_deleted
+from todo.routers import READ_DATABASE
+from todo.views import TASKS_PER_PAGE, filter_tasks
+
+STRESS_PREFIX = '[stress]'
+
+
+def _is_lock_error(error):
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def _writer(worker, parent_id, operations):
+    """Create a subtask under the worker's parent and complete it, like add + toggle"""
+    latencies, lock_errors = [], 0
+    parent = Task.objects.get(id=parent_id)
+    for number in range(operations):
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                task = Task.objects.create(title=f"{STRESS_PREFIX} {worker}-{number}", parent_task=parent)
+                task.completed = True
+                task.save()
+                refresh_parent_counts(parent.id)
+        except OperationalError as e:
+            if not _is_lock_error(e):
+                raise
+            lock_errors += 1
+        latencies.append(time.perf_counter() - start)
+    connections.close_all()
+    return latencies, lock_errors
+
+
+def _reader(worker, operations, using):
+    """Fetch dashboard pages while the writers run"""
+    latencies, lock_errors = [], 0
+    for _ in range(operations):
+        start = time.perf_counter()
+        try:
+            list(filter_tasks({})[0].using(using).for_dashboard()[:TASKS_PER_PAGE])
+        except OperationalError as e:
+            if not _is_lock_error(e):
+                raise
+            lock_errors += 1
+        latencies.append(time.perf_counter() - start)
+    connections.close_all()
+    return latencies, lock_errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Run parallel writer (and reader) processes against the database and fail if any "
+        "of them hits 'database is locked'"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Number of writer processes (default: 8)")
+        parser.add_argument('--readers', type=int, default=4, help="Number of reader processes (default: 4)")
+        parser.add_argument(
+            '--operations', type=int, default=200,
+            help="Write transactions / page reads per process (default: 200)",
+        )
+        parser.add_argument('--keep', action='store_true', help="Keep the tasks created by the writers")
+
+    def handle(self, *args, **options):
+        writers, readers, operations = options['writers'], options['readers'], options['operations']
+        using = READ_DATABASE if READ_DATABASE in connections.settings else 'default'
+        parents = [Task.objects.create(title=f"{STRESS_PREFIX} writer {worker}") for worker in range(writers)]
+        # Forked workers must not share the parent's SQLite handles
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        start = time.perf_counter()
+        with context.Pool(writers + readers) as pool:
+            write_jobs = [pool.apply_async(_writer, (worker, parent.id, operations)) for worker, parent in enumerate(parents)]
+            read_jobs = [pool.apply_async(_reader, (worker, operations, using)) for worker in range(readers)]
+            write_results = [job.get() for job in write_jobs]
+            read_results = [job.get() for job in read_jobs]
+        elapsed = time.perf_counter() - start
+
+        failures = 0
+        for label, results in (('writes', write_results), ('reads', read_results)):
+            latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+            errors = sum(lock_errors for _, lock_errors in results)
+            failures += errors
+            if not latencies:
+                continue
+            p50, p95, p99 = (statistics.quantiles(latencies, n=100)[i - 1] * 1000 for i in (50, 95, 99)) \
+                if len(latencies) > 1 else (latencies[0] * 1000,) * 3
+            self.stdout.write(
+                f"{label}: {len(latencies)} in {elapsed:.1f} s ({len(latencies) / elapsed:.0f}/s), "
+                f"p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms, {errors} lock error(s)"
+            )
+
+        if not options['keep']:
+            delete_subtrees([parent.id for parent in parents])
+            purge_deleted()
+        if failures:
+            raise CommandError(f"{failures} operation(s) failed with 'database is locked'")
+        self.stdout.write(self.style.SUCCESS(f"No lock errors with {writers} parallel writer(s)"))
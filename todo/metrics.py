@@ -0,0 +1,199 @@
+"""Per-request timing: SQL, view and template time.
+
+RequestMetricsMiddleware opens a RequestMetrics for each request. Queries
+are timed by an execute wrapper installed on every connection as it opens,
+so the worker threads of async views are covered too, and template renders
+through the InstrumentedDjangoTemplates backend. Each request adds to
+per-view histograms, kept per process, that the metrics view exposes in
+the Prometheus text format, along with counters such as the task card
+cache's hits and misses.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """Timings of one request, in seconds"""
+
+    __slots__ = ('queries', 'db_time', 'template_time', 'view_time', 'rendering')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.view_time = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper hook"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper adding the query to the current request's metrics, if any"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver"""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        # Only the outermost render counts; nested renders are part of it
+        if metrics is None or metrics.rendering:
+            return super().render(context, request)
+        metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+            metrics.rendering = False
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each render into the current request's metrics"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one series per label value"""
+
+    def __init__(self, name, documentation, buckets, label='view'):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.label = label
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                # Bucket counts (the last one is +Inf), then the sum
+                series = self.series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def samples(self):
+        with self.lock:
+            series = {label_value: (list(counts), total) for label_value, (counts, total) in self.series.items()}
+        for label_value, (counts, total) in sorted(series.items()):
+            labels = f'{self.label}="{escape_label(label_value)}"'
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+            yield f'{self.name}_sum{{{labels}}} {total}'
+            yield f'{self.name}_count{{{labels}}} {cumulative}'
+
+    def exposition(self):
+        return '\n'.join([
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+            *self.samples(),
+        ])
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+
+class Counter:
+    """Prometheus-style counter with one series per label value"""
+
+    def __init__(self, name, documentation, label):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self.lock:
+            self.series[label_value] = self.series.get(label_value, 0) + amount
+
+    def value(self, label_value):
+        return self.series.get(label_value, 0)
+
+    def exposition(self):
+        with self.lock:
+            series = sorted(self.series.items())
+        return '\n'.join([
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} counter',
+            *(f'{self.name}{{{self.label}="{escape_label(label_value)}"}} {value}' for label_value, value in series),
+        ])
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_DURATION = Histogram(
+    'todo_request_duration_seconds', "Time spent handling the request, including middleware", DURATION_BUCKETS,
+)
+VIEW_DURATION = Histogram('todo_view_duration_seconds', "Time spent in the view", DURATION_BUCKETS)
+DB_DURATION = Histogram('todo_db_duration_seconds', "Time spent executing SQL per request", DURATION_BUCKETS)
+DB_QUERIES = Histogram('todo_db_queries', "SQL queries executed per request", QUERY_COUNT_BUCKETS)
+TEMPLATE_DURATION = Histogram(
+    'todo_template_duration_seconds', "Time spent rendering templates per request", DURATION_BUCKETS,
+)
+HISTOGRAMS = (REQUEST_DURATION, VIEW_DURATION, DB_DURATION, DB_QUERIES, TEMPLATE_DURATION)
+
+CARD_CACHE_LOOKUPS = Counter('todo_card_cache_lookups_total', "Task card fragment cache lookups", 'result')
+COUNTERS = (CARD_CACHE_LOOKUPS,)
+
+
+def record(view_name, metrics, total_time):
+    REQUEST_DURATION.observe(view_name, total_time)
+    VIEW_DURATION.observe(view_name, metrics.view_time)
+    DB_DURATION.observe(view_name, metrics.db_time)
+    DB_QUERIES.observe(view_name, metrics.queries)
+    TEMPLATE_DURATION.observe(view_name, metrics.template_time)
+
+
+def exposition():
+    """All histograms and counters in the Prometheus text format"""
+    return '\n'.join(metric.exposition() for metric in (*HISTOGRAMS, *COUNTERS)) + '\n'
+
+
+def server_timing(metrics, total_time):
+    """Server-Timing header value; durations in milliseconds"""
+    return ', '.join([
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+        f'view;dur={metrics.view_time * 1000:.1f}',
+        f'template;dur={metrics.template_time * 1000:.1f}',
+        f'total;dur={total_time * 1000:.1f}',
+    ])
@@ -0,0 +1,114 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import RequestMetrics, current_metrics, record, server_timing
+from .routers import read_only_request
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+metrics_logger = logging.getLogger('todo.metrics')
+
+
+class ReadOnlyRequestMiddleware:
+    """Route the queries of safe requests to the read-only database"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_only_request.set(request.method in SAFE_METHODS)
+        try:
+            return self.get_response(request)
+        finally:
+            read_only_request.reset(token)
+
+    async def __acall__(self, request):
+        token = read_only_request.set(request.method in SAFE_METHODS)
+        try:
+            return await self.get_response(request)
+        finally:
+            read_only_request.reset(token)
+
+
+class RequestMetricsMiddleware:
+    """Time each request's SQL, view and templates.
+
+    The totals go out as a Server-Timing header and a JSON log line on the
+    'todo.metrics' logger, and into the histograms served by the metrics
+    view. Place it first in MIDDLEWARE so the queries of other middleware
+    are counted too. View time runs from process_view until the response
+    gets back here, so it includes the response phase of the middleware
+    below. Set TODO_REQUEST_METRICS = False to switch it off.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TODO_REQUEST_METRICS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def finish(self, request, response, metrics, start):
+        end = time.perf_counter()
+        view_start = getattr(request, '_metrics_view_start', None)
+        if view_start is not None:
+            metrics.view_time = end - view_start
+        total_time = end - start
+
+        match = request.resolver_match
+        view_name = match.view_name if match else '<unmatched>'
+        record(view_name, metrics, total_time)
+        response['Server-Timing'] = server_timing(metrics, total_time)
+        if metrics_logger.isEnabledFor(logging.INFO):
+            metrics_logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view_name,
+                'status': response.status_code,
+                'total_ms': round(total_time * 1000, 2),
+                'view_ms': round(metrics.view_time * 1000, 2),
+                'db_ms': round(metrics.db_time * 1000, 2),
+                'queries': metrics.queries,
+                'template_ms': round(metrics.template_time * 1000, 2),
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view_start = time.perf_counter()
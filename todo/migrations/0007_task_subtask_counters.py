@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_subtask_counters(apps, schema_editor):
+    Task = apps.get_model('todo', 'Task')
+    children = Task.objects.filter(parent_task=OuterRef('pk')).order_by().values('parent_task')
+    parent_ids = Task.objects.filter(parent_task__isnull=False).values('parent_task')
+    Task.objects.filter(pk__in=parent_ids).update(
+        subtask_total=Coalesce(Subquery(children.annotate(n=Count('pk')).values('n')), 0),
+        subtask_completed=Coalesce(Subquery(children.filter(completed=True).annotate(n=Count('pk')).values('n')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0006_task_notes_task_parent_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='subtask_completed',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='subtask_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_subtask_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0007_task_subtask_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSearchIndex',
+            fields=[
+                ('task', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='todo.task')),
+                ('document', models.TextField(db_column='todo_task_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'todo_task_fts',
+                'managed': False,
+            },
+        ),
+    ]
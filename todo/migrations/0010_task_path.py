@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+PATH_DIGITS = 10
+
+
+def populate_paths(apps, schema_editor):
+    Task = apps.get_model('todo', 'Task')
+    parents = dict(Task.objects.values_list('id', 'parent_task_id'))
+    paths = {}
+    for task_id in parents:
+        chain = []
+        node = task_id
+        while node is not None and node not in paths and node not in chain:
+            chain.append(node)
+            node = parents.get(node)
+        path = '' if node is None or node in chain else paths[node] + f'{node:0{PATH_DIGITS}d}'
+        for child in reversed(chain):
+            paths[child] = path
+            path += f'{child:0{PATH_DIGITS}d}'
+    tasks = [Task(id=task_id, path=path) for task_id, path in paths.items() if path]
+    Task.objects.bulk_update(tasks, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0009_task_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='path',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['path'], name='task_path_idx'),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:42
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_categories(apps, schema_editor):
+    """Fold categories whose names differ only in case into the oldest one, then count tasks"""
+    Category = apps.get_model('todo', 'Category')
+    Task = apps.get_model('todo', 'Task')
+    kept = {}
+    for category_id, name in Category.objects.order_by('id').values_list('id', 'name'):
+        key = name.strip().lower()
+        if key in kept:
+            Task.objects.filter(category_id=category_id).update(category_id=kept[key])
+            Category.objects.filter(id=category_id).delete()
+        else:
+            kept[key] = category_id
+    counts = Task.objects.filter(category__isnull=False).values('category').annotate(n=Count('id'))
+    for row in counts:
+        Category.objects.filter(id=row['category']).update(task_count=row['n'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0010_task_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='task_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(merge_duplicate_categories, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='category_name_ci_unique'),
+        ),
+    ]
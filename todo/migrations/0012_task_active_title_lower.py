@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:45
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0011_category_task_count_unique_name'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_active_title_idx',
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(django.db.models.functions.text.Lower('title'), models.F('id'), condition=models.Q(('completed', False)), name='task_active_title_idx'),
+        ),
+    ]
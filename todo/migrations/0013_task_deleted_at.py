@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:47
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0012_task_active_title_lower'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(models.OrderBy(django.db.models.functions.text.Length('path'), descending=True), models.F('id'), condition=models.Q(('deleted_at__isnull', False)), name='task_purge_idx'),
+        ),
+    ]
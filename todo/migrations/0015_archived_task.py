@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0014_task_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('completed', models.BooleanField(default=False)),
+                ('due_date', models.DateTimeField(blank=True, null=True)),
+                ('description', models.TextField(blank=True)),
+                ('notes', models.TextField(blank=True, help_text='Additional notes, links, or details')),
+                ('priority', models.CharField(choices=[('L', 'Low'), ('M', 'Medium'), ('H', 'High')], default='M', max_length=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_modified', models.DateTimeField(auto_now=True)),
+                ('subtask_total', models.PositiveIntegerField(default=0, editable=False)),
+                ('subtask_completed', models.PositiveIntegerField(default=0, editable=False)),
+                ('path', models.TextField(blank=True, default='', editable=False)),
+                ('archived_at', models.DateTimeField()),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='todo.category')),
+                ('parent_task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subtasks', to='todo.archivedtask')),
+            ],
+            options={
+                'ordering': ['-priority', 'due_date', '-created_at'],
+                'indexes': [models.Index(fields=['path'], name='archived_task_path_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0015_archived_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('due', 'Due today'), ('overdue', 'Overdue')], max_length=7)),
+                ('due_date', models.DateTimeField(db_index=True)),
+                ('notifier', models.CharField(max_length=50)),
+                ('claimed_at', models.DateTimeField()),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('task_id', 'kind', 'due_date', 'notifier'), name='reminder_delivered_once')],
+            },
+        ),
+    ]
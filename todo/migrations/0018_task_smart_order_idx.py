@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:51
+
+import django.db.models.functions.comparison
+import todo.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0017_task_recurrence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(models.F('completed'), django.db.models.functions.comparison.Coalesce('due_date', todo.models.NoDueDate()), models.OrderBy(models.F('priority'), descending=True), models.OrderBy(models.F('created_at'), descending=True), models.F('id'), condition=models.Q(('deleted_at__isnull', True)), name='task_smart_order_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:55
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def record_series(apps, schema_editor):
+    """Anchor stored occurrences on their series' first due date and mark those already continued"""
+    tables = [apps.get_model('todo', 'Task'), apps.get_model('todo', 'ArchivedTask')]
+    for model in tables:
+        # An occurrence may have been archived apart from the rest of its series
+        first_due = [
+            other.objects.filter(id=OuterRef('series_id')).values('due_date')[:1] for other in tables
+        ]
+        continued = [
+            Exists(other.objects.filter(
+                series_id=Coalesce(OuterRef('series_id'), OuterRef('id')), occurrence=OuterRef('occurrence') + 1,
+            ))
+            for other in tables
+        ]
+        model.objects.filter(series_id__isnull=False).update(
+            series_start=Coalesce(*(Subquery(due) for due in first_due)),
+        )
+        model.objects.exclude(recurrence='').filter(continued[0] | continued[1]).update(series_continued=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0018_task_smart_order_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_open_recurring_idx',
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='series_continued',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='series_start',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='series_continued',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='series_start',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(record_series, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', False), models.Q(('recurrence', ''), _negated=True), ('series_continued', False)), fields=['due_date'], name='task_series_tail_idx'),
+        ),
+    ]
@@ -1,18 +1,214 @@
-from django.db import models
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import models, transaction
+from django.db.models import (
+    Case, CharField, Count, DateTimeField, Expression, F, Func, IntegerField, OuterRef, Prefetch, Q,
+    Subquery, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Concat, Length, Lower, LPad, Substr
 from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+class CategoryQuerySet(models.QuerySet):
+    def refresh_task_counts(self):
+        """Recompute task_count for these categories in one UPDATE"""
+        tasks = Task.objects.filter(category=OuterRef('pk')).order_by().values('category')
+        return self.order_by().update(
+            task_count=Coalesce(Subquery(tasks.annotate(n=Count('pk')).values('n')), 0),
+        )
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
+    # Denormalized; refreshed by todo.categories.refresh_category_counts
+    task_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = CategoryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # "Work" and "work" are the same category
+            models.UniqueConstraint(Lower('name'), name='category_name_ci_unique'),
+        ]
 
     def __str__(self):
         return self.name
 
-class Task(models.Model):
+def overdue_q(now):
+    """Q matching incomplete tasks whose due date has passed"""
+    return Q(completed=False, due_date__lt=now)
+
+
+# Tasks whose recurrence goes on (see todo.recurrence)
+OPEN_RECURRING = Q(completed=False) & ~Q(recurrence='')
+# The open occurrence each series goes on from: its successor is not stored yet
+SERIES_TAIL = OPEN_RECURRING & Q(series_continued=False)
+
+
+def due_today_q(now):
+    """Q matching incomplete tasks due later today (mirrors Task.is_due_today)"""
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return Q(completed=False, due_date__gte=now, due_date__lt=today_start + timedelta(days=1))
+
+
+# Task.path lists a task's ancestor ids, root first, each zero-padded to
+# PATH_DIGITS digits. Fixed-width digits sort the same under any collation,
+# so a whole subtree is one index range on path (see subtree_q).
+PATH_DIGITS = 10
+
+
+def path_step(task_id):
+    return f'{task_id:0{PATH_DIGITS}d}'
+
+
+def path_ids(path):
+    """Ancestor ids encoded in ``path``, root first"""
+    return [int(path[i:i + PATH_DIGITS]) for i in range(0, len(path), PATH_DIGITS)]
+
+
+def subtree_q(prefix):
+    """Q matching every task below the one whose subtree path is ``prefix``"""
+    upper = prefix[:-PATH_DIGITS] + path_step(int(prefix[-PATH_DIGITS:]) + 1)
+    return Q(path__gte=prefix, path__lt=upper)
+
+
+def title_key(text):
+    """``text`` folded the way SQLite's LOWER() folds it: ASCII letters only"""
+    return ''.join(char.lower() if char.isascii() else char for char in text)
+
+
+# Stands in for a missing due date in the smart ordering, after every real one
+NO_DUE_DATE = datetime(9999, 1, 1, tzinfo=dt_timezone.utc)
+
+
+@deconstructible(path='todo.models.NoDueDate')
+class NoDueDate(Expression):
+    """NO_DUE_DATE written into the SQL as a literal.
+
+    SQLite only uses an expression index when the query has the very same
+    expression, and a bound parameter never matches the index's literal.
+    """
+
+    output_field = DateTimeField()
+
+    def as_sql(self, compiler, connection):
+        return "'%s'" % connection.ops.adapt_datetimefield_value(NO_DUE_DATE), []
+
+
+def ordering_due():
+    """The due date, or NO_DUE_DATE; task_smart_order_idx indexes this expression"""
+    return Coalesce('due_date', NoDueDate())
+
+
+def _path_step_expression(id_expression):
+    return LPad(Cast(id_expression, CharField()), PATH_DIGITS, Value('0'))
+
+
+class TaskQuerySet(models.QuerySet):
+    """Database-side versions of the Task helpers used by the dashboard"""
+
+    # Smart-ordering key. Open tasks' buckets (see Task.get_ordering_value)
+    # follow their due dates, so ordering by due date with undated tasks
+    # last gives the same order without looking at the clock, and
+    # task_smart_order_idx can serve it. ``id`` makes the key unique, which
+    # keyset pagination relies on.
+    SMART_ORDERING = ('completed', 'ordering_due', '-priority', '-created_at', 'id')
+    # Relevance ordering for search results; search_rank is lower-is-better.
+    # Equal ranks (every occurrence of a recurring task shares its tail's)
+    # go by due date as in the smart ordering.
+    SEARCH_ORDERING = ('search_rank', 'ordering_due', 'id')
+
+    def overdue(self, now=None):
+        """Incomplete tasks whose due date has passed"""
+        return self.filter(overdue_q(now or timezone.now()))
+
+    def due_today(self, now=None):
+        """Incomplete tasks due later today"""
+        return self.filter(due_today_q(now or timezone.now()))
+
+    def search(self, query):
+        """Full-text search on title, description and notes (see todo.search)"""
+        from .search import get_search_backend
+        return get_search_backend().search(self, query)
+
+    def smart_ordered(self):
+        """Smart ordering: overdue first, then due today, then by due date
+
+        Ties fall back to Meta.ordering and finally the primary key, which is
+        the order the old in-Python sort produced.
+        """
+        return self.annotate(ordering_due=ordering_due()).order_by(*self.SMART_ORDERING)
+
+    def refresh_subtask_counts(self):
+        """Recompute subtask_total / subtask_completed for these tasks in one UPDATE"""
+        children = Task.objects.filter(parent_task=OuterRef('pk')).order_by().values('parent_task')
+        return self.order_by().update(
+            subtask_total=Coalesce(Subquery(children.annotate(n=Count('pk')).values('n')), 0),
+            subtask_completed=Coalesce(
+                Subquery(children.filter(completed=True).annotate(n=Count('pk')).values('n')), 0
+            ),
+        )
+
+    def with_subtree_counts(self):
+        """Annotate descendant_total / descendant_completed over each task's whole subtree"""
+        descendants = Task.objects.filter(
+            path__gte=Concat(OuterRef('path'), _path_step_expression(OuterRef('id'))),
+            path__lt=Concat(OuterRef('path'), _path_step_expression(OuterRef('id') + 1)),
+        ).order_by()
+        count = Func('pk', function='COUNT', output_field=IntegerField())
+        return self.annotate(
+            descendant_total=Subquery(descendants.values(n=count)),
+            descendant_completed=Subquery(descendants.filter(completed=True).values(n=count)),
+        )
+
+    def parent_candidates(self, prefix='', exclude=None):
+        """Open tasks whose title starts with ``prefix`` in any letter case, by title.
+
+        Matching is a range on LOWER(title), so it is served by
+        task_active_title_idx. ``exclude`` (a task) drops that task and its
+        subtree, which could not become its parent.
+        """
+        queryset = self.filter(completed=False).annotate(title_key=Lower('title'))
+        prefix = title_key(prefix)
+        if prefix:
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            queryset = queryset.filter(title_key__gte=prefix, title_key__lt=upper)
+        if exclude is not None:
+            queryset = queryset.exclude(id=exclude.id).exclude(subtree_q(exclude.subtree_path))
+        return queryset.order_by('title_key', 'id')
+
+    def series_tails(self):
+        """Open recurring tasks whose next occurrence is not stored yet; their series go on from them"""
+        return self.filter(SERIES_TAIL)
+
+    def for_dashboard(self):
+        """Everything a task card renders, fetched in a constant number of queries"""
+        return self.select_related('category', 'parent_task').prefetch_related(
+            Prefetch('subtasks', queryset=Task.objects.order_by(*Task._meta.ordering, 'id')),
+        )
+
+
+class TaskManager(models.Manager):
+    """Leaves out soft-deleted tasks waiting to be purged (see todo.purge)"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class TaskFields(models.Model):
+    """Columns and display helpers shared by Task and ArchivedTask"""
+
     PRIORITY_CHOICES = [
         ('L', 'Low'),
         ('M', 'Medium'),
         ('H', 'High'),
     ]
+    RECURRENCE_CHOICES = [
+        ('', 'Does not repeat'),
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    ]
 
     title = models.CharField(max_length=255)
     completed = models.BooleanField(default=False)
@@ -24,9 +220,45 @@ class Task(models.Model):
     parent_task = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subtasks')
     created_at = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
+    # Denormalized child counters, kept in step by the views that write tasks
+    # (see TaskQuerySet.refresh_subtask_counts and the repair_subtask_counts command)
+    subtask_total = models.PositiveIntegerField(default=0, editable=False)
+    subtask_completed = models.PositiveIntegerField(default=0, editable=False)
+    # Materialized ancestor path (see PATH_DIGITS). save() keeps it in step;
+    # update() / bulk_create() / bulk_update() callers use refresh_paths().
+    path = models.TextField(default='', blank=True, editable=False)
+    # Recurrence rule (see todo.recurrence): every recurrence_interval days,
+    # weeks or months from due_date, ending after recurrence_until or once
+    # recurrence_count occurrences exist, whichever comes first
+    recurrence = models.CharField(max_length=7, choices=RECURRENCE_CHOICES, blank=True, default='')
+    recurrence_interval = models.PositiveSmallIntegerField(default=1)
+    recurrence_until = models.DateTimeField(null=True, blank=True)
+    recurrence_count = models.PositiveIntegerField(null=True, blank=True)
+    # Stored occurrences of one rule share the first one's id and due date
+    # (both null on the first), which every due date is counted from, and
+    # are numbered from 1. series_continued is set once the next occurrence
+    # is stored, so deleting or purging that one ends the series for good.
+    series_id = models.BigIntegerField(null=True, blank=True, editable=False)
+    series_start = models.DateTimeField(null=True, blank=True, editable=False)
+    occurrence = models.PositiveIntegerField(default=1, editable=False)
+    series_continued = models.BooleanField(default=False, editable=False)
+
+    # Archived cards leave out what only works on active tasks, such as editing
+    archived = False
+    # Occurrences computed by todo.recurrence but not stored
+    virtual = False
 
     class Meta:
-        ordering = ['completed', '-priority', 'due_date', '-created_at']
+        abstract = True
+
+    @property
+    def subtree_path(self):
+        """Path prefix shared by every descendant of this task"""
+        return self.path + path_step(self.id)
+
+    @property
+    def depth(self):
+        return len(self.path) // PATH_DIGITS
 
     def __str__(self):
         return self.title
@@ -67,16 +299,313 @@ class Task(models.Model):
 
     def has_subtasks(self):
         """Check if task has subtasks"""
-        return self.subtasks.exists()
+        return self.subtask_total > 0
 
     def get_subtask_progress(self):
-        """Get completion progress of subtasks"""
-        if not self.has_subtasks():
+        """Completion progress of the whole subtree when rolled up (see
+        attach_subtree_counts), otherwise of the direct subtasks"""
+        total = getattr(self, 'descendant_total', self.subtask_total)
+        completed = getattr(self, 'descendant_completed', self.subtask_completed)
+        if not total:
             return 0
-        total = self.subtasks.count()
-        completed = self.subtasks.filter(completed=True).count()
-        return (completed / total) * 100 if total > 0 else 0
+        return (completed / total) * 100
+
+    def get_ancestor_ids(self, include_self=False):
+        """Ids of the parent chain up to the root, nearest first"""
+        ids = [self.id] if include_self else []
+        return ids + path_ids(self.path)[::-1]
 
     def is_subtask(self):
         """Check if this task is a subtask"""
         return self.parent_task is not None
+
+    @property
+    def series_key(self):
+        """Id shared by every stored occurrence of this task's rule"""
+        return self.series_id or self.id
+
+    def get_recurrence_summary(self):
+        """The rule in words, e.g. "Every 2 weeks"; empty when the task does not repeat"""
+        if not self.recurrence:
+            return ''
+        if self.recurrence_interval == 1:
+            return self.get_recurrence_display()
+        unit = {'daily': 'days', 'weekly': 'weeks', 'monthly': 'months'}[self.recurrence]
+        return f"Every {self.recurrence_interval} {unit}"
+
+
+class Task(TaskFields):
+    # Set on a deleted task and its whole subtree; the purge worker removes
+    # the rows later. Task.objects never returns them, Task.all_objects does.
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = TaskManager.from_queryset(TaskQuerySet)()
+    all_objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['completed', '-priority', 'due_date', '-created_at']
+        indexes = [
+            # Meta.ordering and the status / priority filters
+            models.Index(fields=['completed', '-priority', 'due_date'], name='task_status_priority_due_idx'),
+            # Open work by due date: overdue / due-today stats and filters
+            models.Index(fields=['due_date'], condition=Q(completed=False), name='task_active_due_idx'),
+            # Parent-task autocomplete: case-insensitive title prefixes of open tasks
+            models.Index(Lower('title'), 'id', condition=Q(completed=False), name='task_active_title_idx'),
+            models.Index(fields=['priority', 'due_date'], name='task_priority_due_idx'),
+            models.Index(fields=['category', 'completed'], name='task_category_status_idx'),
+            # Subtask counter refreshes count children by status
+            models.Index(fields=['parent_task', 'completed'], name='task_parent_status_idx'),
+            # Descendant lookups are range scans on the materialized path
+            models.Index(fields=['path'], name='task_path_idx'),
+            # The purge worker takes deleted rows deepest first
+            models.Index(Length('path').desc(), 'id', condition=Q(deleted_at__isnull=False), name='task_purge_idx'),
+            # The default dashboard page: the smart ordering of live tasks
+            models.Index(
+                F('completed'), ordering_due(), F('priority').desc(), F('created_at').desc(), 'id',
+                condition=Q(deleted_at__isnull=True), name='task_smart_order_idx',
+            ),
+            # Series tails, which recurring series continue from (see TaskQuerySet.series_tails)
+            models.Index(fields=['due_date'], condition=SERIES_TAIL, name='task_series_tail_idx'),
+        ]
+        constraints = [
+            # Each occurrence is stored once, however many workers try to create it
+            models.UniqueConstraint(fields=['series_id', 'occurrence'], name='task_series_occurrence_uniq'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        task = super().from_db(db, field_names, values)
+        # save() compares against this to tell a move from any other edit
+        task._saved_parent_id = task.__dict__.get('parent_task_id')
+        return task
+
+    def save(self, *args, **kwargs):
+        moved = self._state.adding or self.parent_task_id != getattr(self, '_saved_parent_id', self.parent_task_id)
+        if not moved:
+            return super().save(*args, **kwargs)
+
+        old_subtree_path = None if self._state.adding else self.subtree_path
+        self.path = self.parent_path()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'path'}
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if old_subtree_path is not None and old_subtree_path != self.subtree_path:
+                # One UPDATE rewrites the path prefix of the whole subtree
+                Task.objects.filter(subtree_q(old_subtree_path)).update(
+                    path=Concat(Value(self.subtree_path), Substr('path', len(old_subtree_path) + 1)),
+                )
+        self._saved_parent_id = self.parent_task_id
+
+    def parent_path(self):
+        """The path this task gets under its current parent_task"""
+        if self.parent_task_id is None:
+            return ''
+        parent_path = Task.objects.filter(id=self.parent_task_id).values_list('path', flat=True).first() or ''
+        if self.id is not None and self.id in (self.parent_task_id, *path_ids(parent_path)):
+            raise ValueError("A task cannot be moved under itself or one of its subtasks")
+        return parent_path + path_step(self.parent_task_id)
+
+    def descendants(self):
+        """Every task below this one, at any depth, in one index range scan"""
+        return Task.objects.filter(subtree_q(self.subtree_path))
+
+    def is_descendant_of(self, other):
+        return self.path.startswith(other.subtree_path)
+
+def refresh_parent_counts(*parent_ids, chunk_size=500):
+    """Bring the subtask counters of the given parent tasks back in step"""
+    parent_ids = sorted({parent_id for parent_id in parent_ids if parent_id is not None})
+    for start in range(0, len(parent_ids), chunk_size):
+        Task.objects.filter(id__in=parent_ids[start:start + chunk_size]).refresh_subtask_counts()
+
+
+def attach_subtree_counts(tasks):
+    """Roll subtask progress up over whole subtrees for a page of tasks, in one query"""
+    parents = {task.id: task for task in tasks if task.subtask_total}
+    if not parents:
+        return
+    counts = Task.objects.filter(id__in=parents).with_subtree_counts().values_list(
+        'id', 'descendant_total', 'descendant_completed',
+    )
+    for task_id, total, completed in counts:
+        parents[task_id].descendant_total = total or 0
+        parents[task_id].descendant_completed = completed or 0
+
+
+async def aattach_subtree_counts(tasks):
+    """Async version of attach_subtree_counts()"""
+    parents = {task.id: task for task in tasks if task.subtask_total}
+    if not parents:
+        return
+    counts = Task.objects.filter(id__in=parents).with_subtree_counts().values_list(
+        'id', 'descendant_total', 'descendant_completed',
+    )
+    async for task_id, total, completed in counts:
+        parents[task_id].descendant_total = total or 0
+        parents[task_id].descendant_completed = completed or 0
+
+
+def resolve_paths(nodes, prefixes=None):
+    """Compute paths from parent pointers.
+
+    ``nodes`` maps task ids to parent ids; ``prefixes`` gives the subtree
+    path of parents outside ``nodes``. Raises ValueError on a cycle.
+    """
+    prefixes = prefixes or {}
+    paths = {}
+    for task_id in nodes:
+        chain, on_chain = [], set()
+        node = task_id
+        while node in nodes and node not in paths:
+            if node in on_chain:
+                raise ValueError(f"Task {node} is its own ancestor")
+            chain.append(node)
+            on_chain.add(node)
+            node = nodes[node]
+        if node is None:
+            path = ''
+        elif node in paths:
+            path = paths[node] + path_step(node)
+        else:
+            path = prefixes.get(node, path_step(node))
+        for child in reversed(chain):
+            paths[child] = path
+            path += path_step(child)
+    return paths
+
+
+def write_paths(paths, chunk_size=300):
+    """Store ``{task id: path}`` with one CASE update per chunk"""
+    items = sorted(paths.items())
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start:start + chunk_size]
+        Task.objects.filter(id__in=[task_id for task_id, _ in chunk]).update(
+            path=Case(*(When(id=task_id, then=Value(path)) for task_id, path in chunk))
+        )
+
+
+def refresh_paths(*task_ids, chunk_size=200):
+    """Recompute the path of tasks re-parented without save(), and of their subtrees.
+
+    Reads the affected subtrees once, resolves the new paths in memory and
+    writes only the ones that changed. Returns how many changed.
+    """
+    task_ids = sorted({task_id for task_id in task_ids if task_id is not None})
+    nodes, old_paths = {}, {}
+    for start in range(0, len(task_ids), chunk_size):
+        rows = list(Task.objects.filter(id__in=task_ids[start:start + chunk_size])
+                    .values_list('id', 'parent_task_id', 'path'))
+        subtrees = Q()
+        for task_id, _, path in rows:
+            subtrees |= subtree_q(path + path_step(task_id))
+        if subtrees:
+            rows += Task.objects.filter(subtrees).values_list('id', 'parent_task_id', 'path')
+        for task_id, parent_id, path in rows:
+            nodes[task_id] = parent_id
+            old_paths[task_id] = path
+
+    outside = sorted({parent_id for parent_id in nodes.values() if parent_id is not None and parent_id not in nodes})
+    prefixes = {}
+    for start in range(0, len(outside), chunk_size):
+        for task_id, path in Task.objects.filter(id__in=outside[start:start + chunk_size]).values_list('id', 'path'):
+            prefixes[task_id] = path + path_step(task_id)
+
+    changed = {task_id: path for task_id, path in resolve_paths(nodes, prefixes).items() if path != old_paths[task_id]}
+    write_paths(changed)
+    return len(changed)
+
+
+class TaskSearchIndex(models.Model):
+    """Read-only mapping of the SQLite FTS5 index over Task (see todo.search)"""
+    task = models.OneToOneField(
+        Task, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING, related_name='search_index'
+    )
+    # FTS5 exposes a hidden column named after the table, used for MATCH
+    document = models.TextField(db_column='todo_task_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'todo_task_fts'
+
+
+class TaskChange(models.Model):
+    """Append-only log of task writes, filled by database triggers (see todo.changes).
+
+    The id is the sequence number clients resume from. There is no foreign
+    key: entries outlive the tasks they describe.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    KIND_CHOICES = [(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted')]
+
+    task_id = models.BigIntegerField()
+    kind = models.CharField(max_length=7, choices=KIND_CHOICES)
+    # The task's path when it changed, so cards showing its progress can be refreshed too
+    path = models.TextField(blank=True)
+    changed_at = models.DateTimeField(db_index=True)
+
+    def ancestor_ids(self):
+        return path_ids(self.path)[::-1]
+
+
+class ArchivedTaskQuerySet(TaskQuerySet):
+    def search(self, query):
+        """Unindexed search; the full-text index only covers active tasks"""
+        from .search import SimpleSearchBackend
+        return SimpleSearchBackend().search(self, query)
+
+    def for_dashboard(self):
+        return self.select_related('category', 'parent_task').prefetch_related(
+            Prefetch('subtasks', queryset=ArchivedTask.objects.order_by(*Task._meta.ordering, 'id')),
+        )
+
+
+class ArchivedTask(TaskFields):
+    """A completed task tree moved out of Task by todo.archive, keeping its ids.
+
+    Whole trees are archived together, so parent_task always points within
+    the archive.
+    """
+    archived_at = models.DateTimeField()
+
+    objects = ArchivedTaskQuerySet.as_manager()
+
+    archived = True
+
+    class Meta:
+        ordering = ['-priority', 'due_date', '-created_at']
+        indexes = [
+            # Trees are restored and deleted as path ranges
+            models.Index(fields=['path'], name='archived_task_path_idx'),
+        ]
+
+
+class ReminderDelivery(models.Model):
+    """A due-date reminder handed to one notifier (see todo.reminders).
+
+    The unique constraint is what makes a reminder go out once: a scheduler
+    claims the row before notifying and fills in delivered_at afterwards.
+    Like TaskChange there is no foreign key, so rows outlive purged and
+    archived tasks until the scheduler trims them.
+    """
+    DUE = 'due'
+    OVERDUE = 'overdue'
+    KIND_CHOICES = [(DUE, 'Due today'), (OVERDUE, 'Overdue')]
+
+    task_id = models.BigIntegerField()
+    kind = models.CharField(max_length=7, choices=KIND_CHOICES)
+    # The due date reminded of; moving a task's due date makes it due again
+    due_date = models.DateTimeField(db_index=True)
+    notifier = models.CharField(max_length=50)
+    claimed_at = models.DateTimeField()
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['task_id', 'kind', 'due_date', 'notifier'], name='reminder_delivered_once',
+            ),
+        ]
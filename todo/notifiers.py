@@ -0,0 +1,84 @@
+"""Pluggable destinations for due-date reminders.
+
+The ``TODO_REMINDER_NOTIFIERS`` setting lists notifier classes by dotted
+path; the reminder scheduler (todo.reminders) hands every reminder to each
+of them. A notifier raises to report a failed delivery, which is retried
+later; its ``name`` keys the delivery log, so renaming one re-sends.
+"""
+import json
+import logging
+import urllib.request
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NOTIFIERS = ['todo.notifiers.LogNotifier']
+WEBHOOK_TIMEOUT = 10
+
+
+class Reminder:
+    """What a notifier is told about one task"""
+
+    def __init__(self, task_id, title, kind, due_date):
+        self.task_id = task_id
+        self.title = title
+        self.kind = kind
+        self.due_date = due_date
+
+    def __str__(self):
+        if self.kind == 'overdue':
+            return f'"{self.title}" is overdue (was due {self.due_date:%Y-%m-%d %H:%M %Z})'
+        return f'"{self.title}" is due today at {self.due_date:%H:%M %Z}'
+
+    def as_dict(self):
+        return {'task': self.task_id, 'title': self.title, 'kind': self.kind, 'due_date': self.due_date.isoformat()}
+
+
+class BaseNotifier:
+    name = None
+
+    def notify(self, reminder):
+        raise NotImplementedError
+
+
+class LogNotifier(BaseNotifier):
+    """Writes each reminder to the 'todo.notifiers' logger"""
+    name = 'log'
+
+    def notify(self, reminder):
+        logger.info("Reminder: %s", reminder)
+
+
+class EmailNotifier(BaseNotifier):
+    """Mails each reminder to TODO_REMINDER_EMAIL_TO through Django's EMAIL_BACKEND"""
+    name = 'email'
+
+    def notify(self, reminder):
+        recipients = getattr(settings, 'TODO_REMINDER_EMAIL_TO', [])
+        if recipients:
+            send_mail(f"Reminder: {reminder.title}", str(reminder), None, recipients)
+
+
+class WebhookNotifier(BaseNotifier):
+    """POSTs each reminder as JSON to TODO_REMINDER_WEBHOOK_URL"""
+    name = 'webhook'
+
+    def notify(self, reminder):
+        url = getattr(settings, 'TODO_REMINDER_WEBHOOK_URL', '')
+        if not url:
+            return
+        request = urllib.request.Request(
+            url, data=json.dumps(reminder.as_dict()).encode(), headers={'Content-Type': 'application/json'},
+        )
+        # Anything but a 2xx raises, and the reminder is retried
+        with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT):
+            pass
+
+
+def get_notifiers():
+    """An instance of every configured notifier"""
+    paths = getattr(settings, 'TODO_REMINDER_NOTIFIERS', DEFAULT_NOTIFIERS)
+    return [import_string(path)() for path in paths]
@@ -0,0 +1,224 @@
+"""Keyset (cursor) pagination for ordered task querysets.
+
+Instead of OFFSET, each page remembers the ordering key of its first and
+last row and the next query asks for rows strictly after / before that key.
+The cursor also pins the ``now`` the first page was built at, so what
+depends on the clock (the "due today" filter, the computed occurrences of
+recurring tasks) stays the same while someone is paging.
+
+A page can also be drawn from several querysets with the same ordering
+(the active and archived tasks): each is read with the same key filter and
+their rows are merged, so the cursors work unchanged. Rows that only exist
+in memory (the computed occurrences of recurring tasks) can be merged in
+too, filtered by the same key in Python; given as a sorted iterator, they
+are only computed as far as the page reaches.
+"""
+import heapq
+from collections import deque
+from datetime import datetime
+from functools import cmp_to_key
+from itertools import dropwhile, islice, takewhile
+
+from django.core import signing
+from django.db.models import Q, QuerySet
+
+CURSOR_SALT = 'todo.pagination'
+
+
+class CursorPage:
+    """One page of results plus the cursors for its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def _key(obj, ordering):
+    """The ordering key of ``obj``, an instance or a values() dict"""
+    if isinstance(obj, dict):
+        return [obj[field.lstrip('-')] for field in ordering]
+    return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+
+def encode_cursor(obj, ordering, now):
+    """Serialize the ordering key of ``obj`` (an instance or a values() dict) into an opaque, signed token"""
+    values = [_encode_value(value) for value in _key(obj, ordering)]
+    return signing.dumps({'now': now.isoformat(), 'key': values}, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """Return ``(now, key values)`` for a cursor, or ``None`` if it is invalid"""
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=CURSOR_SALT)
+        return datetime.fromisoformat(data['now']), [_decode_value(v) for v in data['key']]
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def cursor_time(params):
+    """The ``now`` pinned by the ``after``/``before`` cursor in ``params``, if any"""
+    decoded = decode_cursor(params.get('after') or params.get('before'))
+    return decoded[0] if decoded else None
+
+
+def _keyset_q(ordering, values, forward):
+    """Rows strictly after (``forward``) or before the given key"""
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        ascending = not field.startswith('-')
+        lookup = 'gt' if ascending == forward else 'lt'
+        clause = Q(**{f'{name}__{lookup}': values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            clause &= Q(**{prev_field.lstrip('-'): prev_value})
+        condition |= clause
+    return condition
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+
+
+def _page_query(queryset, params, per_page):
+    """The query for one page and how to read its result (see paginate)"""
+    ordering = list(queryset.query.order_by)
+    after = decode_cursor(params.get('after'))
+    before = decode_cursor(params.get('before')) if not after else None
+    # A cursor from a differently ordered listing (e.g. before a search) is ignored
+    if after and len(after[1]) != len(ordering):
+        after = None
+    if before and len(before[1]) != len(ordering):
+        before = None
+
+    if before:
+        query = queryset.filter(_keyset_q(ordering, before[1], forward=False)).order_by(*_reverse(ordering))
+    elif after:
+        query = queryset.filter(_keyset_q(ordering, after[1], forward=True)).order_by(*ordering)
+    else:
+        query = queryset.order_by(*ordering)
+    return query[:per_page + 1], ordering, after, before
+
+
+def page_query(queryset, params, per_page):
+    """The query paginate() runs on ``queryset`` for one page, e.g. to inspect its plan"""
+    return _page_query(queryset, params, per_page)[0]
+
+
+def _compare_keys(ordering):
+    """A cmp function for key value lists in ``ordering``"""
+    def compare(a, b):
+        for field, x, y in zip(ordering, a, b):
+            if x != y:
+                result = -1 if x < y else 1
+                return -result if field.startswith('-') else result
+        return 0
+    return compare
+
+
+def row_sort_key(ordering):
+    """A sort key that puts instances or values() dicts in ``ordering``"""
+    compare = _compare_keys(ordering)
+    return cmp_to_key(lambda a, b: compare(_key(a, ordering), _key(b, ordering)))
+
+
+def _page_rows(rows, ordering, after, before, per_page):
+    """What _page_query would read from a queryset, taken from the in-memory ``rows``.
+
+    ``rows`` is a list in any order, or an iterator already in ``ordering``,
+    which is read no further than the end of the page.
+    """
+    compare = _compare_keys(ordering)
+    if isinstance(rows, list):
+        rows = iter(sorted(rows, key=row_sort_key(ordering)))
+    if before:
+        # Only the rows just before the cursor are kept
+        earlier = takewhile(lambda row: compare(_key(row, ordering), before[1]) < 0, rows)
+        return list(deque(earlier, maxlen=per_page + 1))[::-1]
+    if after:
+        rows = dropwhile(lambda row: compare(_key(row, ordering), after[1]) <= 0, rows)
+    return list(islice(rows, per_page + 1))
+
+
+def _merge(results, ordering, limit):
+    """The first ``limit`` rows of the already ``ordering``-sorted ``results``, merged"""
+    return list(heapq.merge(*results, key=row_sort_key(ordering)))[:limit]
+
+
+def _make_page(rows, per_page, now, ordering, after, before):
+    if before:
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = after is not None
+
+    next_cursor = encode_cursor(rows[-1], ordering, now) if rows and has_next else None
+    previous_cursor = encode_cursor(rows[0], ordering, now) if rows and has_previous else None
+    return CursorPage(rows, next_cursor, previous_cursor)
+
+
+def paginate(queryset, params, per_page, now, also=()):
+    """Fetch one page of an ordered ``queryset``.
+
+    The ordering must be a unique key of plain field or annotation names.
+    ``params`` may carry an ``after`` or ``before`` cursor produced by a
+    previous page. Only ``per_page + 1`` rows are read whatever the depth.
+    Rows of the querysets in ``also``, ordered the same way and with keys
+    unique across all of them, are merged into the page. An item of
+    ``also`` may be a list of rows instead, in any order, or an iterator of
+    rows in that order.
+    """
+    query, *state = _page_query(queryset, params, per_page)
+    rows = list(query)
+    if also:
+        results = [rows, *(
+            list(_page_query(other, params, per_page)[0]) if isinstance(other, QuerySet)
+            else _page_rows(other, *state, per_page)
+            for other in also
+        )]
+        rows = _merge(results, query.query.order_by, per_page + 1)
+    return _make_page(rows, per_page, now, *state)
+
+
+async def apaginate(queryset, params, per_page, now, also=()):
+    """Async version of paginate()"""
+    query, *state = _page_query(queryset, params, per_page)
+    rows = [row async for row in query]
+    if also:
+        results = [rows]
+        for other in also:
+            if isinstance(other, QuerySet):
+                results.append([row async for row in _page_query(other, params, per_page)[0]])
+            else:
+                results.append(_page_rows(other, *state, per_page))
+        rows = _merge(results, query.query.order_by, per_page + 1)
+    return _make_page(rows, per_page, now, *state)
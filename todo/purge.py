@@ -0,0 +1,52 @@
+"""Removal of soft-deleted tasks in bounded batches.
+
+delete_subtrees only flags a subtree (Task.deleted_at), which hides it from
+Task.objects straight away. The rows are removed here, deepest first, so a
+batch never removes a task whose subtasks are still there. Each batch is one
+transaction. A crash loses at most the batch in flight, and the next run
+carries on from whatever is still flagged. The same worker trims the change
+log (todo.changes) to its retention period.
+"""
+import time
+
+from django.db import transaction
+from django.db.models.functions import Length
+
+from .changes import prune_change_log
+from .models import Task
+
+PURGE_BATCH_SIZE = 500
+
+
+def pending_purge():
+    """Flagged rows, in the order they are purged (served by task_purge_idx)"""
+    return Task.all_objects.filter(deleted_at__isnull=False).order_by(Length('path').desc(), 'id')
+
+
+def purge_batch(batch_size=PURGE_BATCH_SIZE):
+    """Delete up to ``batch_size`` flagged rows; returns how many went"""
+    with transaction.atomic():
+        ids = list(pending_purge().values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0
+        # Category counts left these tasks out when they were flagged
+        Task.all_objects.filter(id__in=ids)._raw_delete(Task.all_objects.db)
+    return len(ids)
+
+
+def purge_deleted(batch_size=PURGE_BATCH_SIZE, max_batches=None, pause=0):
+    """Purge batches until nothing is flagged (or ``max_batches`` ran); returns the row count.
+
+    ``pause`` seconds between batches leave room for request writes.
+    """
+    purged = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = purge_batch(batch_size)
+        if not count:
+            break
+        purged += count
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    prune_change_log()
+    return purged
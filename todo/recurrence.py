@@ -0,0 +1,238 @@
+"""Recurring tasks: a few stored occurrences, the rest computed when viewed.
+
+A task with a recurrence rule is the first occurrence of a series. Only the
+occurrences someone can act on are stored: completing one in the dashboard
+stores the next, and materialize_occurrences() keeps everything due within
+MATERIALIZE_HORIZON stored, so reminders and stats see it. Later occurrences
+are virtual: unsaved Task instances that virtual_occurrences() computes for
+the window being viewed, at most TODO_RECURRENCE_WINDOW ahead. The dashboard
+and the API merge them into their pages, computing only the ones a page
+reaches, as of occurrence_clock(): between two ticks of that clock they only
+change with the stored rows, so conditional GETs need not compute them.
+
+Every due date is counted from the first occurrence's, so monthly dates
+that a short month clamped come back to their day. A series goes on from
+its tail, the open occurrence with no stored successor; storing the
+successor marks the tail series_continued. Completing the tail stores the
+next one. Deleting it ends the series. Repetitions that fell due while the
+tail stayed open are skipped rather than piled up as overdue copies. The
+unique (series_id, occurrence) constraint keeps concurrent writers from
+storing an occurrence twice. Moving an occurrence's date or changing its
+rule starts a new series at it (see follow_schedule).
+"""
+import calendar
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .categories import refresh_category_counts
+from .models import Task, refresh_parent_counts
+from .pagination import row_sort_key
+from .reminders import LOOKAHEAD
+
+# Occurrences due this soon are stored; reminders load that far ahead too
+MATERIALIZE_HORIZON = LOOKAHEAD
+# Virtual ids are negative and leave room for this many occurrences per series
+VIRTUAL_ID_SPAN = 10 ** 6
+# Virtual occurrences are computed as of the clock rounded down to this
+CLOCK_RESOLUTION = timedelta(minutes=1)
+
+# Copied from an occurrence to the next
+OCCURRENCE_FIELDS = (
+    'title', 'description', 'notes', 'priority', 'category_id', 'parent_task_id',
+    'recurrence', 'recurrence_interval', 'recurrence_until', 'recurrence_count',
+)
+# What an occurrence's due dates follow from; editing any starts a new series
+SCHEDULE_FIELDS = ('due_date', 'recurrence', 'recurrence_interval')
+# What follow_schedule() may rewrite
+SERIES_FIELDS = ('series_id', 'series_start', 'occurrence', 'recurrence_count')
+
+
+def recurrence_window():
+    return getattr(settings, 'TODO_RECURRENCE_WINDOW', timedelta(days=31))
+
+
+def occurrence_clock(now):
+    """``now`` rounded down to CLOCK_RESOLUTION, the time virtual occurrences are computed as of"""
+    return now - (now - now.replace(hour=0, minute=0, second=0, microsecond=0)) % CLOCK_RESOLUTION
+
+
+def add_months(value, months):
+    """``value`` moved by whole months, on the same day or the month's last one"""
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    return value.replace(year=year, month=month, day=min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def shift(due_date, recurrence, interval, steps):
+    """The due date ``steps`` repetitions after ``due_date``"""
+    if recurrence == 'daily':
+        return due_date + timedelta(days=interval * steps)
+    if recurrence == 'weekly':
+        return due_date + timedelta(weeks=interval * steps)
+    return add_months(due_date, interval * steps)
+
+
+def steps_until(due_date, recurrence, interval, moment):
+    """How many repetitions after ``due_date`` are at least due by ``moment``; a lower bound"""
+    if moment <= due_date:
+        return 0
+    if recurrence == 'monthly':
+        # The month before moment's is surely reached, whatever the days
+        months = (moment.year - due_date.year) * 12 + moment.month - due_date.month - 1
+        return max(months // interval, 0)
+    unit = timedelta(days=1) if recurrence == 'daily' else timedelta(weeks=1)
+    return (moment - due_date) // (unit * interval)
+
+
+def series_start(task):
+    """Due date of the first occurrence of ``task``'s series, which every other one is counted from"""
+    if task.series_start is not None:
+        return task.series_start
+    # The first occurrence, or one stored before series recorded their start
+    return shift(task.due_date, task.recurrence, task.recurrence_interval, 1 - task.occurrence)
+
+
+def occurrence_due(task, occurrence):
+    """Due date of occurrence number ``occurrence`` of the series ``task`` belongs to, or None past its end"""
+    if task.recurrence_count is not None and occurrence > task.recurrence_count:
+        return None
+    due_date = shift(series_start(task), task.recurrence, task.recurrence_interval, occurrence - 1)
+    if task.recurrence_until is not None and due_date > task.recurrence_until:
+        return None
+    return due_date
+
+
+def upcoming(task, now):
+    """``(number, due date)`` of the first occurrence after ``task`` due after ``now``, or None"""
+    if not task.recurrence or task.due_date is None:
+        return None
+    # Skip the repetitions that are surely past, then step over the rest
+    start = series_start(task)
+    number = max(task.occurrence + 1, 1 + steps_until(start, task.recurrence, task.recurrence_interval, now))
+    due_date = occurrence_due(task, number)
+    while due_date is not None and due_date <= now:
+        number += 1
+        due_date = occurrence_due(task, number)
+    return None if due_date is None else (number, due_date)
+
+
+def next_occurrence(task, now):
+    """The unsaved occurrence that follows ``task``, or None when the series ends with it"""
+    following = upcoming(task, now)
+    if following is None:
+        return None
+    number, due_date = following
+    return Task(
+        **{field: getattr(task, field) for field in OCCURRENCE_FIELDS},
+        due_date=due_date, series_id=task.series_key, series_start=series_start(task), occurrence=number,
+    )
+
+
+def schedule(task):
+    """What ``task``'s due dates follow from; pass it to follow_schedule() after an edit"""
+    return tuple(getattr(task, field) for field in SCHEDULE_FIELDS)
+
+
+def follow_schedule(task, old_schedule):
+    """Start a new series at ``task`` if an edit moved it off its series' dates; returns the fields changed.
+
+    Later occurrences are counted from the first one, so without this an
+    edited date or rule would only hold for the occurrence it was made on.
+    """
+    if task.series_start is None or schedule(task) == old_schedule:
+        return ()
+    if task.recurrence_count is not None:
+        # The count covers the occurrences still to come
+        task.recurrence_count = max(task.recurrence_count - task.occurrence + 1, 1)
+    task.series_id = task.series_start = None
+    task.occurrence = 1
+    return SERIES_FIELDS
+
+
+def store_next_occurrence(task, now):
+    """Store the occurrence that follows ``task`` unless it already is; returns it, or None"""
+    occurrence = next_occurrence(task, now)
+    if occurrence is None:
+        return None
+    try:
+        with transaction.atomic():
+            occurrence.save()
+            Task.objects.filter(id=task.id).update(series_continued=True)
+            task.series_continued = True
+            refresh_parent_counts(occurrence.parent_task_id)
+            refresh_category_counts(occurrence.category_id)
+    except IntegrityError:
+        # Stored meanwhile by another request or the materializer
+        return None
+    return occurrence
+
+
+def continue_series(task_ids, now):
+    """Store the next occurrence of each completed recurring task among ``task_ids``; returns them"""
+    completed = Task.objects.filter(id__in=task_ids, completed=True).exclude(recurrence='')
+    occurrences = [store_next_occurrence(task, now) for task in completed]
+    return [occurrence for occurrence in occurrences if occurrence is not None]
+
+
+def materialize_occurrences(now, horizon=MATERIALIZE_HORIZON):
+    """Store every occurrence due before ``now + horizon``; returns how many were stored"""
+    stored = 0
+    while True:
+        # Each round stores one more occurrence of every series that needs one
+        created = 0
+        for tail in Task.objects.series_tails().filter(due_date__lt=now + horizon):
+            following = upcoming(tail, now)
+            if following is not None and following[1] < now + horizon:
+                created += store_next_occurrence(tail, now) is not None
+        stored += created
+        if not created:
+            return stored
+
+
+def virtual_id(task, occurrence):
+    return -(task.series_key * VIRTUAL_ID_SPAN + occurrence)
+
+
+def _series_occurrences(tail, now, until, since):
+    """The unsaved occurrences following ``tail`` due after ``now`` and ``since`` and before ``until``, in due order"""
+    # Those due before since are on pages already seen; jump past them
+    following = upcoming(tail, max(now, since - timedelta(microseconds=1)) if since else now)
+    if following is None:
+        return
+    number, due_date = following
+    start = series_start(tail)
+    while due_date is not None and due_date < until and number < VIRTUAL_ID_SPAN:
+        occurrence = Task(
+            **{field: getattr(tail, field) for field in OCCURRENCE_FIELDS},
+            id=virtual_id(tail, number), due_date=due_date, series_id=tail.series_key,
+            series_start=start, occurrence=number,
+            created_at=tail.created_at, last_modified=tail.last_modified,
+        )
+        occurrence.virtual = True
+        occurrence.category = tail.category
+        occurrence.parent_task = tail.parent_task
+        occurrence.ordering_due = due_date
+        for name in ('search_rank', 'search_snippet'):
+            if hasattr(tail, name):
+                setattr(occurrence, name, getattr(tail, name))
+        yield occurrence
+        number += 1
+        due_date = occurrence_due(tail, number)
+
+
+def virtual_occurrences(tails, now, until, ordering, since=None):
+    """Unsaved occurrences following each tail, due after ``now`` (and ``since``) and before ``until``.
+
+    They carry what the dashboard orders and renders by (including the
+    tail's search annotations) and a negative id, so they work as keyset
+    cursors next to stored tasks. ``tails`` should come from
+    ``series_tails().for_dashboard()``. The result is an iterator in
+    ``ordering``, which must keep each series in due order as the dashboard
+    orderings do; an occurrence is only computed once the page reaches it.
+    """
+    return heapq.merge(
+        *(_series_occurrences(tail, now, until, since) for tail in tails), key=row_sort_key(ordering),
+    )
@@ -0,0 +1,225 @@
+"""Due-date reminders, sent by a scheduler process rather than computed on page views.
+
+Every open task with a due date gets two reminders: 'due' when its due day
+starts (Task.is_due_today turns true) and 'overdue' at the due date itself
+(Task.is_overdue). The scheduler keeps them in a min-heap by firing time.
+Tasks are loaded into it a slice at a time, in due-date order, by a keyset
+range query on the open-task due-date index (task_active_due_idx), staying
+LOOKAHEAD ahead of the clock. Nothing scans the task table.
+
+Edits reach the heap through the change log (todo.changes). Each task the
+log names since the last look is re-read and rescheduled, so a due date
+moved in edit_task, the API or a bulk action takes effect within a poll and
+nothing else is reloaded. Heap entries are never removed: an entry whose due
+date no longer matches its task's is skipped when it comes up.
+
+Each reminder goes to each notifier (todo.notifiers) once. The scheduler
+claims a ReminderDelivery row before notifying, so several schedulers never
+send the same reminder twice. A notifier that fails gives its claim back and
+is retried after RETRY_DELAY. Only a crash between the claim and the send
+loses a reminder.
+"""
+import heapq
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .changes import FEED_BATCH_SIZE, latest_change_id
+from .models import ReminderDelivery, Task, TaskChange
+from .notifiers import Reminder
+
+logger = logging.getLogger(__name__)
+
+# 'due' reminders fire up to a day before the due date, so more than that
+LOOKAHEAD = timedelta(days=2)
+# On start, reminders that came due this long ago are still sent if they were not
+CATCH_UP = timedelta(days=1)
+LOAD_BATCH_SIZE = 500
+POLL_INTERVAL = 5.0
+RETRY_DELAY = timedelta(minutes=1)
+# Delivery rows are kept well past CATCH_UP, or started schedulers would send again
+REMINDER_LOG_RETENTION = timedelta(days=7)
+PRUNE_INTERVAL = timedelta(hours=1)
+
+
+def due_day_start(due_date):
+    """When a task becomes due today (mirrors Task.is_due_today)"""
+    return due_date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def reminder_times(due_date):
+    """``(firing time, kind)`` of each reminder for a task due at ``due_date``"""
+    return [(due_day_start(due_date), ReminderDelivery.DUE), (due_date, ReminderDelivery.OVERDUE)]
+
+
+def prune_reminder_log(now=None):
+    """Drop delivery rows of due dates older than REMINDER_LOG_RETENTION; returns how many went"""
+    cutoff = (now or timezone.now()) - REMINDER_LOG_RETENTION
+    deleted, _ = ReminderDelivery.objects.filter(due_date__lt=cutoff).delete()
+    return deleted
+
+
+class ReminderScheduler:
+    def __init__(self, notifiers):
+        self.notifiers = notifiers
+        # (firing time, task id, kind, due date)
+        self.heap = []
+        # Due date of every task whose reminders are in the heap
+        self.scheduled = {}
+        # (due date, id) of the last task loaded; every open task up to it is scheduled
+        self.cursor = None
+        self.change_id = None
+        self.pruned_at = None
+
+    def start(self, now):
+        """(Re)load the reminders from CATCH_UP ago to LOOKAHEAD ahead"""
+        self.heap.clear()
+        self.scheduled.clear()
+        # Read first, so writes made while loading are replayed
+        self.change_id = latest_change_id()
+        self.cursor = (now - CATCH_UP, 0)
+        self.load(now)
+
+    def tick(self, now):
+        """Catch up with edits, extend the heap and send what is due; returns the deliveries made"""
+        if self.cursor is None:
+            self.start(now)
+        else:
+            self.follow_changes(now)
+            self.load(now)
+        if self.pruned_at is None or now - self.pruned_at >= PRUNE_INTERVAL:
+            prune_reminder_log(now)
+            self.pruned_at = now
+        return self.fire_due(now)
+
+    def load(self, now):
+        """Schedule the open tasks due up to LOOKAHEAD ahead of ``now``; returns how many were added"""
+        horizon = now + LOOKAHEAD
+        loaded = 0
+        while self.cursor[0] < horizon:
+            due, last_id = self.cursor
+            rows = list(Task.objects.filter(
+                Q(due_date__gt=due) | Q(due_date=due, id__gt=last_id),
+                completed=False, due_date__lt=horizon,
+            ).order_by('due_date', 'id').values_list('id', 'due_date')[:LOAD_BATCH_SIZE])
+            for task_id, due_date in rows:
+                self.schedule(task_id, due_date)
+            loaded += len(rows)
+            if len(rows) < LOAD_BATCH_SIZE:
+                self.cursor = (horizon, 0)
+            else:
+                self.cursor = (rows[-1][1], rows[-1][0])
+        return loaded
+
+    def schedule(self, task_id, due_date):
+        """Put the reminders of an open task due at ``due_date`` in the heap"""
+        if self.scheduled.get(task_id) == due_date:
+            return
+        self.scheduled[task_id] = due_date
+        for fire_at, kind in reminder_times(due_date):
+            heapq.heappush(self.heap, (fire_at, task_id, kind, due_date))
+
+    def follow_changes(self, now):
+        """Reschedule the tasks written since the last call; returns how many"""
+        task_ids = set()
+        while True:
+            rows = list(TaskChange.objects.filter(id__gt=self.change_id).order_by('id').values_list(
+                'id', 'task_id',
+            )[:FEED_BATCH_SIZE])
+            if rows and rows[0][0] > self.change_id + 1:
+                # Entries were pruned before we saw them; start over
+                logger.warning("The change log moved past the reminder scheduler; reloading")
+                self.start(now)
+                return 0
+            if rows:
+                self.change_id = rows[-1][0]
+                task_ids.update(task_id for _, task_id in rows)
+            if len(rows) < FEED_BATCH_SIZE:
+                break
+        due_dates = {}
+        task_ids = sorted(task_ids)
+        for start in range(0, len(task_ids), LOAD_BATCH_SIZE):
+            due_dates.update(Task.objects.filter(
+                id__in=task_ids[start:start + LOAD_BATCH_SIZE], completed=False, due_date__isnull=False,
+            ).values_list('id', 'due_date'))
+        for task_id in task_ids:
+            due_date = due_dates.get(task_id)
+            if due_date is None or (due_date, task_id) > self.cursor:
+                # Completed, undated, deleted or archived; or beyond the cursor, where load() gets it
+                self.scheduled.pop(task_id, None)
+            else:
+                self.schedule(task_id, due_date)
+        return len(task_ids)
+
+    def next_wakeup(self, now):
+        """Seconds until the next reminder is due, at most POLL_INTERVAL"""
+        if not self.heap:
+            return POLL_INTERVAL
+        return max(0.0, min(POLL_INTERVAL, (self.heap[0][0] - now).total_seconds()))
+
+    def fire_due(self, now):
+        """Send every reminder whose time has come; returns the deliveries made"""
+        entries = []
+        while self.heap and self.heap[0][0] <= now:
+            entry = heapq.heappop(self.heap)
+            if self.scheduled.get(entry[1]) == entry[3]:
+                entries.append(entry)
+        if not entries:
+            return 0
+        task_ids = {task_id for _, task_id, _, _ in entries}
+        # The task may have changed since the change log was last read
+        tasks = {
+            task_id: (due_date, title) for task_id, due_date, title in
+            Task.objects.filter(id__in=task_ids, completed=False).values_list('id', 'due_date', 'title')
+        }
+        delivered = set(ReminderDelivery.objects.filter(task_id__in=task_ids).values_list(
+            'task_id', 'kind', 'due_date', 'notifier',
+        ))
+        sent = 0
+        for _, task_id, kind, due_date in entries:
+            due_date_now, title = tasks.get(task_id, (None, None))
+            if due_date_now != due_date:
+                # The change log will reschedule it
+                continue
+            if kind == ReminderDelivery.DUE and due_date <= now:
+                # Already overdue, which is reminded of instead
+                continue
+            reminder = Reminder(task_id, title, kind, due_date)
+            retry = False
+            for notifier in self.notifiers:
+                if (task_id, kind, due_date, notifier.name) in delivered:
+                    continue
+                try:
+                    sent += self.deliver(notifier, reminder, now)
+                except Exception:
+                    logger.exception("The %s notifier failed on task %s", notifier.name, task_id)
+                    retry = True
+            if retry:
+                heapq.heappush(self.heap, (now + RETRY_DELAY, task_id, kind, due_date))
+            elif kind == ReminderDelivery.OVERDUE:
+                # Nothing left to send until the due date changes
+                self.scheduled.pop(task_id, None)
+        return sent
+
+    def deliver(self, notifier, reminder, now):
+        """Claim the reminder for ``notifier`` and send it; returns whether it was sent here"""
+        try:
+            with transaction.atomic():
+                claim = ReminderDelivery.objects.create(
+                    task_id=reminder.task_id, kind=reminder.kind, due_date=reminder.due_date,
+                    notifier=notifier.name, claimed_at=now,
+                )
+        except IntegrityError:
+            # Another scheduler has it
+            return False
+        try:
+            notifier.notify(reminder)
+        except Exception:
+            # Give the claim back so the reminder is tried again
+            claim.delete()
+            raise
+        ReminderDelivery.objects.filter(id=claim.id).update(delivered_at=timezone.now())
+        return True
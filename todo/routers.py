@@ -0,0 +1,34 @@
+"""Send reads made while serving safe (GET/HEAD) requests to a read-only connection.
+
+ReadOnlyRequestMiddleware marks those requests; everything else, including
+management commands and any request that writes, uses 'default'. So do
+reads made while a transaction is open on 'default', even in a safe
+request: the replica cannot see that transaction's writes.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+READ_DATABASE = 'replica'
+WRITE_DATABASE = 'default'
+
+read_only_request = ContextVar('read_only_request', default=False)
+
+
+class ReadWriteRouter:
+    def db_for_read(self, model, **hints):
+        if read_only_request.get() and READ_DATABASE in settings.DATABASES \
+                and not connections[WRITE_DATABASE].in_atomic_block:
+            return READ_DATABASE
+        return WRITE_DATABASE
+
+    def db_for_write(self, model, **hints):
+        return WRITE_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases point at the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == WRITE_DATABASE
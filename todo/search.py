@@ -0,0 +1,182 @@
+"""Pluggable full-text search over task title, description and notes.
+
+The backend is chosen with the ``TODO_SEARCH_BACKEND`` setting (a dotted
+path); by default SQLite uses an FTS5 index, PostgreSQL uses ``tsvector``
+search and any other database falls back to ``icontains``.
+
+Every backend's ``search()`` filters a Task queryset and annotates
+``search_rank`` (lower is more relevant) and ``search_snippet``. Snippet
+matches are wrapped in ``HIGHLIGHT_START`` / ``HIGHLIGHT_END`` and turned
+into ``<mark>`` by the ``highlight_snippet`` template filter after escaping.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import F, FloatField, Func, Lookup, Q, TextField, Value
+from django.utils.module_loading import import_string
+
+from .models import TaskSearchIndex
+
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+SNIPPET_TOKENS = 16
+
+DEFAULT_BACKENDS = {
+    'sqlite': 'todo.search.SQLiteFTSBackend',
+    'postgresql': 'todo.search.PostgresSearchBackend',
+}
+
+
+def search_terms(query):
+    """Split a user query into the words every backend searches for"""
+    return re.findall(r'\w+', query)
+
+
+class BaseSearchBackend:
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def install(self, using='default'):
+        """Create or repair any database structures the backend needs"""
+
+    def rebuild(self, using='default'):
+        """Re-index every task from scratch"""
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Unindexed ``icontains`` search, for databases without full-text support"""
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(description__icontains=term) | Q(notes__icontains=term)
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField()),
+            search_snippet=Value('', output_field=TextField()),
+        )
+
+
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+TaskSearchIndex._meta.get_field('document').register_lookup(Match)
+
+
+class Snippet(Func):
+    function = 'snippet'
+    output_field = TextField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        table = connection.ops.quote_name(TaskSearchIndex._meta.db_table)
+        sql = f"snippet({table}, -1, %s, %s, %s, {SNIPPET_TOKENS})"
+        return sql, [HIGHLIGHT_START, HIGHLIGHT_END, '…']
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """FTS5 external-content index kept in sync with ``todo_task`` by triggers.
+
+    The triggers also see ``QuerySet.update()``, ``bulk_create()`` and
+    cascade deletes, which model signals would miss.
+    """
+
+    table = TaskSearchIndex._meta.db_table
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        # Every word must match, each as a prefix
+        fts_query = ' '.join('"%s"*' % term for term in terms)
+        return queryset.filter(search_index__document__match=fts_query).annotate(
+            search_rank=F('search_index__rank'),
+            search_snippet=Snippet(),
+        )
+
+    def install(self, using='default'):
+        conn = connections[using]
+        if conn.vendor != 'sqlite':
+            return
+        with conn.cursor() as cursor:
+            created = self.table not in conn.introspection.table_names(cursor)
+            for statement in self.schema_sql():
+                cursor.execute(statement)
+        if created:
+            self.rebuild(using)
+
+    def rebuild(self, using='default'):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')")
+
+    def schema_sql(self):
+        t = self.table
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {t} USING fts5("
+            f"title, description, notes, content='todo_task', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER IF NOT EXISTS {t}_ai AFTER INSERT ON todo_task BEGIN "
+            f"INSERT INTO {t}(rowid, title, description, notes) "
+            f"VALUES (new.id, new.title, new.description, new.notes); END",
+            f"CREATE TRIGGER IF NOT EXISTS {t}_ad AFTER DELETE ON todo_task BEGIN "
+            f"INSERT INTO {t}({t}, rowid, title, description, notes) "
+            f"VALUES ('delete', old.id, old.title, old.description, old.notes); END",
+            f"CREATE TRIGGER IF NOT EXISTS {t}_au AFTER UPDATE OF title, description, notes ON todo_task BEGIN "
+            f"INSERT INTO {t}({t}, rowid, title, description, notes) "
+            f"VALUES ('delete', old.id, old.title, old.description, old.notes); "
+            f"INSERT INTO {t}(rowid, title, description, notes) "
+            f"VALUES (new.id, new.title, new.description, new.notes); END",
+        ]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """``tsvector`` search with weighted fields (title > description > notes).
+
+    For large tables add a GIN index on the same ``to_tsvector`` expression.
+    """
+
+    config = 'simple'
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        vector = (
+            SearchVector('title', weight='A', config=self.config)
+            + SearchVector('description', weight='B', config=self.config)
+            + SearchVector('notes', weight='C', config=self.config)
+        )
+        search_query = SearchQuery(
+            ' & '.join('%s:*' % term for term in terms), search_type='raw', config=self.config
+        )
+        return queryset.annotate(search_vector=vector).filter(search_vector=search_query).annotate(
+            search_rank=-SearchRank(F('search_vector'), search_query),
+            search_snippet=SearchHeadline(
+                'description', search_query, config=self.config,
+                start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_END, max_words=SNIPPET_TOKENS,
+            ),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    path = getattr(settings, 'TODO_SEARCH_BACKEND', None)
+    if path is None:
+        path = DEFAULT_BACKENDS.get(connection.vendor, 'todo.search.SimpleSearchBackend')
+    return import_string(path)()
+
+
+def install_search_backend(using='default', **kwargs):
+    """post_migrate hook: (re)create index structures, e.g. after table rebuilds"""
+    get_search_backend().install(using)
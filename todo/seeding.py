@@ -0,0 +1,89 @@
+"""Reproducible synthetic task datasets for benchmarks and query-plan checks.
+
+Rows are generated lazily and loaded through ``TaskImporter``, so seeding
+a million tasks takes the same fast path as an import. Every generated
+title and category name starts with SEED_PREFIX, which is how
+``clear_seeded`` finds them again.
+"""
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .bulk import delete_subtrees
+from .models import Category, Task
+from .purge import purge_deleted
+from .transfer import TaskImporter
+
+SEED_PREFIX = '[seed]'
+
+
+def category_weights(count, skew):
+    """Zipf-like weights: category i is picked proportionally to 1 / (i + 1) ** skew"""
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+
+def generate_rows(count, *, categories=5, category_skew=1.0, uncategorized=0.2, tree_ratio=0.1,
+                  fanout=3, depth=2, completed=0.6, no_due=0.3, due_past_days=60, due_future_days=90,
+                  seed=0, now=None):
+    """Yield ``count`` task dicts in the import format.
+
+    A ``tree_ratio`` share of the top-level tasks get a subtree with
+    ``fanout`` children per task, ``depth`` levels deep; the rest are flat.
+    Due dates spread uniformly from ``due_past_days`` ago to
+    ``due_future_days`` ahead, and ``no_due`` of the tasks have none.
+    """
+    rng = random.Random(seed)
+    now = now or timezone.now()
+    names = [f"{SEED_PREFIX} category {number}" for number in range(1, categories + 1)]
+    weights = category_weights(categories, category_skew)
+    past, future = -due_past_days * 24 * 60, due_future_days * 24 * 60
+
+    def row(row_id, parent_id):
+        due_date = None if rng.random() < no_due else now + timedelta(minutes=rng.randint(past, future))
+        category = '' if not names or rng.random() < uncategorized else rng.choices(names, weights)[0]
+        return {
+            'id': row_id,
+            'title': f"{SEED_PREFIX} task {row_id}",
+            'priority': rng.choice('LMH'),
+            'completed': rng.random() < completed,
+            'due_date': due_date.isoformat() if due_date else '',
+            'category_name': category,
+            'parent_task_id': parent_id,
+        }
+
+    generated = 0
+    while generated < count:
+        generated += 1
+        root_id = generated
+        yield row(root_id, None)
+        if fanout <= 0 or depth <= 0 or rng.random() >= tree_ratio:
+            continue
+        level = [root_id]
+        for _ in range(depth):
+            next_level = []
+            for parent_id in level:
+                for _ in range(fanout):
+                    if generated >= count:
+                        return
+                    generated += 1
+                    next_level.append(generated)
+                    yield row(generated, parent_id)
+            level = next_level
+
+
+def seed_tasks(count, batch_size=5000, **options):
+    """Insert ``count`` generated tasks (see generate_rows) and return how many were added"""
+    if count <= 0:
+        return 0
+    # Row ids in the generated data are only used to link parents
+    return TaskImporter(batch_size=batch_size, keep_ids=False).run(generate_rows(count, **options))
+
+
+def clear_seeded():
+    """Delete every seeded task (with its subtasks) and seeded category"""
+    roots = Task.objects.filter(title__startswith=SEED_PREFIX, parent_task__isnull=True)
+    deleted = delete_subtrees(roots.values_list('id', flat=True))
+    purge_deleted()
+    Category.objects.filter(name__startswith=SEED_PREFIX, task_count=0).delete()
+    return deleted
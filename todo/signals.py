@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .categories import invalidate_categories
+from .conditional import note_task_deleted
+from .models import Category, Task
+from .stats import invalidate_task_stats
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def task_changed(sender, **kwargs):
+    """Per-instance writes; QuerySet.update() callers invalidate explicitly"""
+    invalidate_task_stats()
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, **kwargs):
+    """Deletions do not show in MAX(last_modified); moves the dashboard's Last-Modified"""
+    note_task_deleted()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    invalidate_categories()
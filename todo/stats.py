@@ -0,0 +1,81 @@
+"""Sidebar task statistics, computed in one query and cached between writes"""
+import math
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import ArchivedTask, Task, overdue_q
+
+STATS_CACHE_KEY = 'todo:task_stats'
+ARCHIVED_COUNT_KEY = 'todo:archived_count'
+# Upper bound on how long stats are reused; writes invalidate them sooner
+STATS_CACHE_TIMEOUT = 300
+
+
+def compute_task_stats(now=None):
+    """Total, completed, overdue and due-today counts in a single aggregate query.
+
+    Also returns the number of seconds the result stays valid: overdue and
+    due-today counts change on their own when the next due date passes or
+    the day rolls over, even without any write. Archived tasks, all of them
+    completed, count towards the total and completed figures.
+    """
+    now = now or timezone.now()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow_start = today_start + timedelta(days=1)
+    stats = Task.objects.order_by().aggregate(
+        total_tasks=Count('id'),
+        completed_tasks=Count('id', filter=Q(completed=True)),
+        overdue_tasks=Count('id', filter=overdue_q(now)),
+        today_tasks=Count('id', filter=Q(completed=False, due_date__gte=today_start, due_date__lt=tomorrow_start)),
+        next_due=Min('due_date', filter=Q(completed=False, due_date__gte=now)),
+    )
+    archived = archived_count()
+    stats['total_tasks'] += archived
+    stats['completed_tasks'] += archived
+    next_change = tomorrow_start
+    next_due = stats.pop('next_due')
+    if next_due is not None and next_due < next_change:
+        next_change = next_due
+    valid_for = math.ceil((next_change - now).total_seconds())
+    return stats, max(1, min(STATS_CACHE_TIMEOUT, valid_for))
+
+
+def archived_count():
+    """Number of archived tasks; cached until todo.archive moves tasks"""
+    count = cache.get(ARCHIVED_COUNT_KEY)
+    if count is None:
+        count = ArchivedTask.objects.count()
+        cache.set(ARCHIVED_COUNT_KEY, count, None)
+    return count
+
+
+def get_task_stats():
+    """Cached task statistics; costs no queries on a cache hit"""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats, timeout = compute_task_stats()
+        cache.set(STATS_CACHE_KEY, stats, timeout)
+    return stats
+
+
+async def aget_task_stats():
+    """Async version of get_task_stats().
+
+    On a miss the aggregate runs in a worker thread of its own (with its own
+    connection) rather than the request's thread-sensitive one, so it can
+    overlap with the request's other queries instead of queueing behind them.
+    """
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats, timeout = await sync_to_async(compute_task_stats, thread_sensitive=False)()
+        cache.set(STATS_CACHE_KEY, stats, timeout)
+    return stats
+
+
+def invalidate_task_stats(**kwargs):
+    """Drop cached stats; also usable directly as a signal receiver"""
+    cache.delete(STATS_CACHE_KEY)
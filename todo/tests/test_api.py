@@ -0,0 +1,79 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from todo.models import Category, Task
+
+
+class TaskApiTests(TestCase):
+    def send(self, method, url, data):
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json')
+
+    def test_create_read_update_delete(self):
+        parent = Task.objects.create(title="Garden")
+        response = self.send('post', reverse('api_task_list'), {
+            'title': "Mow", 'priority': 'H', 'category': "Home", 'parent_task_id': parent.id,
+        })
+        self.assertEqual(response.status_code, 201)
+        created = response.json()
+        self.assertEqual((created['category_name'], created['parent_task_id']), ("Home", parent.id))
+        url = reverse('api_task_detail', args=[created['id']])
+        self.assertEqual(self.client.get(url).json()['title'], "Mow")
+
+        response = self.send('patch', url, {'completed': True, 'category': None})
+        self.assertEqual(response.json()['completed'], True)
+        parent.refresh_from_db()
+        self.assertEqual((parent.subtask_total, parent.subtask_completed), (1, 1))
+        self.assertEqual(Category.objects.get(name="Home").task_count, 0)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_writes_need_a_json_body(self):
+        response = self.client.post(reverse('api_task_list'), {'title': "Mow"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('body', response.json()['errors'])
+
+    def test_batch_create_writes_in_chunks(self):
+        parent = Task.objects.create(title="Inbox")
+        items = [
+            {'title': f"Item {number}", 'category': f"Batch {number % 3}", 'parent_task_id': parent.id}
+            for number in range(1000)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.send('post', reverse('api_task_batch'), {'tasks': items})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 1000)
+        # Statements come per chunk of rows (the insert's chunks are bounded by SQLite's parameter limit)
+        self.assertLess(len(queries), 100)
+        parent.refresh_from_db()
+        self.assertEqual(parent.subtask_total, 1000)
+        self.assertEqual(sorted(Category.objects.values_list('task_count', flat=True)), [333, 333, 334])
+        child = Task.objects.filter(parent_task=parent).first()
+        self.assertEqual(child.get_ancestor_ids(), [parent.id])
+
+    def test_one_invalid_item_rejects_the_batch(self):
+        items = [{'title': "Fine"}, {'title': ""}, {'title': "Orphan", 'parent_task_id': 999}]
+        response = self.send('post', reverse('api_task_batch'), {'tasks': items})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'1'})
+        self.assertFalse(Task.objects.exists())
+
+    def test_batch_update_checks_the_final_tree(self):
+        a, b = Task.objects.create(title="A"), Task.objects.create(title="B")
+        # Each move alone is fine, together they make a loop
+        response = self.send('patch', reverse('api_task_batch'), {'tasks': [
+            {'id': a.id, 'parent_task_id': b.id}, {'id': b.id, 'parent_task_id': a.id},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(Task.objects.get(id=a.id).parent_task_id)
+
+        response = self.send('patch', reverse('api_task_batch'), {'tasks': [
+            {'id': a.id, 'parent_task_id': b.id, 'priority': 'L'}, {'id': b.id, 'title': "Bee"},
+        ]})
+        self.assertEqual(response.json(), {'updated': 2})
+        a.refresh_from_db()
+        self.assertEqual((a.parent_task_id, a.priority, a.path), (b.id, 'L', b.subtree_path))
@@ -0,0 +1,64 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from todo.archive import archive_tasks
+from todo.categories import refresh_category_counts
+from todo.models import ArchivedTask, Category, Task, refresh_parent_counts
+from todo.stats import compute_task_stats
+from todo.views import filter_tasks, reopen_archived
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.home = Category.objects.create(name="Home")
+        self.done = Task.objects.create(title="Spring clean", completed=True, category=self.home)
+        self.done_child = Task.objects.create(title="Windows", completed=True, parent_task=self.done)
+        self.open_tree = Task.objects.create(title="Garage", completed=True)
+        Task.objects.create(title="Shelves", parent_task=self.open_tree)
+        self.recent = Task.objects.create(title="Dishes", completed=True)
+        refresh_parent_counts(self.done.id, self.open_tree.id)
+        refresh_category_counts(self.home.id)
+        Task.objects.exclude(id=self.recent.id).update(last_modified=timezone.now() - timedelta(days=40))
+
+    def test_only_finished_old_trees_move(self):
+        self.assertEqual(archive_tasks(days=30), 2)
+        self.assertCountEqual(
+            ArchivedTask.objects.values_list('id', flat=True), [self.done.id, self.done_child.id],
+        )
+        self.assertFalse(Task.objects.filter(id=self.done.id).exists())
+        self.assertEqual(Category.objects.get(id=self.home.id).task_count, 0)
+        # Archived tasks still count as completed work
+        stats, _ = compute_task_stats()
+        self.assertEqual((stats['total_tasks'], stats['completed_tasks']), (5, 4))
+        archived_qs, _ = filter_tasks({'completed': 'true'}, queryset=ArchivedTask.objects)
+        self.assertCountEqual([task.id for task in archived_qs], [self.done.id, self.done_child.id])
+
+    def test_uncompleting_restores_the_tree(self):
+        archive_tasks(days=30)
+        child = reopen_archived(ArchivedTask.objects.get(id=self.done_child.id))
+        self.assertFalse(child.completed)
+        self.assertFalse(ArchivedTask.objects.exists())
+        root = Task.objects.get(id=self.done.id)
+        self.assertEqual((root.subtask_total, root.subtask_completed), (1, 0))
+        self.assertEqual(child.get_ancestor_ids(), [root.id])
+        self.assertEqual(Category.objects.get(id=self.home.id).task_count, 1)
+
+    def test_deleting_an_archived_task_takes_its_subtree(self):
+        archive_tasks(days=30)
+        response = self.client.post(reverse('delete_task', args=[self.done.id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ArchivedTask.objects.exists())
+
+    def test_command_reports_what_moved(self):
+        out = StringIO()
+        call_command('archive_tasks', '--days', '30', '--pause', '0', stdout=out)
+        self.assertIn("Archived 2 task(s)", out.getvalue())
+        call_command('archive_tasks', '--days', '30', '--pause', '0', stdout=out)
+        self.assertEqual(ArchivedTask.objects.count(), 2)
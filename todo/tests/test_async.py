@@ -0,0 +1,61 @@
+import asyncio
+
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from todo import views
+from todo.models import Category, Task
+
+
+# The dashboard computes stats on a connection of its own, which only sees committed rows;
+# its reads go to the replica
+class AsyncViewTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def test_views_are_native_coroutines(self):
+        for view in (views.index, views.add_task, views.edit_task, views.toggle_complete, views.bulk_action):
+            with self.subTest(view=view.__name__):
+                self.assertTrue(asyncio.iscoroutinefunction(view))
+
+    async def test_dashboard_renders_tasks_and_stats(self):
+        await Task.objects.acreate(title="Water plants")
+        await Task.objects.acreate(title="Pay bills", completed=True)
+        response = await self.async_client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Water plants")
+        self.assertEqual((response.context['total_tasks'], response.context['completed_tasks']), (2, 1))
+
+    async def test_forms_write_through_the_async_views(self):
+        parent = await Task.objects.acreate(title="Move house")
+        response = await self.async_client.post(reverse('add_task'), {
+            'title': "Pack", 'category': "Home", 'parent_task': parent.id, 'due_date': "2031-05-01T09:00",
+        })
+        self.assertEqual(response.status_code, 302)
+        task = await Task.objects.select_related('category').aget(title="Pack")
+        self.assertEqual((task.category.name, task.parent_task_id), ("Home", parent.id))
+
+        await self.async_client.post(reverse('edit_task', args=[task.id]), {
+            'title': "Pack boxes", 'priority': 'H', 'category': "", 'parent_task': "",
+        })
+        await task.arefresh_from_db()
+        self.assertEqual((task.title, task.priority, task.parent_task_id), ("Pack boxes", 'H', None))
+        self.assertEqual((await Category.objects.aget(name="Home")).task_count, 0)
+
+        await self.async_client.post(reverse('toggle_complete', args=[task.id]))
+        await task.arefresh_from_db()
+        self.assertTrue(task.completed)
+
+    async def test_bulk_action_answers_with_fragments(self):
+        ids = [(await Task.objects.acreate(title=f"Step {number}")).id for number in range(3)]
+        response = await self.async_client.post(
+            reverse('bulk_action'), {'action': 'complete', 'task_ids': ids, 'visible': ids},
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+        data = response.json()
+        self.assertEqual(data['message'], "Mark Complete: 3 task(s) affected")
+        self.assertEqual(sorted(int(task_id) for task_id in data['rows']), ids)
+        self.assertEqual(await Task.objects.filter(completed=True).acount(), 3)
@@ -0,0 +1,60 @@
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from todo.bulk import BulkActionError, apply_bulk_action
+from todo.categories import refresh_category_counts
+from todo.models import Category, Task, refresh_parent_counts
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        self.parent = Task.objects.create(title="Trip")
+        self.tasks = [Task.objects.create(title=f"Step {number}", parent_task=self.parent) for number in range(6)]
+        refresh_parent_counts(self.parent.id)
+        self.ids = [task.id for task in self.tasks]
+
+    def test_statements_do_not_grow_with_the_selection(self):
+        counts = []
+        for ids in (self.ids[:2], self.ids):
+            with CaptureQueriesContext(connection) as queries:
+                apply_bulk_action('priority', ids, 'H')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Task.objects.filter(priority='H').count(), 6)
+
+    def test_complete_updates_parent_counters(self):
+        self.assertEqual(apply_bulk_action('complete', self.ids[:4]), 4)
+        self.parent.refresh_from_db()
+        self.assertEqual((self.parent.subtask_total, self.parent.subtask_completed), (6, 4))
+
+    def test_category_counts_follow_the_move(self):
+        home, work = Category.objects.create(name="Home"), Category.objects.create(name="Work")
+        Task.objects.filter(id__in=self.ids).update(category=home)
+        refresh_category_counts(home.id)
+        apply_bulk_action('category', self.ids[:2], str(work.id))
+        self.assertEqual(dict(Category.objects.values_list('name', 'task_count')), {"Home": 4, "Work": 2})
+
+    def test_invalid_values_change_nothing(self):
+        for action, value in [('priority', 'X'), ('category', '999'), ('reparent', str(self.ids[0]))]:
+            with self.subTest(action=action), self.assertRaises(BulkActionError):
+                apply_bulk_action(action, self.ids, value)
+        self.assertFalse(Task.objects.filter(priority='X').exists())
+        self.assertEqual(Task.objects.filter(parent_task=self.parent).count(), 6)
+
+
+# Fragment responses compute the sidebar stats on a connection of their own
+class BulkActionViewTests(TransactionTestCase):
+    def test_view_answers_the_script_with_fragments(self):
+        parent = Task.objects.create(title="Trip")
+        ids = [Task.objects.create(title=f"Step {number}", parent_task=parent).id for number in range(6)]
+        response = self.client.post(
+            reverse('bulk_action'),
+            {'action': 'delete', 'task_ids': ids[:3] + ['junk'], 'visible': ids},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        data = response.json()
+        self.assertEqual(data['message'], "Delete: 3 task(s) affected")
+        self.assertEqual(data['removed'], ids[:3])
+        self.assertEqual(sorted(int(task_id) for task_id in data['rows']), ids[3:])
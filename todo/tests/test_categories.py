@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from todo.categories import category_id_for, get_or_create_category_id, resolve_category_ids
+from todo.models import Category
+from todo.views import filter_tasks
+
+
+class CategoryTests(TestCase):
+    def test_lost_race_returns_the_existing_category(self):
+        existing = Category.objects.create(name="Études")
+        # As if another process created it after this one's snapshot was taken
+        with mock.patch('todo.categories.CategorySnapshot.id_for', return_value=None):
+            self.assertEqual(get_or_create_category_id("ÉTUDES"), existing.id)
+            self.assertEqual(resolve_category_ids(["ÉTUDES", "Errands"])["ÉTUDES"], existing.id)
+        self.assertEqual(Category.objects.count(), 2)
+
+    def test_a_batch_reads_the_categories_once(self):
+        home = Category.objects.create(name="Home")
+        # Inside a transaction each snapshot is read afresh
+        with self.assertNumQueries(1):
+            resolved = resolve_category_ids(["Home", "home", *["HOME"] * 50])
+        self.assertEqual(set(resolved.values()), {home.id})
+
+    def test_names_match_case_insensitively(self):
+        self.client.post(reverse('add_task'), {'title': "Milk", 'category': "Groceries"})
+        self.client.post(reverse('add_task'), {'title': "Eggs", 'category': "groceries "})
+        self.assertEqual(list(Category.objects.values_list('name', 'task_count')), [("Groceries", 2)])
+        tasks_qs, _ = filter_tasks({'category': "GROCERIES"})
+        self.assertCountEqual([task.title for task in tasks_qs], ["Milk", "Eggs"])
+        tasks_qs, _ = filter_tasks({'category': "Hardware"})
+        self.assertFalse(tasks_qs.exists())
+
+
+# The snapshot is only kept when it was read outside a transaction
+class CategorySnapshotTests(TransactionTestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def test_snapshot_is_reused_until_a_category_changes(self):
+        Category.objects.create(name="Home")
+        category_id_for("home")
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(category_id_for("HOME"))
+        work = get_or_create_category_id("Work")
+        self.assertEqual(category_id_for("work"), work)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from todo.asgi import ChangeStreamMiddleware
+from todo.bulk import delete_subtrees
+from todo.changes import alatest_change_id, latest_change_id, prune_change_log
+from todo.models import Task, TaskChange
+from todo.purge import purge_deleted
+
+
+def events(text):
+    """The ``(id, event, data)`` of each server-sent event in ``text``"""
+    parsed = []
+    for block in text.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            parsed.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+    return parsed
+
+
+class ChangeLogTests(TestCase):
+    def test_each_visible_change_is_logged_once(self):
+        start = latest_change_id()
+        parent = Task.objects.create(title="Trip")
+        task = Task.objects.create(title="Pack", parent_task=parent)
+        Task.objects.filter(id=task.id).update(title="Pack bags")
+        # Nothing a card shows
+        Task.objects.filter(id=task.id).update(last_modified=timezone.now())
+        delete_subtrees([task.id])
+        purge_deleted()
+        logged = TaskChange.objects.filter(id__gt=start, task_id=task.id).order_by('id')
+        self.assertEqual([change.kind for change in logged], ['created', 'updated', 'deleted'])
+        self.assertEqual(logged.last().ancestor_ids(), [parent.id])
+
+    def test_pruning_keeps_the_newest_entry(self):
+        for number in range(3):
+            Task.objects.create(title=f"Task {number}")
+        newest = latest_change_id()
+        prune_change_log(timezone.now() + timedelta(days=2))
+        self.assertEqual(list(TaskChange.objects.values_list('id', flat=True)), [newest])
+
+
+# Events carry stats computed on a connection of their own; reads go to the replica
+class EventFeedTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def test_polling_resumes_from_the_last_event_id(self):
+        Task.objects.create(title="Seen")
+        seen = latest_change_id()
+        task = Task.objects.create(title="New")
+        response = self.client.get(reverse('task_events'), HTTP_LAST_EVENT_ID=str(seen))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        [(event_id, kind, data)] = events(response.content.decode())
+        self.assertEqual((int(event_id), kind), (latest_change_id(), 'changes'))
+        self.assertEqual(data['changes'], [{'task': task.id, 'kind': 'created', 'ancestors': []}])
+        self.assertEqual(data['stats']['total_tasks'], 2)
+
+        # Nothing new: a keep-alive only
+        response = self.client.get(reverse('task_events'), {'after': latest_change_id()})
+        self.assertEqual(events(response.content.decode()), [])
+        # An id this log never reached (e.g. a recreated database) makes the client reload
+        response = self.client.get(reverse('task_events'), HTTP_LAST_EVENT_ID=str(latest_change_id() + 10))
+        self.assertEqual(events(response.content.decode()), [(None, 'reset', {})])
+
+    async def test_asgi_stream_pushes_new_changes(self):
+        seen = await alatest_change_id()
+        sent, arrived, gone = [], asyncio.Event(), asyncio.Event()
+
+        async def send(message):
+            sent.append(message)
+            if b'event: changes' in message.get('body', b''):
+                arrived.set()
+
+        async def receive():
+            await gone.wait()
+            return {'type': 'http.disconnect'}
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': reverse('task_events'), 'query_string': b'',
+            'headers': [(b'last-event-id', str(seen).encode())],
+        }
+        with mock.patch('todo.changes.POLL_INTERVAL', 0.01):
+            serving = asyncio.ensure_future(ChangeStreamMiddleware(None)(scope, receive, send))
+            task = await Task.objects.acreate(title="Live")
+            await asyncio.wait_for(arrived.wait(), 5)
+            gone.set()
+            await serving
+            # Let the poller see its last listener leave
+            await asyncio.sleep(0.05)
+        self.assertEqual(sent[0]['status'], 200)
+        [(_, kind, data)] = events(b''.join(message.get('body', b'') for message in sent).decode())
+        self.assertEqual((kind, data['changes'][0]['task']), ('changes', task.id))
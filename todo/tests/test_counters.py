@@ -0,0 +1,48 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from todo.models import Task, attach_subtree_counts
+
+
+class SubtaskCounterTests(TestCase):
+    def setUp(self):
+        self.parent = Task.objects.create(title="Move house")
+
+    def counters(self):
+        self.parent.refresh_from_db()
+        return self.parent.subtask_total, self.parent.subtask_completed
+
+    def test_counters_follow_writes(self):
+        self.client.post(reverse('add_task'), {'title': "Pack", 'parent_task': self.parent.id})
+        self.client.post(reverse('add_task'), {'title': "Clean", 'parent_task': self.parent.id})
+        self.assertEqual(self.counters(), (2, 0))
+        pack = Task.objects.get(title="Pack")
+        self.client.post(reverse('toggle_complete', args=[pack.id]))
+        self.assertEqual(self.counters(), (2, 1))
+        self.assertEqual(self.parent.get_subtask_progress(), 50)
+        self.client.post(reverse('delete_task', args=[pack.id]))
+        self.assertEqual(self.counters(), (1, 0))
+
+    def test_progress_rolls_up_the_subtree(self):
+        child = Task.objects.create(title="Pack", parent_task=self.parent)
+        Task.objects.create(title="Books", parent_task=child, completed=True)
+        Task.objects.create(title="Dishes", parent_task=child)
+        call_command('repair_subtask_counts', stdout=StringIO())
+        parent = Task.objects.get(id=self.parent.id)
+        self.assertEqual(parent.get_subtask_progress(), 0)
+        attach_subtree_counts([parent])
+        self.assertAlmostEqual(parent.get_subtask_progress(), 100 / 3)
+
+    def test_repair_finds_and_fixes_drift(self):
+        Task.objects.create(title="Pack", parent_task=self.parent, completed=True)
+        out = StringIO()
+        call_command('repair_subtask_counts', '--check', stdout=out)
+        self.assertIn("1 task(s)", out.getvalue())
+        call_command('repair_subtask_counts', stdout=StringIO())
+        self.assertEqual(self.counters(), (1, 1))
+        out = StringIO()
+        call_command('repair_subtask_counts', '--check', stdout=out)
+        self.assertIn("0 task(s)", out.getvalue())
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from todo.fragments import due_badge_class, render_task_cards
+from todo.metrics import CARD_CACHE_LOOKUPS
+from todo.models import Task
+
+
+class DueBadgeTests(TestCase):
+    def test_badge_follows_due_date(self):
+        now = timezone.now()
+        today_end = now.replace(hour=23, minute=59, second=59, microsecond=0)
+        cases = [
+            (now - timedelta(hours=1), 'bg-red-100 text-red-800'),
+            (now + timedelta(days=2), 'bg-blue-100 text-blue-800'),
+            (None, ''),
+        ]
+        if today_end > now + timedelta(minutes=1):
+            cases.append((today_end, 'bg-yellow-100 text-yellow-800'))
+        for due_date, expected in cases:
+            with self.subTest(due_date=due_date):
+                self.assertEqual(due_badge_class(Task(title="Task", due_date=due_date), now), expected)
+
+    def test_badge_is_computed_at_the_given_time(self):
+        later = timezone.now().replace(hour=9, minute=0) + timedelta(days=5)
+        task = Task(title="Task", due_date=later + timedelta(hours=8))
+        self.assertEqual(due_badge_class(task, later), 'bg-yellow-100 text-yellow-800')
+        self.assertEqual(due_badge_class(task, later - timedelta(days=1)), 'bg-blue-100 text-blue-800')
+
+
+class TaskCardTests(TestCase):
+    def test_cached_card_gets_the_current_badge(self):
+        now = timezone.now()
+        task = Task.objects.create(title="Dentist", due_date=now + timedelta(days=3))
+        task = Task.objects.for_dashboard().get(id=task.id)
+        upcoming, = render_task_cards([task], now)
+        self.assertIn('bg-blue-100 text-blue-800', upcoming)
+        # The same cached HTML, rendered after the due date
+        overdue, = render_task_cards([task], now + timedelta(days=4))
+        self.assertIn('bg-red-100 text-red-800', overdue)
+        self.assertNotIn('bg-blue-100', overdue)
+
+    def test_edits_render_a_new_card(self):
+        task = Task.objects.create(title="Dentist")
+        card, = render_task_cards([Task.objects.for_dashboard().get(id=task.id)], timezone.now())
+        hits = CARD_CACHE_LOOKUPS.value('hit')
+        render_task_cards([Task.objects.for_dashboard().get(id=task.id)], timezone.now())
+        self.assertEqual(CARD_CACHE_LOOKUPS.value('hit'), hits + 1)
+        task.title = "Dentist at 3"
+        task.save()
+        card, = render_task_cards([Task.objects.for_dashboard().get(id=task.id)], timezone.now())
+        self.assertIn("Dentist at 3", card)
+        self.assertEqual(CARD_CACHE_LOOKUPS.value('hit'), hits + 1)
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(f'todo_card_cache_lookups_total{{result="hit"}} {hits + 1}', metrics)
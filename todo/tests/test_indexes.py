@@ -0,0 +1,35 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from todo.models import Task
+from todo.pagination import page_query
+from todo.views import filter_tasks
+
+
+class IndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        parent = Task.objects.create(title="Parent", subtask_total=1)
+        for number in range(30):
+            Task.objects.create(
+                title=f"Task {number}", priority='LMH'[number % 3], completed=number % 4 == 0,
+                due_date=None if number % 5 == 0 else now + timedelta(hours=number * 5 - 40),
+                parent_task=parent if number == 1 else None,
+            )
+
+    def test_default_page_reads_the_smart_order_index(self):
+        tasks_qs, _ = filter_tasks({})
+        plan = page_query(tasks_qs.for_dashboard(), {}, 10).explain()
+        self.assertIn('USING INDEX task_smart_order_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_strict_run_passes_and_names_full_passes(self):
+        out = StringIO()
+        call_command('explain_queries', '--strict', stdout=out)
+        self.assertIn("task_stats: aggregate", out.getvalue())
+        self.assertIn("expected: full pass", out.getvalue())
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from todo.models import Task
+from todo.pagination import cursor_time, paginate
+from todo.views import filter_tasks
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for number in range(23):
+            Task.objects.create(
+                title=f"Task {number}", priority='LMH'[number % 3], completed=number % 5 == 0,
+                due_date=None if number % 4 == 0 else now + timedelta(hours=number * 7 - 60),
+            )
+
+    def walk(self, queryset, now, per_page=4):
+        pages, params = [], {}
+        while True:
+            page = paginate(queryset, params, per_page, now)
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            params = {'after': page.next_cursor}
+
+    def test_pages_follow_the_full_ordering(self):
+        now = timezone.now()
+        tasks_qs, _ = filter_tasks({}, now)
+        expected = list(tasks_qs.values_list('id', flat=True))
+        pages = self.walk(tasks_qs, now)
+        self.assertEqual([task.id for page in pages for task in page], expected)
+        self.assertTrue(all(len(page) == 4 for page in pages[:-1]))
+        # The SQL buckets agree with the model's own ordering value
+        buckets = [task.get_ordering_value() for task in tasks_qs]
+        self.assertEqual(buckets, sorted(buckets))
+
+    def test_previous_cursors_walk_back(self):
+        now = timezone.now()
+        tasks_qs, _ = filter_tasks({}, now)
+        pages = self.walk(tasks_qs, now)
+        page, walked = pages[-1], []
+        while page.has_previous():
+            page = paginate(tasks_qs, {'before': page.previous_cursor}, 4, now)
+            walked.insert(0, [task.id for task in page])
+        self.assertEqual(walked, [[task.id for task in page] for page in pages[:-1]])
+
+    def test_cursor_pins_its_time(self):
+        now = timezone.now() - timedelta(hours=5)
+        tasks_qs, _ = filter_tasks({}, now)
+        page = paginate(tasks_qs, {}, 4, now)
+        self.assertEqual(cursor_time({'after': page.next_cursor}), now)
+        # A tampered cursor is ignored and the first page is served
+        first = paginate(tasks_qs, {'after': page.next_cursor[:-2] + 'xx'}, 4, now)
+        self.assertEqual([task.id for task in first], [task.id for task in page])
+
+    def test_api_next_links_keep_the_filters(self):
+        url, titles = reverse('api_task_list'), []
+        params = {'completed': 'false', 'limit': 4}
+        while url:
+            data = self.client.get(url, params).json()
+            titles += [row['title'] for row in data['results']]
+            url, params = data['next'], {}
+        self.assertEqual(len(titles), Task.objects.filter(completed=False).count())
+        self.assertEqual(len(set(titles)), len(titles))
@@ -0,0 +1,60 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from todo.bulk import apply_bulk_action
+from todo.models import Task, path_step, refresh_parent_counts
+from todo.views import update_task
+
+
+class TaskTreeTests(TestCase):
+    def setUp(self):
+        self.root = Task.objects.create(title="Root")
+        self.child = Task.objects.create(title="Child", parent_task=self.root)
+        self.leaf = Task.objects.create(title="Leaf", parent_task=self.child, completed=True)
+        self.other = Task.objects.create(title="Other")
+        refresh_parent_counts(self.root.id, self.child.id)
+
+    def counters(self, task):
+        task.refresh_from_db()
+        return task.subtask_total, task.subtask_completed
+
+    def test_paths_and_counters_after_a_move(self):
+        child = Task.objects.get(id=self.child.id)
+        child.parent_task = self.other
+        update_task(child, '', self.root.id, None)
+        self.assertEqual(Task.objects.get(id=self.leaf.id).path, path_step(self.other.id) + path_step(self.child.id))
+        self.assertEqual(self.counters(self.root), (0, 0))
+        self.assertEqual(self.counters(self.other), (1, 0))
+        self.assertEqual(list(self.other.descendants().order_by('id')), [child, self.leaf])
+
+    def test_bulk_move_rewrites_subtree_paths(self):
+        apply_bulk_action('reparent', [self.child.id], str(self.other.id))
+        self.assertEqual(Task.objects.get(id=self.leaf.id).get_ancestor_ids(), [self.child.id, self.other.id])
+        self.assertEqual(self.counters(self.root), (0, 0))
+        self.assertEqual(self.counters(self.other), (1, 0))
+
+    def test_moving_under_own_subtree_is_refused(self):
+        root = Task.objects.get(id=self.root.id)
+        root.parent_task = self.leaf
+        with self.assertRaises(ValueError):
+            root.save()
+
+
+    def test_deep_chains_keep_their_ancestry(self):
+        parent = self.leaf
+        for depth in range(60):
+            parent = Task.objects.create(title=f"Level {depth}", parent_task=parent)
+        ancestors = parent.get_ancestor_ids()
+        self.assertEqual(len(ancestors), 62)
+        self.assertEqual(ancestors[-3:], [self.leaf.id, self.child.id, self.root.id])
+        self.assertEqual(self.root.descendants().count(), 62)
+
+    def test_repair_rewrites_drifted_paths(self):
+        Task.objects.filter(id=self.leaf.id).update(path='')
+        out = StringIO()
+        call_command('repair_task_paths', '--check', stdout=out)
+        self.assertIn("1 task(s)", out.getvalue())
+        call_command('repair_task_paths', stdout=StringIO())
+        self.assertEqual(Task.objects.get(id=self.leaf.id).get_ancestor_ids(), [self.child.id, self.root.id])
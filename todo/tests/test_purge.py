@@ -0,0 +1,49 @@
+from django.test import TestCase
+
+from todo.bulk import delete_subtrees
+from todo.categories import refresh_category_counts
+from todo.models import Category, Task, refresh_parent_counts
+from todo.purge import pending_purge, purge_deleted
+
+
+class PurgeTests(TestCase):
+    def setUp(self):
+        self.root = Task.objects.create(title="Root")
+        self.child = Task.objects.create(title="Child", parent_task=self.root)
+        self.leaf = Task.objects.create(title="Leaf", parent_task=self.child, completed=True)
+        self.other = Task.objects.create(title="Other")
+        refresh_parent_counts(self.root.id, self.child.id)
+
+    def counters(self, task):
+        task.refresh_from_db()
+        return task.subtask_total, task.subtask_completed
+
+    def test_delete_and_purge(self):
+        self.assertEqual(self.counters(self.child), (1, 1))
+        self.assertEqual(delete_subtrees([self.child.id]), 2)
+        self.assertEqual(self.counters(self.root), (0, 0))
+        self.assertFalse(Task.objects.filter(id__in=[self.child.id, self.leaf.id]).exists())
+        self.assertEqual(Task.all_objects.filter(deleted_at__isnull=False).count(), 2)
+        self.assertEqual(purge_deleted(), 2)
+        self.assertEqual(Task.all_objects.count(), 2)
+
+    def test_batches_go_deepest_first(self):
+        delete_subtrees([self.root.id])
+        self.assertEqual(list(pending_purge().values_list('id', flat=True)), [self.leaf.id, self.child.id, self.root.id])
+        self.assertEqual(purge_deleted(batch_size=1, max_batches=2), 2)
+        self.assertEqual(list(pending_purge().values_list('id', flat=True)), [self.root.id])
+        self.assertEqual(purge_deleted(batch_size=1), 1)
+        self.assertEqual(list(Task.all_objects.values_list('id', flat=True)), [self.other.id])
+
+    def test_deleted_tasks_leave_the_count_at_once(self):
+        home, work = Category.objects.create(name="Home"), Category.objects.create(name="Work")
+        parent = Task.objects.create(title="Move", category=home)
+        Task.objects.create(title="Pack", category=work, parent_task=parent)
+        Task.objects.create(title="Call", category=work)
+        refresh_category_counts(home.id, work.id)
+        delete_subtrees([parent.id])
+        counts = dict(Category.objects.values_list('name', 'task_count'))
+        self.assertEqual(counts, {"Home": 0, "Work": 1})
+        purge_deleted()
+        refresh_category_counts(home.id, work.id)
+        self.assertEqual(dict(Category.objects.values_list('name', 'task_count')), counts)
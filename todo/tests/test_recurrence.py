@@ -0,0 +1,155 @@
+import io
+import json
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from todo.bulk import delete_subtrees
+from todo.models import Task
+from todo.purge import purge_deleted
+from todo import recurrence
+from todo.recurrence import materialize_occurrences, occurrence_clock, store_next_occurrence, virtual_occurrences
+from todo.pagination import paginate
+from todo.transfer import TaskImporter, export_lines, export_rows, read_rows
+from todo.views import filter_tasks
+
+
+class RecurrenceTests(TestCase):
+    def test_search_lists_occurrences_by_due_date(self):
+        now = timezone.now()
+        Task.objects.create(title="Water the ferns", due_date=now + timedelta(hours=1), recurrence='daily')
+        response = self.client.get(reverse('api_task_list'), {'q': 'ferns', 'occurrences': 'true'})
+        due_dates = [row['due_date'] for row in response.json()['results']]
+        self.assertGreater(len(due_dates), 2)
+        self.assertEqual(due_dates, sorted(due_dates))
+
+    def test_monthly_dates_keep_the_first_day(self):
+        first = Task.objects.create(
+            title="Pay rent", due_date=timezone.make_aware(datetime(2031, 1, 31, 9)), recurrence='monthly',
+        )
+        now = first.due_date - timedelta(days=1)
+        february = store_next_occurrence(first, now)
+        march = store_next_occurrence(february, now)
+        self.assertEqual([february.due_date.day, march.due_date.day], [28, 31])
+        self.assertEqual(march.series_start, first.due_date)
+
+    def test_catching_up_skips_straight_to_the_next_due_date(self):
+        now = timezone.now()
+        first = Task.objects.create(title="Stretch", due_date=now - timedelta(days=400, hours=1), recurrence='daily')
+        following = store_next_occurrence(first, now)
+        self.assertEqual(following.occurrence, 402)
+        self.assertEqual(following.due_date, first.due_date + timedelta(days=401))
+
+    def test_purging_a_successor_does_not_revive_the_series(self):
+        now = timezone.now()
+        Task.objects.create(title="Stretch", due_date=now + timedelta(hours=1), recurrence='daily')
+        self.assertEqual(materialize_occurrences(now, timedelta(days=1, hours=2)), 1)
+        tail = Task.objects.series_tails().get()
+        self.assertEqual(tail.occurrence, 2)
+        delete_subtrees([tail.id])
+        purge_deleted()
+        self.assertFalse(Task.objects.series_tails().exists())
+
+    def test_moving_an_occurrence_starts_a_new_series(self):
+        now = timezone.now()
+        first = Task.objects.create(
+            title="Stretch", due_date=now + timedelta(hours=1), recurrence='daily', recurrence_count=5,
+        )
+        second = store_next_occurrence(first, now)
+        moved = second.due_date + timedelta(hours=3)
+        response = self.client.patch(
+            reverse('api_task_detail', args=[second.id]), json.dumps({'due_date': moved.isoformat()}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        second.refresh_from_db()
+        self.assertEqual((second.series_id, second.series_start, second.occurrence), (None, None, 1))
+        self.assertEqual(second.recurrence_count, 4)
+        self.assertEqual(store_next_occurrence(second, now).due_date, moved + timedelta(days=1))
+
+    def test_pages_of_occurrences_join_up(self):
+        now = timezone.now()
+        for hours, title in ((1, "Stretch"), (5, "Walk")):
+            Task.objects.create(title=title, due_date=now + timedelta(hours=hours), recurrence='daily')
+        params = {'occurrences': 'true', 'completed': 'false'}
+        everything = self.client.get(reverse('api_task_list'), {**params, 'limit': 500}).json()['results']
+        url, walked = reverse('api_task_list'), []
+        request = {**params, 'limit': 7}
+        while url:
+            data = self.client.get(url, request).json()
+            walked.append([(row['title'], row['due_date']) for row in data['results']])
+            url, request = data['next'], {}
+        self.assertEqual([row for page in walked for row in page], [(row['title'], row['due_date']) for row in everything])
+        self.assertGreater(len(walked), 3)
+        # And back again from the last page
+        back = self.client.get(data['previous']).json()
+        self.assertEqual([(row['title'], row['due_date']) for row in back['results']], walked[-2])
+
+    def test_a_page_only_computes_the_occurrences_it_shows(self):
+        now = timezone.now()
+        for hours in range(3):
+            Task.objects.create(title="Stretch", due_date=now + timedelta(hours=hours + 1), recurrence='daily')
+        tasks_qs, _ = filter_tasks({}, now)
+        tails = list(Task.objects.series_tails())
+        with mock.patch.object(recurrence, 'occurrence_due', wraps=recurrence.occurrence_due) as occurrence_due:
+            occurrences = virtual_occurrences(tails, now, now + timedelta(days=31), tasks_qs.query.order_by)
+            page = paginate(tasks_qs, {}, 5, now, (occurrences,))
+        self.assertEqual(len(page), 5)
+        # Three series over 31 days would be 90 occurrences
+        self.assertLess(occurrence_due.call_count, 15)
+
+    def test_malformed_end_date_is_ignored(self):
+        due = timezone.now() + timedelta(days=1)
+        response = self.client.post(reverse('add_task'), {
+            'title': "Stretch", 'due_date': due.strftime("%Y-%m-%dT%H:%M"),
+            'recurrence': 'daily', 'recurrence_until': "next tuesday",
+        })
+        self.assertEqual(response.status_code, 302)
+        task = Task.objects.get(title="Stretch")
+        self.assertEqual(task.recurrence, 'daily')
+        self.assertIsNone(task.recurrence_until)
+
+    def test_round_trip_keeps_recurrence(self):
+        first = Task.objects.create(
+            title="Water plants", due_date=timezone.now() + timedelta(days=1), recurrence='weekly',
+            recurrence_interval=2, recurrence_count=5,
+        )
+        Task.objects.create(
+            title="Water plants", due_date=first.due_date + timedelta(weeks=2), recurrence='weekly',
+            recurrence_interval=2, recurrence_count=5, series_id=first.id, occurrence=2,
+        )
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                exported = ''.join(export_lines(fmt, export_rows()))
+                imported = TaskImporter(keep_ids=False).run(read_rows(fmt, io.StringIO(exported)))
+                self.assertEqual(imported, 2)
+                copies = list(Task.objects.order_by('-id')[:2])[::-1]
+                self.assertEqual([task.occurrence for task in copies], [1, 2])
+                self.assertEqual(copies[1].series_id, copies[0].id)
+                self.assertEqual(
+                    (copies[0].recurrence, copies[0].recurrence_interval, copies[0].recurrence_count),
+                    ('weekly', 2, 5),
+                )
+                Task.objects.filter(id__in=[task.id for task in copies]).delete()
+
+
+# The dashboard computes stats on a connection of its own, which only sees committed rows
+@override_settings(DATABASE_ROUTERS=[])
+class DashboardConditionalTests(TransactionTestCase):
+    def test_etag_moves_with_virtual_occurrences(self):
+        now = occurrence_clock(timezone.now()) + timedelta(seconds=10)
+        Task.objects.create(title="Stretch", due_date=now + timedelta(hours=1), recurrence='daily')
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            first = self.client.get(reverse('index'))
+            self.assertIn('Last-Modified', first)
+        # Later within the same tick of the occurrence clock
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(seconds=30)):
+            same = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(same.status_code, 304)
+        # No row changes, but tomorrow's occurrence has come due and left the page
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(days=1, hours=2)):
+            later = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(later.status_code, 200)
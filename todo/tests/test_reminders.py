@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from todo.models import ReminderDelivery, Task
+from todo.notifiers import BaseNotifier
+from todo.reminders import ReminderScheduler
+
+NOW = timezone.make_aware(datetime(2031, 3, 10, 12))
+
+
+class RecordingNotifier(BaseNotifier):
+    name = 'recording'
+
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    def notify(self, reminder):
+        if self.fail:
+            raise ConnectionError("unreachable")
+        self.sent.append((reminder.task_id, reminder.kind))
+
+
+class ReminderTests(TestCase):
+    def test_each_reminder_is_sent_once(self):
+        task = Task.objects.create(title="Call the bank", due_date=NOW + timedelta(hours=2))
+        Task.objects.create(title="Done already", due_date=NOW + timedelta(hours=1), completed=True)
+        notifier = RecordingNotifier()
+        scheduler = ReminderScheduler([notifier])
+        self.assertEqual(scheduler.tick(NOW), 1)
+        self.assertEqual(scheduler.tick(NOW + timedelta(minutes=1)), 0)
+        # A second scheduler sees the delivery log
+        self.assertEqual(ReminderScheduler([notifier]).tick(NOW), 0)
+        scheduler.tick(NOW + timedelta(hours=3))
+        self.assertEqual(notifier.sent, [(task.id, 'due'), (task.id, 'overdue')])
+
+    def test_edited_due_dates_are_rescheduled(self):
+        task = Task.objects.create(title="Dentist", due_date=NOW + timedelta(days=1, hours=-3))
+        notifier = RecordingNotifier()
+        scheduler = ReminderScheduler([notifier])
+        self.assertEqual(scheduler.tick(NOW), 0)
+        self.client.post(reverse('edit_task', args=[task.id]), {
+            'title': "Dentist", 'priority': 'M', 'due_date': "2031-03-10T15:00",
+        })
+        self.assertEqual(scheduler.tick(NOW), 1)
+        # The old date's reminders are dropped, the new one's overdue reminder follows
+        scheduler.tick(NOW + timedelta(days=1, hours=1))
+        self.assertEqual(notifier.sent, [(task.id, 'due'), (task.id, 'overdue')])
+        self.assertEqual(
+            set(ReminderDelivery.objects.values_list('due_date', flat=True)), {NOW + timedelta(hours=3)},
+        )
+
+    def test_failed_deliveries_are_retried(self):
+        Task.objects.create(title="Renew passport", due_date=NOW - timedelta(minutes=5))
+        notifier = RecordingNotifier(fail=True)
+        scheduler = ReminderScheduler([notifier])
+        with self.assertLogs('todo.reminders', 'ERROR'):
+            self.assertEqual(scheduler.tick(NOW), 0)
+        self.assertFalse(ReminderDelivery.objects.exists())
+        notifier.fail = False
+        self.assertEqual(scheduler.tick(NOW + timedelta(minutes=2)), 1)
+        self.assertEqual([kind for _, kind in notifier.sent], ['overdue'])
+
+    @override_settings(TODO_REMINDER_NOTIFIERS=['todo.notifiers.LogNotifier'])
+    def test_command_sends_what_is_due(self):
+        Task.objects.create(title="Water plants", due_date=timezone.now() - timedelta(minutes=1))
+        out = StringIO()
+        with self.assertLogs('todo.notifiers', 'INFO') as logs:
+            call_command('send_reminders', stdout=out)
+        self.assertIn("Sent 1 reminder(s)", out.getvalue())
+        self.assertIn('"Water plants" is overdue', logs.output[0])
@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from todo.bulk import delete_subtrees
+from todo.categories import category_snapshot, refresh_category_counts
+from todo.models import Category, Task
+from todo.routers import read_only_request
+
+
+# The router stays on: safe requests read through 'replica', which in tests
+# mirrors 'default' and so only sees committed rows
+class ReadWriteRouterTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def read_only(self):
+        token = read_only_request.set(True)
+        self.addCleanup(read_only_request.reset, token)
+
+    def test_safe_requests_read_from_the_replica(self):
+        Task.objects.create(title="Read me")
+        with self.assertNumQueries(0, using='default'):
+            response = self.client.get(reverse('api_task_list'))
+        self.assertEqual([row['title'] for row in response.json()['results']], ["Read me"])
+
+    def test_reads_inside_a_transaction_stay_on_default(self):
+        self.read_only()
+        with transaction.atomic():
+            task = Task.objects.create(title="Not committed yet")
+            with self.assertNumQueries(0, using='replica'):
+                self.assertTrue(Task.objects.filter(id=task.id).exists())
+        self.assertTrue(Task.objects.filter(id=task.id).exists())
+
+    def test_delete_from_a_safe_request_refreshes_counts(self):
+        errands = Category.objects.create(name="Errands")
+        task = Task.objects.create(title="Post office", category=errands)
+        refresh_category_counts(errands.id)
+        self.assertIn(errands.id, category_snapshot().with_tasks)
+        self.read_only()
+        self.assertEqual(delete_subtrees([task.id]), 1)
+        self.assertEqual(Category.objects.get(id=errands.id).task_count, 0)
+        self.assertNotIn(errands.id, category_snapshot().with_tasks)
+
+    def test_deleting_takes_a_post(self):
+        task = Task.objects.create(title="Keep me")
+        self.assertEqual(self.client.get(reverse('delete_task', args=[task.id])).status_code, 405)
+        self.assertEqual(self.client.get(reverse('toggle_complete', args=[task.id])).status_code, 405)
+        self.client.post(reverse('delete_task', args=[task.id]))
+        self.assertFalse(Task.objects.filter(id=task.id).exists())
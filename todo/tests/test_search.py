@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from todo.bulk import delete_subtrees
+from todo.models import Task, TaskSearchIndex
+from todo.purge import purge_deleted
+from todo.templatetags.todo_extras import highlight_snippet
+from todo.views import filter_tasks
+
+
+class SearchTests(TestCase):
+    def search(self, query):
+        tasks_qs, _ = filter_tasks({'q': query})
+        return [task.title for task in tasks_qs]
+
+    def test_matches_every_text_field(self):
+        Task.objects.create(title="Renew passport")
+        Task.objects.create(title="Errands", description="post office, passport photos")
+        Task.objects.create(title="Travel", notes="check the passport expiry")
+        Task.objects.create(title="Groceries")
+        self.assertCountEqual(self.search("passport"), ["Renew passport", "Errands", "Travel"])
+        self.assertEqual(self.search("passport photos"), ["Errands"])
+
+    def test_index_follows_edits_and_deletes(self):
+        task = Task.objects.create(title="Call the plumber")
+        task.title = "Call the electrician"
+        task.save()
+        self.assertEqual(self.search("plumber"), [])
+        self.assertEqual(self.search("electrician"), ["Call the electrician"])
+        delete_subtrees([task.id])
+        self.assertEqual(self.search("electrician"), [])
+        purge_deleted()
+        self.assertEqual(self.search("electrician"), [])
+
+    def test_prefixes_accents_and_snippets(self):
+        Task.objects.create(title="Café visit", notes="bring the presentation slides")
+        self.assertEqual(self.search("cafe"), ["Café visit"])
+        self.assertEqual(self.search("pres"), ["Café visit"])
+        tasks_qs, _ = filter_tasks({'q': "slides"})
+        self.assertIn("<mark>slides</mark>", highlight_snippet(tasks_qs.get().search_snippet))
+
+    def test_rebuild_restores_a_lost_index(self):
+        task = Task.objects.create(title="Renew passport")
+        Task.objects.filter(id=task.id).update(title="Renew licence")
+        self.assertEqual(self.search("licence"), ["Renew licence"])
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TaskSearchIndex._meta.db_table}({TaskSearchIndex._meta.db_table}) VALUES ('delete-all')")
+        self.assertEqual(self.search("licence"), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search("licence"), ["Renew licence"])
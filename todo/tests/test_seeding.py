@@ -0,0 +1,36 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from todo.models import Category, Task
+from todo.seeding import SEED_PREFIX, generate_rows, seed_tasks
+
+
+class SeedingTests(TestCase):
+    def test_same_seed_gives_the_same_rows(self):
+        now = timezone.now()
+        first = list(generate_rows(50, seed=3, tree_ratio=0.5, now=now))
+        self.assertEqual(first, list(generate_rows(50, seed=3, tree_ratio=0.5, now=now)))
+        self.assertEqual(len(first), 50)
+        ids = {row['id'] for row in first}
+        self.assertTrue(any(row['parent_task_id'] for row in first))
+        self.assertTrue(all(row['parent_task_id'] in ids for row in first if row['parent_task_id']))
+
+    def test_seeded_tasks_are_listed(self):
+        self.assertEqual(seed_tasks(40, tree_ratio=0.5), 40)
+        response = self.client.get(reverse('api_task_list'), {'limit': 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 40)
+
+    def test_clear_removes_only_seeded_data(self):
+        Task.objects.create(title="Real task")
+        call_command('seed_tasks', '30', '--tree-ratio', '0.5', stdout=StringIO())
+        self.assertEqual(Task.objects.filter(title__startswith=SEED_PREFIX).count(), 30)
+        out = StringIO()
+        call_command('seed_tasks', '--clear', stdout=out)
+        self.assertIn("Deleted 30 seeded task(s)", out.getvalue())
+        self.assertEqual(list(Task.objects.values_list('title', flat=True)), ["Real task"])
+        self.assertFalse(Category.objects.filter(name__startswith=SEED_PREFIX).exists())
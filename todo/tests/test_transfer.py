@@ -0,0 +1,61 @@
+import io
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from todo.models import Category, Task
+from todo.transfer import TaskImporter, export_lines, export_rows, read_rows
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        errands = Category.objects.create(name="Errands")
+        self.parent = Task.objects.create(title="Errands run", category=errands, priority='H')
+        self.child = Task.objects.create(title="Post, office \"parcel\"", parent_task=self.parent, notes="line\nbreak")
+
+    def test_export_and_reimport_with_new_ids(self):
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                exported = ''.join(export_lines(fmt, export_rows(Task.objects.filter(id__in=[self.parent.id, self.child.id]))))
+                importer = TaskImporter(keep_ids=False)
+                self.assertEqual(importer.run(read_rows(fmt, io.StringIO(exported))), 2)
+                parent, child = Task.objects.order_by('-id')[:2][::-1]
+                self.assertEqual((child.title, child.notes), (self.child.title, self.child.notes))
+                self.assertEqual((parent.category.name, parent.priority), ("Errands", 'H'))
+                self.assertEqual(child.parent_task_id, parent.id)
+                self.assertEqual(child.get_ancestor_ids(), [parent.id])
+                self.assertEqual(importer.unlinked, [])
+
+    def test_unknown_parents_are_left_out_and_reported(self):
+        # The exported parent id is taken by an unrelated task here
+        rows = [{'id': 500, 'title': "Orphan", 'parent_task_id': self.parent.id}]
+        importer = TaskImporter(keep_ids=False)
+        importer.run(rows)
+        orphan = Task.objects.get(title="Orphan")
+        self.assertIsNone(orphan.parent_task_id)
+        self.assertEqual(importer.unlinked, [(orphan.id, self.parent.id)])
+        self.parent.refresh_from_db()
+        self.assertEqual(self.parent.subtask_total, 0)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write('{"id": 7, "title": "Stray", "parent_task_id": 6}\n')
+            source.flush()
+            out = io.StringIO()
+            call_command('import_tasks', source.name, '--new-ids', stdout=out)
+        self.assertIn("1 task(s) were imported without a parent", out.getvalue())
+
+    def test_view_streams_the_filtered_tasks(self):
+        response = self.client.get(reverse('export_tasks'), {'format': 'jsonl', 'priority': 'H'})
+        self.assertFalse(response.is_async)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([row['title'] for row in read_rows('jsonl', lines)], ["Errands run"])
+
+    async def test_view_streams_asynchronously_under_asgi(self):
+        response = await self.async_client.get(reverse('export_tasks'))
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        expected = await Task.objects.acount()
+        self.assertEqual(len(list(read_rows('csv', io.StringIO(content)))), expected)
+        self.assertTrue(content.startswith('id,title,'))
@@ -0,0 +1,308 @@
+"""CSV / JSON Lines export and import of tasks.
+
+Exports stream ``values()`` rows through ``QuerySet.iterator()``, or
+``aiterator()`` for responses served under ASGI, so memory stays flat
+whatever the table size. Imports insert in batches, resolving
+categories by name and parents by their exported id.
+"""
+import csv
+import json
+
+from django.db import connections, transaction
+from django.db.models import Case, F, Max, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .categories import category_key, refresh_category_counts
+from .models import Category, Task, refresh_parent_counts, refresh_paths
+from .stats import invalidate_task_stats
+
+FORMATS = ('csv', 'jsonl')
+EXPORT_FIELDS = (
+    'id', 'title', 'description', 'notes', 'priority', 'completed', 'due_date',
+    'category_name', 'parent_task_id', 'created_at', 'last_modified',
+    'recurrence', 'recurrence_interval', 'recurrence_until', 'recurrence_count', 'series_id', 'series_start',
+    'occurrence', 'series_continued',
+)
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 1000
+# Each re-parented row binds three parameters in the CASE update
+LINK_CHUNK_SIZE = 300
+
+
+def _export_values(queryset):
+    queryset = Task.objects.all() if queryset is None else queryset
+    return queryset.order_by('id').values(
+        *(field for field in EXPORT_FIELDS if field != 'category_name'), category_name=F('category__name'),
+    )
+
+
+def export_rows(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one dict per task, in id order, without loading the table"""
+    return _export_values(queryset).iterator(chunk_size=chunk_size)
+
+
+def aexport_rows(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Async version of export_rows(); fetches one chunk at a time"""
+    return _export_values(queryset).aiterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _csv_row(row):
+    return [_csv_value(row[field]) for field in EXPORT_FIELDS]
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(_csv_row(row))
+
+
+def _json_default(value):
+    # Full microsecond precision; DjangoJSONEncoder rounds to milliseconds
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _jsonl_line(row):
+    return json.dumps({field: row[field] for field in EXPORT_FIELDS}, default=_json_default) + '\n'
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield _jsonl_line(row)
+
+
+def export_lines(fmt, rows):
+    return csv_lines(rows) if fmt == 'csv' else jsonl_lines(rows)
+
+
+async def aexport_lines(fmt, rows):
+    """Async version of export_lines(), for the async iterator of aexport_rows()"""
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        async for row in rows:
+            yield writer.writerow(_csv_row(row))
+    else:
+        async for row in rows:
+            yield _jsonl_line(row)
+
+
+def read_rows(fmt, stream):
+    """Yield raw dicts from a CSV or JSON Lines text stream"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+class TaskImportError(ValueError):
+    """A row in the import file is invalid"""
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+def _parse_datetime(value):
+    if value in (None, ''):
+        return None
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError(f"Invalid datetime: {value!r}")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _parse_id(value):
+    return None if value in (None, '') else int(value)
+
+
+def _parse_positive(value, default):
+    if value in (None, ''):
+        return default
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"Expected a positive integer: {value!r}")
+    return number
+
+
+class TaskImporter:
+    """Insert task rows in batches with ``executemany``.
+
+    Going through ``bulk_create`` spends most of its time preparing model
+    instances, so rows are adapted once and inserted as plain tuples. Ids
+    are always explicit: with ``keep_ids`` (the default) the exported ids
+    are reused, otherwise new ones are allocated after the current maximum
+    and parent links are remapped; a child whose parent is not in the file
+    is imported without one and listed in ``unlinked``. The import runs in one transaction, so a
+    child may appear before its parent. Occurrences of a recurring task
+    keep their series when its first occurrence, which has the lowest id,
+    comes first.
+    """
+
+    columns = (
+        'id', 'title', 'description', 'notes', 'priority', 'completed', 'due_date',
+        'category_id', 'parent_task_id', 'created_at', 'last_modified',
+        'subtask_total', 'subtask_completed', 'path',
+        'recurrence', 'recurrence_interval', 'recurrence_until', 'recurrence_count', 'series_id', 'series_start',
+        'occurrence', 'series_continued',
+    )
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, keep_ids=True, using='default'):
+        self.batch_size = batch_size
+        self.keep_ids = keep_ids
+        self.connection = connections[using]
+        self.categories = {
+            category_key(name): category_id for name, category_id in Category.objects.using(using).values_list('name', 'id')
+        }
+        self.category_ids = set()
+        self.id_map = {}
+        self.pending_parents = []
+        # (new id, exported parent id) of children whose parent was not imported
+        self.unlinked = []
+        self.parent_ids = set()
+        self.child_ids = []
+        self.next_id = None
+        self.count = 0
+        self.now = timezone.now()
+        quote = self.connection.ops.quote_name
+        self.insert_sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            quote(Task._meta.db_table),
+            ', '.join(quote(column) for column in self.columns),
+            ', '.join(['%s'] * len(self.columns)),
+        )
+
+    def allocate_id(self):
+        if self.next_id is None:
+            self.next_id = (Task.objects.using(self.connection.alias).aggregate(m=Max('id'))['m'] or 0) + 1
+        self.next_id += 1
+        return self.next_id - 1
+
+    def adapt_datetime(self, value):
+        return self.connection.ops.adapt_datetimefield_value(value)
+
+    def build(self, row, line):
+        """Turn one input row into the tuple of column values"""
+        try:
+            priority = row.get('priority') or 'M'
+            if priority not in dict(Task.PRIORITY_CHOICES):
+                raise ValueError(f"Invalid priority: {priority!r}")
+            title = row.get('title')
+            if not title:
+                raise ValueError("Missing title")
+            old_id, parent = _parse_id(row.get('id')), _parse_id(row.get('parent_task_id'))
+            category_id = self.category_id((row.get('category_name') or '').strip())
+            due_date = _parse_datetime(row.get('due_date'))
+            created_at = _parse_datetime(row.get('created_at')) or self.now
+            last_modified = _parse_datetime(row.get('last_modified')) or self.now
+            recurrence = row.get('recurrence') or ''
+            if recurrence not in dict(Task.RECURRENCE_CHOICES):
+                raise ValueError(f"Invalid recurrence: {recurrence!r}")
+            recurrence_interval = _parse_positive(row.get('recurrence_interval'), 1)
+            recurrence_until = _parse_datetime(row.get('recurrence_until'))
+            recurrence_count = _parse_positive(row.get('recurrence_count'), None)
+            series_id = _parse_id(row.get('series_id'))
+            series_start = _parse_datetime(row.get('series_start'))
+            occurrence = _parse_positive(row.get('occurrence'), 1)
+            series_continued = _parse_bool(row.get('series_continued', False))
+        except (TypeError, ValueError) as e:
+            raise TaskImportError(f"Row {line}: {e}")
+
+        if self.keep_ids:
+            task_id = old_id if old_id is not None else self.allocate_id()
+        else:
+            task_id = self.allocate_id()
+            if old_id is not None:
+                self.id_map[old_id] = task_id
+            if parent is not None:
+                # Resolved once every row has its new id
+                self.pending_parents.append((task_id, parent))
+                parent = None
+            if series_id is not None:
+                # A series whose first occurrence is not imported starts over here
+                series_id = self.id_map.get(series_id)
+        if parent is not None:
+            self.parent_ids.add(parent)
+            self.child_ids.append(task_id)
+        # Paths of subtasks are filled in once all rows are in (see run)
+        return (
+            task_id, title, row.get('description') or '', row.get('notes') or '', priority,
+            _parse_bool(row.get('completed', False)), self.adapt_datetime(due_date), category_id, parent,
+            self.adapt_datetime(created_at), self.adapt_datetime(last_modified), 0, 0, '',
+            recurrence, recurrence_interval, self.adapt_datetime(recurrence_until), recurrence_count,
+            series_id, self.adapt_datetime(series_start), occurrence, series_continued,
+        )
+
+    def category_id(self, name):
+        if not name:
+            return None
+        key = category_key(name)
+        if key not in self.categories:
+            self.categories[key] = Category.objects.using(self.connection.alias).create(name=name).id
+        self.category_ids.add(self.categories[key])
+        return self.categories[key]
+
+    def flush(self, batch):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(self.insert_sql, batch)
+        self.count += len(batch)
+
+    def link_parents(self):
+        """Point children imported with --new-ids at their parents' new ids.
+
+        An exported parent id that was not imported may belong to an
+        unrelated task here, so those children keep no parent.
+        """
+        linked = []
+        for child, parent in self.pending_parents:
+            if parent in self.id_map:
+                linked.append((child, self.id_map[parent]))
+            else:
+                self.unlinked.append((child, parent))
+        for start in range(0, len(linked), LINK_CHUNK_SIZE):
+            chunk = linked[start:start + LINK_CHUNK_SIZE]
+            self.parent_ids.update(parent for _, parent in chunk)
+            self.child_ids.extend(child for child, _ in chunk)
+            Task.objects.using(self.connection.alias).filter(id__in=[child for child, _ in chunk]).update(
+                parent_task_id=Case(*(When(id=child, then=parent) for child, parent in chunk))
+            )
+
+    def run(self, rows):
+        with transaction.atomic(using=self.connection.alias):
+            batch = []
+            for line, row in enumerate(rows, start=1):
+                batch.append(self.build(row, line))
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+            if batch:
+                self.flush(batch)
+            self.link_parents()
+            refresh_paths(*self.child_ids)
+            refresh_parent_counts(*self.parent_ids)
+            refresh_category_counts(*self.category_ids)
+        invalidate_task_stats()
+        return self.count
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -8,5 +8,13 @@ urlpatterns = [
     path('delete/<int:task_id>/', views.delete_task, name='delete_task'),
     path('toggle/<int:task_id>/', views.toggle_complete, name='toggle_complete'),
     path('bulk/', views.bulk_action, name='bulk_action'),
+    path('cards/', views.task_cards, name='task_cards'),
+    path('events/', views.task_events, name='task_events'),
+    path('export/', views.export_tasks, name='export_tasks'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('api/tasks/', api.task_list, name='api_task_list'),
+    path('api/tasks/parents/', api.parent_choices, name='api_parent_choices'),
+    path('api/tasks/batch/', api.task_batch, name='api_task_batch'),
+    path('api/tasks/<int:task_id>/', api.task_detail, name='api_task_detail'),
 
 ]
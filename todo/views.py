@@ -1,70 +1,281 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.core.paginator import Paginator
-from .models import Task, Category
-from django.db.models import Q
-from datetime import datetime
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
+from .models import (
+    ArchivedTask, Task, TaskQuerySet, aattach_subtree_counts, attach_subtree_counts, refresh_parent_counts, subtree_q,
+)
+from .archive import delete_archived_tree, restore_tree
+from .fragments import render_task_cards
+from .categories import acategory_snapshot, category_id_for, get_or_create_category_id, refresh_category_counts
+from .changes import alatest_change_id, parse_change_id, poll_events, stream_events
+from .bulk import BULK_ACTIONS, BulkActionError, apply_bulk_action, delete_subtrees, parse_ids
+from .conditional import adashboard_state, async_condition, dashboard_state, make_etag
+from .metrics import exposition
+from .pagination import apaginate, cursor_time, decode_cursor
+from .recurrence import (
+    follow_schedule, occurrence_clock, recurrence_window, schedule, store_next_occurrence, virtual_occurrences,
+)
+from .stats import aget_task_stats, get_task_stats
+from .transfer import FORMATS, aexport_lines, aexport_rows, export_lines, export_rows
+from django.db import transaction
+from datetime import datetime, timedelta
 from django.utils import timezone
 
-def index(request):
-    # Get all tasks and apply smart ordering
-    tasks_qs = Task.objects.all()
-    
-    # Apply smart ordering: overdue first, then due today, then by due date
-    tasks_qs = sorted(tasks_qs, key=lambda x: (x.get_ordering_value(), x.due_date or timezone.now() + timezone.timedelta(days=365)))
-    
-    # Basic search
-    query = request.GET.get('q', '').strip()
-    if query:
-        tasks_qs = [task for task in tasks_qs if query.lower() in task.title.lower() or query.lower() in task.description.lower()]
-    
+TASKS_PER_PAGE = 50
+
+def normalize_filters(params):
+    """The dashboard filter values in ``params``, with invalid ones blanked"""
+    priority = params.get('priority', '')
+    completed = params.get('completed', '')
+    today_filter = params.get('today', '')
+    return {
+        'q': params.get('q', '').strip(),
+        'priority': priority if priority in ['L', 'M', 'H'] else '',
+        'category': params.get('category', '').strip(),
+        'completed': completed if completed in ['true', 'false'] else '',
+        'today': today_filter if today_filter == 'true' else '',
+    }
+
+def filter_tasks(params, now=None, categories=None, queryset=None):
+    """Build the dashboard queryset from GET-style filter parameters.
+
+    Returns the lazy queryset (smart-ordered, or by relevance when searching)
+    and the normalized filter values so callers can echo them back to the
+    template. Async callers pass the category snapshot they fetched.
+    ``queryset`` replaces the active tasks, e.g. with the archived ones.
+    """
+    now = now or timezone.now()
+    tasks_qs = (Task.objects if queryset is None else queryset).smart_ordered()
+    filters = normalize_filters(params)
+
+    # Full-text search, ordered by relevance
+    if filters['q']:
+        tasks_qs = tasks_qs.search(filters['q']).order_by(*TaskQuerySet.SEARCH_ORDERING)
+
     # Basic filters
-    priority = request.GET.get('priority', '')
-    if priority in ['L', 'M', 'H']:
-        tasks_qs = [task for task in tasks_qs if task.priority == priority]
-    
-    category_name = request.GET.get('category', '').strip()
-    if category_name:
-        tasks_qs = [task for task in tasks_qs if task.category and task.category.name.lower() == category_name.lower()]
-    
-    completed = request.GET.get('completed', '')
-    if completed == 'true':
-        tasks_qs = [task for task in tasks_qs if task.completed]
-    elif completed == 'false':
-        tasks_qs = [task for task in tasks_qs if not task.completed]
-    
+    if filters['priority']:
+        tasks_qs = tasks_qs.filter(priority=filters['priority'])
+
+    if filters['category']:
+        if categories is not None:
+            category_id = categories.id_for(filters['category'])
+        else:
+            category_id = category_id_for(filters['category'])
+        tasks_qs = tasks_qs.filter(category_id=category_id) if category_id else tasks_qs.none()
+
+    if filters['completed']:
+        tasks_qs = tasks_qs.filter(completed=filters['completed'] == 'true')
+
     # Today's tasks filter
-    today_filter = request.GET.get('today', '')
-    if today_filter == 'true':
-        tasks_qs = [task for task in tasks_qs if task.is_due_today()]
-    
-    # Get only categories that have tasks (for filters)
-    filter_categories = Category.objects.filter(task__isnull=False).distinct().order_by('name')
-    
-    # Get all categories (for bulk actions)
-    all_categories = Category.objects.all().order_by('name')
-    
-    # Calculate enhanced stats
-    total_tasks = len(tasks_qs)
-    completed_tasks = len([task for task in tasks_qs if task.completed])
-    overdue_tasks = len([task for task in tasks_qs if task.is_overdue()])
-    today_tasks = len([task for task in tasks_qs if task.is_due_today()])
+    if filters['today']:
+        tasks_qs = tasks_qs.due_today(now)
+
+    return tasks_qs, filters
+
+def parse_recurrence(params, due_date):
+    """The recurrence fields posted in ``params``; a task repeats only from a due date"""
+    recurrence = params.get('recurrence', '')
+    if due_date is None or recurrence not in dict(Task.RECURRENCE_CHOICES):
+        recurrence = ''
+    interval = params.get('recurrence_interval', '')
+    count = params.get('recurrence_count', '')
+    until = None
+    try:
+        until = timezone.make_aware(datetime.strptime(params.get('recurrence_until', ''), "%Y-%m-%dT%H:%M"))
+    except ValueError:
+        # Left empty, or not a date the form could have sent: the series has no end date
+        pass
+    return {
+        'recurrence': recurrence,
+        'recurrence_interval': max(int(interval), 1) if interval.isdigit() else 1,
+        'recurrence_until': until,
+        'recurrence_count': max(int(count), 1) if count.isdigit() else None,
+    }
+
+def recurring_tails(params, now, categories=None):
+    """The series tails (see todo.recurrence) of the recurring tasks matching the dashboard filters"""
+    filters = normalize_filters(params)
+    # A tail may be overdue while its next occurrences are due today
+    tails_qs, _ = filter_tasks({**filters, 'today': ''}, now, categories, Task.objects.series_tails())
+    # Later tails have nothing due within the recurrence window
+    return tails_qs.filter(due_date__lt=now + recurrence_window()).select_related('category', 'parent_task')
+
+def upcoming_occurrences(tails, params, now, ordering):
+    """The virtual occurrences of ``tails`` that a listing with ``params`` can show, lazily in ``ordering``"""
+    until = now + recurrence_window()
+    if normalize_filters(params)['today']:
+        until = min(until, now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1))
+    since = None
+    after = decode_cursor(params.get('after'))
+    if after and list(ordering[:2]) == ['completed', 'ordering_due'] and len(after[1]) == len(ordering):
+        # Smart-ordered, the open occurrences due before the cursor's row were on earlier pages
+        since = until if after[1][0] else after[1][1]
+    return virtual_occurrences(tails, now, until, ordering, since)
+
+async def load_page_state(request):
+    """Fetch what rendering a page reads, so it runs without touching the database.
+
+    Sync code must not query from an async view: the session (where flash
+    messages overflow to) is loaded up front and the sidebar stats are left
+    on the request for the task_stats context processor.
+    """
+    await request.session.akeys()
+    request.task_stats = await aget_task_stats()
+
+async def prepare_index(request):
+    await request.session.akeys()
+    await adashboard_state(request)
+
+def index_etag(request):
+    # Flash messages are shown once, so a page carrying them is never reused
+    if messages.get_messages(request):
+        return None
+    seed, _ = dashboard_state(request)
+    params = normalize_filters(request.GET)
+    params.update(after=request.GET.get('after', ''), before=request.GET.get('before', ''))
+    return make_etag(seed, params)
+
+def index_last_modified(request):
+    if messages.get_messages(request):
+        return None
+    return dashboard_state(request)[1]
+
+@async_condition(prepare_index, etag_func=index_etag, last_modified_func=index_last_modified)
+async def index(request):
+    now = timezone.now()
+    # Later pages keep ordering against the time the first page was built
+    ordering_now = cursor_time(request.GET) or occurrence_clock(now)
+    categories = await acategory_snapshot()
+    # Read before the page, so the live feed replays anything the page might miss
+    change_id = await alatest_change_id()
+    tasks_qs, filters = filter_tasks(request.GET, ordering_now, categories)
+    if filters['completed'] == 'true':
+        # Completed trees untouched for a while have moved to the archive (see todo.archive)
+        archived_qs, _ = filter_tasks(request.GET, ordering_now, categories, ArchivedTask.objects)
+        also = (archived_qs.for_dashboard(),)
+    else:
+        # Upcoming occurrences of recurring tasks are computed, not stored (see todo.recurrence)
+        tails = [tail async for tail in recurring_tails(request.GET, ordering_now, categories)]
+        also = (upcoming_occurrences(tails, request.GET, ordering_now, tasks_qs.query.order_by),)
+    # The stats aggregate runs on its own connection while the page is fetched
+    page, request.task_stats = await asyncio.gather(
+        apaginate(tasks_qs.for_dashboard(), request.GET, TASKS_PER_PAGE, ordering_now, also),
+        aget_task_stats(),
+    )
+    await aattach_subtree_counts(page.object_list)
+    filter_params = {key: value for key, value in filters.items() if value}
     
     context = {
-        'tasks': tasks_qs,
-        'q': query,
-        'priority': priority,
-        'category_value': category_name,
-        'completed_value': completed,
-        'today_filter': today_filter,
-        'categories': filter_categories,
-        'all_categories': all_categories,
-        'now': timezone.now(),
-        'overdue_tasks': overdue_tasks,
-        'today_tasks': today_tasks,
+        'tasks': page,
+        'cards': render_task_cards(page.object_list, now, request),
+        'page': page,
+        'next_query': urlencode({**filter_params, 'after': page.next_cursor}) if page.has_next() else '',
+        'previous_query': urlencode({**filter_params, 'before': page.previous_cursor}) if page.has_previous() else '',
+        'q': filters['q'],
+        'priority': filters['priority'],
+        'category_value': filters['category'],
+        'completed_value': filters['completed'],
+        'today_filter': filters['today'],
+        # Only categories that have tasks (for filters)
+        'categories': categories.categories(with_tasks=True),
+        # All categories (for bulk actions)
+        'all_categories': categories.categories(),
+        'bulk_actions': BULK_ACTIONS,
+        'filter_query': urlencode(filter_params),
+        'change_id': change_id,
+        'now': now,
     }
     return render(request, 'todo/index.html', context)
 
-def add_task(request):
+def wants_fragment(request):
+    """Whether the dashboard script asked for row fragments instead of a redirect"""
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+def fragment_response(request, task_ids=(), message=None, level='success'):
+    """Re-rendered cards for ``task_ids`` plus the fresh sidebar stats.
+
+    The script swaps each card in place; requested ids that no longer exist
+    come back as ``removed`` so their cards can be dropped. Archived tasks
+    still exist and get their archived card.
+    """
+    ids = {task_id for task_id in task_ids if task_id}
+    tasks = []
+    if ids:
+        tasks = list(Task.objects.filter(id__in=ids).for_dashboard())
+        missing = ids.difference(task.id for task in tasks)
+        if missing:
+            tasks += ArchivedTask.objects.filter(id__in=missing).for_dashboard()
+        attach_subtree_counts(tasks)
+    return fragment_json(request, ids, tasks, get_task_stats(), message, level)
+
+async def afragment_response(request, task_ids=(), message=None, level='success'):
+    """Async version of fragment_response()"""
+    ids = {task_id for task_id in task_ids if task_id}
+
+    async def fetch_tasks():
+        if not ids:
+            return []
+        tasks = [task async for task in Task.objects.filter(id__in=ids).for_dashboard()]
+        missing = ids.difference(task.id for task in tasks)
+        if missing:
+            tasks += [task async for task in ArchivedTask.objects.filter(id__in=missing).for_dashboard()]
+        await aattach_subtree_counts(tasks)
+        return tasks
+
+    tasks, stats = await asyncio.gather(fetch_tasks(), aget_task_stats())
+    return fragment_json(request, ids, tasks, stats, message, level)
+
+def fragment_json(request, ids, tasks, stats, message, level):
+    cards = render_task_cards(tasks, timezone.now(), request)
+    rows = {task.id: card for task, card in zip(tasks, cards)}
+    return JsonResponse({
+        'rows': rows,
+        'removed': sorted(ids - set(rows)),
+        'stats': stats,
+        'message': message,
+        'level': level,
+    })
+
+def create_task(category_name, **fields):
+    category_id = get_or_create_category_id(category_name) if category_name else None
+    with transaction.atomic():
+        task = Task.objects.create(category_id=category_id, **fields)
+        refresh_parent_counts(task.parent_task_id)
+        refresh_category_counts(category_id)
+    return task
+
+def update_task(task, category_name, old_parent_id, old_category_id):
+    task.category_id = get_or_create_category_id(category_name) if category_name else None
+    with transaction.atomic():
+        task.save()
+        if old_parent_id != task.parent_task_id:
+            refresh_parent_counts(old_parent_id, task.parent_task_id)
+        if old_category_id != task.category_id:
+            refresh_category_counts(old_category_id, task.category_id)
+
+def flip_completed(task):
+    task.completed = not task.completed
+    with transaction.atomic():
+        task.save()
+        refresh_parent_counts(task.parent_task_id)
+        if task.completed and task.recurrence:
+            # Only the next occurrence is stored; the later ones stay virtual
+            store_next_occurrence(task, timezone.now())
+
+def reopen_archived(archived):
+    """Bring an archived task's tree back and mark the task not completed; returns the Task"""
+    with transaction.atomic():
+        task = restore_tree(archived)
+        flip_completed(task)
+    return task
+
+async def add_task(request):
     if request.method == 'POST':
         title = request.POST.get('title')
         description = request.POST.get('description', '')
@@ -80,33 +291,30 @@ def add_task(request):
             # Make it timezone-aware
             due_date = timezone.make_aware(due_date)
 
-        category = None
-        if category_name:
-            category, _ = Category.objects.get_or_create(name=category_name)
-
         parent_task = None
-        if parent_task_id:
-            parent_task = Task.objects.filter(id=parent_task_id).first()
+        if parent_task_id.isdigit():
+            parent_task = await Task.objects.filter(id=parent_task_id).afirst()
 
         if title:
-            Task.objects.create(
+            # Writes run in one thread so the transaction sees them all
+            await sync_to_async(create_task)(
+                category_name,
                 title=title,
                 due_date=due_date,
                 priority=priority,
                 description=description,
                 notes=notes,
-                category=category,
                 parent_task=parent_task,
+                **parse_recurrence(request.POST, due_date),
             )
         return redirect('index')
 
-    # Get all tasks for parent task selection
-    all_tasks = Task.objects.filter(completed=False).order_by('title')
-    
-    return render(request, 'todo/add.html', {'all_tasks': all_tasks})
+    # Parent tasks are picked through the api_parent_choices typeahead
+    await load_page_state(request)
+    return render(request, 'todo/add.html')
 
-def edit_task(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
+async def edit_task(request, task_id):
+    task = await aget_object_or_404(Task.objects.select_related('category', 'parent_task'), id=task_id)
     if request.method == 'POST':
         title = request.POST.get('title')
         description = request.POST.get('description', '')
@@ -122,74 +330,132 @@ def edit_task(request, task_id):
             # Make it timezone-aware
             due_date = timezone.make_aware(due_date)
 
-        category = None
-        if category_name:
-            category, _ = Category.objects.get_or_create(name=category_name)
-
         parent_task = None
-        if parent_task_id:
-            parent_task = Task.objects.filter(id=parent_task_id).first()
+        if parent_task_id.isdigit():
+            parent_task = await Task.objects.filter(id=parent_task_id).afirst()
+        if parent_task and (parent_task.id == task.id or parent_task.is_descendant_of(task)):
+            messages.error(request, "A task cannot be moved under itself or one of its subtasks")
+            return redirect('edit_task', task_id=task.id)
 
+        old_parent_id = task.parent_task_id
+        old_category_id = task.category_id
+        old_schedule = schedule(task)
         task.title = title or task.title
         task.description = description
         task.notes = notes
         task.priority = priority
-        task.category = category
         task.due_date = due_date
         task.parent_task = parent_task
-        task.save()
+        for field, value in parse_recurrence(request.POST, due_date).items():
+            setattr(task, field, value)
+        follow_schedule(task, old_schedule)
+        await sync_to_async(update_task)(task, category_name, old_parent_id, old_category_id)
         return redirect('index')
 
-    # Get all tasks for parent task selection (excluding self and completed tasks)
-    all_tasks = Task.objects.filter(completed=False).exclude(id=task_id).order_by('title')
-    
-    return render(request, 'todo/edit.html', {
-        'task': task,
-        'all_tasks': all_tasks
-    })
+    # Parent tasks are picked through the api_parent_choices typeahead, which leaves out this task's subtree
+    await load_page_state(request)
+    return render(request, 'todo/edit.html', {'task': task})
 
+@require_POST
 def delete_task(request, task_id):
-    task = Task.objects.get(id=task_id)
-    task.delete()
+    task = Task.objects.filter(id=task_id).first()
+    if task is None:
+        return delete_archived_task(request, task_id)
+    # Subtasks go with their parent, so their cards must go too
+    removed_ids = [task.id, *task.descendants().values_list('id', flat=True)] if wants_fragment(request) else []
+    delete_subtrees([task.id])
+    if wants_fragment(request):
+        # Ancestors' progress covers the whole subtree
+        return fragment_response(request, removed_ids + task.get_ancestor_ids(), "Task deleted")
     return redirect('index')
 
-def toggle_complete(request, task_id):
-    task = Task.objects.get(id=task_id)
-    task.completed = not task.completed
-    task.save()
+def delete_archived_task(request, task_id):
+    task = get_object_or_404(ArchivedTask, id=task_id)
+    removed_ids = []
+    if wants_fragment(request):
+        removed_ids = [task.id, *ArchivedTask.objects.filter(subtree_q(task.subtree_path)).values_list('id', flat=True)]
+    delete_archived_tree(task)
+    if wants_fragment(request):
+        return fragment_response(request, removed_ids + task.get_ancestor_ids(), "Task deleted")
+    return redirect('index')
+
+@require_POST
+async def toggle_complete(request, task_id):
+    task = await Task.objects.filter(id=task_id).afirst()
+    if task is None:
+        # Archived tasks are all completed; un-completing one restores its tree
+        archived = await aget_object_or_404(ArchivedTask, id=task_id)
+        task = await sync_to_async(reopen_archived)(archived)
+    else:
+        await sync_to_async(flip_completed)(task)
+    if wants_fragment(request):
+        # Every ancestor's card shows this task's state in its progress
+        return await afragment_response(request, task.get_ancestor_ids(include_self=True))
     return redirect('index')
 
-def bulk_action(request):
+async def bulk_action(request):
     """Handle bulk actions on multiple tasks"""
-    print(f"=== BULK ACTION VIEW CALLED ===")
-    print(f"Request method: {request.method}")
-    print(f"Request POST data: {request.POST}")
-    
     if request.method == 'POST':
         action = request.POST.get('action')
         task_ids = request.POST.getlist('task_ids')
-        
-        print(f"Action: {action}")
-        print(f"Task IDs: {task_ids}")
-        
+        value = request.POST.get(f'{action}_value', '')
+
         if action and task_ids:
-            tasks = Task.objects.filter(id__in=task_ids)
-            print(f"Found {tasks.count()} tasks to update")
-            
-            if action == 'complete':
-                tasks.update(completed=True)
-                print(f"Marked {tasks.count()} tasks as complete")
-            elif action == 'delete':
-                deleted_count = tasks.count()
-                tasks.delete()
-                print(f"Deleted {deleted_count} tasks")
-        else:
-            print("No action or task_ids provided")
-        
-        print("Redirecting to index...")
-        return redirect('index')
+            # Cards currently on screen; only these are sent back to the script
+            visible = parse_ids(request.POST.getlist('visible'))
+            try:
+                affected = await sync_to_async(apply_bulk_action)(action, task_ids, value)
+            except BulkActionError as e:
+                if wants_fragment(request):
+                    return await afragment_response(request, message=str(e), level='error')
+                messages.error(request, str(e))
+            else:
+                message = f"{BULK_ACTIONS[action]}: {affected} task(s) affected"
+                if wants_fragment(request):
+                    return await afragment_response(request, visible, message)
+                messages.success(request, message)
+    return redirect('index')
+
+async def task_cards(request):
+    """Current cards of the given tasks (``?id=1&id=2``), for the live dashboard"""
+    return await afragment_response(request, parse_ids(request.GET.getlist('id'))[:TASKS_PER_PAGE])
+
+async def task_events(request):
+    """Server-sent events with the task changes after the client's last seen change id.
+
+    Under ASGI the stream stays open; todo.asgi.ChangeStreamMiddleware
+    normally answers before the request gets here. Under WSGI, where an
+    open stream would hold a thread, each response carries what is there
+    and EventSource polls again after EVENTS_POLL_RETRY_MS.
+    """
+    after = parse_change_id(request.headers.get('Last-Event-ID') or request.GET.get('after'))
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(stream_events(after), content_type='text/event-stream')
     else:
-        print("Not a POST request, redirecting...")
-        return redirect('index')
+        response = HttpResponse(await poll_events(after), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
+def export_tasks(request):
+    """Stream the tasks matching the dashboard filters as CSV or JSON Lines"""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        fmt = 'csv'
+    tasks_qs, _ = filter_tasks(request.GET)
+    if isinstance(request, ASGIRequest):
+        # A sync iterator would be read whole before the first byte goes out
+        lines = aexport_lines(fmt, aexport_rows(tasks_qs))
+    else:
+        lines = export_lines(fmt, export_rows(tasks_qs))
+    response = StreamingHttpResponse(
+        lines,
+        content_type='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+    )
+    response['Content-Disposition'] = f'attachment; filename="tasks.{fmt}"'
+    return response
 
+def metrics(request):
+    """Request timing histograms of this worker process, in the Prometheus text format"""
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo_project.settings')
 
 application = get_asgi_application()
+
+# Answers the dashboard's change feed without a thread per open stream
+from todo.asgi import ChangeStreamMiddleware  # noqa: E402
+
+application = ChangeStreamMiddleware(application)
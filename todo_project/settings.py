@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'todo.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,13 +50,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'todo.middleware.ReadOnlyRequestMiddleware',
 ]
 
 ROOT_URLCONF = 'todo_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates, with render time reported by RequestMetricsMiddleware
+        'BACKEND': 'todo.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -74,13 +78,112 @@ WSGI_APPLICATION = 'todo_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuned for several worker processes: WAL lets readers run alongside
+# the single writer, BEGIN IMMEDIATE takes the write lock up front (a
+# deferred transaction that later upgrades can fail with "database is
+# locked" instead of waiting), and busy_timeout makes writers queue.
+# 'replica' is a read-only connection to the same file that
+# todo.routers.ReadWriteRouter uses for GET requests.
+
+SQLITE_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA cache_size=-20000;'      # 20 MB page cache per connection
+    'PRAGMA mmap_size=268435456;'    # 256 MB memory-mapped I/O
+    'PRAGMA busy_timeout=20000;'
+    'PRAGMA temp_store=MEMORY;'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # journal_mode is stored in the file, but setting it is idempotent
+            'init_command': 'PRAGMA journal_mode=WAL;' + SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['todo.routers.ReadWriteRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Task stats are cached here. With several worker processes use a shared
+# backend (e.g. Redis or Memcached) so invalidation reaches every worker.
+# Rendered task cards go to 'fragments'; their keys change with the card's
+# content, so in production a FileBasedCache or PyMemcacheCache shared by all
+# workers works without any invalidation.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'todo',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'todo-fragments',
+        'TIMEOUT': 3600,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Cache alias used for rendered task cards
+TODO_FRAGMENT_CACHE = 'fragments'
+
+
+# How long the change log behind the dashboard's live updates keeps entries
+# (trimmed by purge_deleted_tasks)
+TODO_CHANGE_LOG_RETENTION = timedelta(days=1)
+
+# Where the send_reminders scheduler delivers due-today and overdue reminders
+# (todo.notifiers): LogNotifier, EmailNotifier (to TODO_REMINDER_EMAIL_TO,
+# through EMAIL_BACKEND) and WebhookNotifier (JSON POSTed to
+# TODO_REMINDER_WEBHOOK_URL)
+TODO_REMINDER_NOTIFIERS = ['todo.notifiers.LogNotifier']
+TODO_REMINDER_EMAIL_TO = []
+TODO_REMINDER_WEBHOOK_URL = ''
+
+# How far ahead the dashboard shows the upcoming occurrences of recurring
+# tasks that are not stored yet (todo.recurrence)
+TODO_RECURRENCE_WINDOW = timedelta(days=31)
+
+# Request timing (todo.middleware.RequestMetricsMiddleware): Server-Timing
+# headers, one JSON line per request on the 'todo.metrics' logger and
+# histograms at /metrics/
+TODO_REQUEST_METRICS = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'todo.metrics': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'todo.notifiers': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+
+# The task batch API accepts thousands of tasks per request
+DATA_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators